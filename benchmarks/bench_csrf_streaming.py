@@ -0,0 +1,93 @@
+#!/usr/bin/python3 -tt
+# -*- coding: utf-8 -*-
+'''Benchmark CSRFProtectionMiddleware on a large streamed response.
+
+An application streams a body of many 64 KiB chunks through the middleware
+and the benchmark consumes it like a WSGI server would.  It reports the
+time to the first chunk, the total time, and the peak RSS of the process.
+``buffered`` runs the application through :meth:`webob.Request.get_response`,
+which is what the middleware used to do.  ``streaming`` runs the current
+middleware.  Each mode runs in its own process so that the peak RSS of one
+does not hide the other.
+
+Needs webob, paste and repoze.who.
+
+Usage::
+
+    PYTHONPATH=. python3 benchmarks/bench_csrf_streaming.py [megabytes]
+'''
+
+from __future__ import print_function
+
+import resource
+import subprocess
+import sys
+import time
+
+CHUNK = b'x' * 65536
+MODES = ('buffered', 'streaming')
+
+
+def make_app(megabytes):
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type',
+                                   'application/octet-stream')])
+        for _ in range(megabytes * 16):
+            yield CHUNK
+    return app
+
+
+def make_environ():
+    return {'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': '/',
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+            'wsgi.url_scheme': 'http', 'wsgi.input': None,
+            'repoze.who.identity': {'_csrf_token': 'abc'},
+            'CSRF_TOKEN': 'abc'}
+
+
+def run(mode, megabytes):
+    app = make_app(megabytes)
+    if mode == 'buffered':
+        from webob import Request
+
+        def wrapped(environ, start_response):
+            response = Request(environ).get_response(app)
+            return response(environ, start_response)
+    else:
+        from fedora.wsgi.csrf import CSRFProtectionMiddleware
+        wrapped = CSRFProtectionMiddleware(app)
+
+    def start_response(status, headers, exc_info=None):
+        return lambda data: None
+
+    start = time.time()
+    first = None
+    size = 0
+    body = wrapped(make_environ(), start_response)
+    try:
+        for chunk in body:
+            if first is None:
+                first = time.time() - start
+            size += len(chunk)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    total = time.time() - start
+    # ru_maxrss is in KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print('%-10s %6d MiB  first chunk %8.2f ms  total %8.2f ms'
+          '  peak RSS %8.1f MiB' % (mode, size // 2 ** 20, first * 1000,
+                                    total * 1000, peak))
+
+
+def main():
+    if len(sys.argv) > 2:
+        run(sys.argv[2], int(sys.argv[1]))
+        return
+    megabytes = sys.argv[1] if len(sys.argv) > 1 else '256'
+    for mode in MODES:
+        subprocess.check_call([sys.executable, __file__, megabytes, mode])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/python3 -tt
+# -*- coding: utf-8 -*-
+'''Benchmark FASWhoPlugin.identify on common kinds of requests.
+
+Three requests go through :meth:`FASWhoPlugin.identify`:
+
+``cookie``
+    an API POST with a JSON body and a session cookie that is in the
+    identity cache
+``login``
+    a urlencoded login form posted to the login handler
+``upload``
+    a large multipart file upload with a session cookie
+
+FAS is not contacted: the session is put in the identity cache first.  For
+comparison, ``parse forms`` reports what parsing the query string and body
+of each request costs, which identify used to do on every request.
+
+Needs webob, paste, repoze.who and beaker.
+
+Usage::
+
+    PYTHONPATH=. python3 benchmarks/bench_faswho_identify.py [upload-megabytes]
+'''
+
+from __future__ import print_function
+
+import io
+import sys
+import time
+
+import webob
+
+from fedora.wsgi.faswho.faswhoplugin import FASWhoPlugin
+
+BOUNDARY = 'bench-boundary'
+
+
+def make_requests(megabytes):
+    upload = (('--%s\r\nContent-Disposition: form-data; name="file";'
+               ' filename="big.bin"\r\nContent-Type: application/octet-stream'
+               '\r\n\r\n' % BOUNDARY).encode('ascii') +
+              b'x' * (megabytes * 2 ** 20) +
+              ('\r\n--%s--\r\n' % BOUNDARY).encode('ascii'))
+    return {
+        'cookie': ('/api/update', 'application/json',
+                   b'{"package": "python-fedora"}'),
+        'login': ('/login_handler', 'application/x-www-form-urlencoded',
+                  b'user_name=toshio&password=secret&login=Login'),
+        'upload': ('/upload', 'multipart/form-data; boundary=%s' % BOUNDARY,
+                   upload),
+    }
+
+
+def make_environ(path, content_type, body):
+    return {'REQUEST_METHOD': 'POST', 'SCRIPT_NAME': '', 'PATH_INFO': path,
+            'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80', 'wsgi.url_scheme': 'http',
+            'CONTENT_TYPE': content_type, 'CONTENT_LENGTH': str(len(body)),
+            'HTTP_COOKIE': 'tg-visit=abc123', 'wsgi.input': io.BytesIO(body)}
+
+
+def parse_forms(environ):
+    req = webob.Request(environ, charset='utf-8')
+    return req.GET, req.POST
+
+
+def timeit(func, request, calls):
+    environs = [make_environ(*request) for _ in range(calls)]
+    start = time.time()
+    for environ in environs:
+        func(environ)
+    return (time.time() - start) / calls * 1e6
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    plugin = FASWhoPlugin('https://fas.example.org/accounts/',
+                          identity_cache_ttl=300)
+    user = {'username': 'toshio', 'password': 'abc123',
+            'approved_memberships': [], 'groups': set(),
+            'permissions': set(), 'session_id': 'abc123'}
+    plugin.identity_cache.set(plugin._session_key('abc123'),
+                              ['abc123', user], ttl=300)
+
+    for name, request in sorted(make_requests(megabytes).items()):
+        calls = 20 if name == 'upload' else 5000
+        print('%-7s identify     %12.1f us/call' %
+              (name, timeit(plugin.identify, request, calls)))
+        print('%-7s parse forms  %12.1f us/call' %
+              (name, timeit(parse_forms, request, calls)))
+
+
+if __name__ == '__main__':
+    main()
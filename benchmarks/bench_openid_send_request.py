@@ -0,0 +1,94 @@
+#!/usr/bin/python3 -tt
+# -*- coding: utf-8 -*-
+'''Benchmark the overhead of OpenIdBaseClient.send_request.
+
+The network is left out: the client's session returns a canned JSON response
+so only the work done by python-fedora around each request is measured.
+Also measures saving the session cookies when they changed and when they did
+not, which is what every login and request that refreshes the session does.
+
+Usage::
+
+    PYTHONPATH=. python3 benchmarks/bench_openid_send_request.py [calls]
+'''
+
+from __future__ import print_function
+
+import json
+import shutil
+import sys
+import tempfile
+import time
+
+import requests
+
+from fedora.client.cookiestore import CookieStore
+from fedora.client.openidbaseclient import OpenIdBaseClient
+
+BODY = json.dumps({'packages': [{'name': u'python-fedora', 'id': 1}]})
+
+
+def canned_response(url, **kwargs):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = BODY.encode('utf-8')
+    response._content_consumed = True
+    response.url = url
+    return response
+
+
+def make_client():
+    client = OpenIdBaseClient('https://example.org/', cache_session=False)
+    for verb in ('post', 'get', 'put', 'delete'):
+        setattr(client._session, verb, canned_response)
+    # The dispatcher holds the session's bound methods
+    client._authed_verb_dispatcher.update(
+        ((False, verb.upper()), canned_response)
+        for verb in ('post', 'get', 'put', 'delete'))
+    return client
+
+
+def timeit(func, calls):
+    best = None
+    for _ in range(3):
+        start = time.time()
+        for _ in range(calls):
+            func()
+        took = time.time() - start
+        if best is None or took < best:
+            best = took
+    return best / calls * 1e6
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    client = make_client()
+    for auth in (False, True):
+        usec = timeit(lambda: client.send_request('/packages', auth=auth,
+                                                  response_type='dict'),
+                      calls)
+        print('send_request auth=%-5s  %8.2f us/call' % (auth, usec))
+
+    directory = tempfile.mkdtemp()
+    try:
+        store = CookieStore(directory, delay=60)
+        cookies = [('session', 'abc'), ('csrf', 'def')]
+        usec = timeit(lambda: store.save('key', cookies), calls)
+        print('cookie save unchanged    %8.2f us/call' % usec)
+        counter = [0]
+
+        def changed():
+            counter[0] += 1
+            store.save('key', [('session', str(counter[0]))])
+        usec = timeit(changed, calls)
+        print('cookie save changed      %8.2f us/call' % usec)
+        start = time.time()
+        store.flush()
+        print('flush of pending saves   %8.2f us' %
+              ((time.time() - start) * 1e6))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/python -tt
+# -*- coding: utf-8 -*-
+'''Benchmark ProxyClient.send_request with and without connection pooling.
+
+Starts a local keep-alive stub server that answers every request with a small
+JSON document and then measures requests/sec from several threads sharing a
+single :class:`~fedora.client.ProxyClient`.
+
+"unpooled" reproduces the old behaviour of calling :func:`requests.post` for
+every request (a new connection each time).  "pooled" uses the default
+:class:`~fedora.client.transport.PooledTransport`.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_proxyclient_transport.py [requests] [threads]
+'''
+
+from __future__ import print_function
+
+import json
+import socket
+import sys
+import threading
+import time
+
+import requests
+from six.moves import BaseHTTPServer, socketserver
+
+from fedora.client import ProxyClient
+
+PAYLOAD = json.dumps({'person': {'username': 'toshio', 'id': 100068}})
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        # Headers and body are written separately.  Don't let Nagle hold the
+        # body back waiting for the ACK of the headers on a kept-alive socket.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        body = PAYLOAD.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class UnpooledTransport(object):
+    '''What ProxyClient did before it had a pooled transport.'''
+    def post(self, url, **kwargs):
+        return requests.post(url, **kwargs)
+
+
+def run(client, total, threads):
+    per_thread = total // threads
+
+    def worker():
+        for _ in range(per_thread):
+            client.send_request('/user/view', auth_params={'session_id': 'x'})
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.time()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return (per_thread * threads) / (time.time() - start)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+    base_url = 'http://127.0.0.1:%s/' % server.server_address[1]
+
+    unpooled = ProxyClient(base_url, session_as_cookie=False,
+                           transport=UnpooledTransport())
+    pooled = ProxyClient(base_url, session_as_cookie=False,
+                         pool_maxsize=threads)
+
+    # Warm up both code paths
+    run(unpooled, threads, threads)
+    run(pooled, threads, threads)
+
+    before = run(unpooled, total, threads)
+    after = run(pooled, total, threads)
+    print('%d requests from %d threads' % (total, threads))
+    print('unpooled: %8.1f req/s' % before)
+    print('pooled:   %8.1f req/s' % after)
+    print('speedup:  %8.2fx' % (after / before))
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
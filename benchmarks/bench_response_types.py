@@ -0,0 +1,78 @@
+#!/usr/bin/python3 -tt
+# -*- coding: utf-8 -*-
+'''Benchmark the response types of ProxyClient.send_request.
+
+Builds a synthetic ``/user/list`` response and measures the time and peak
+memory needed to decode it and turn it into each response type, then to read
+the username of every person (the usual access pattern of sync scripts).
+
+Usage::
+
+    PYTHONPATH=. python3 benchmarks/bench_response_types.py [people]
+'''
+
+from __future__ import print_function
+
+import json
+import sys
+import time
+import tracemalloc
+
+from fedora.client.responses import RESPONSE_TYPES, wrap_response
+
+FIELDS = ('affiliation', 'bugzilla_email', 'comments', 'country_code',
+          'creation', 'email', 'gpg_keyid', 'human_name', 'ircnick',
+          'last_seen', 'locale', 'postal_address', 'privacy', 'ssh_key',
+          'status', 'telephone', 'timezone')
+
+
+def make_payload(count):
+    people = []
+    for num in range(count):
+        person = dict((field, u'%s-%d' % (field, num)) for field in FIELDS)
+        person.update({
+            'id': num,
+            'username': u'user%d' % num,
+            'group_roles': [{'group_id': group, 'role_type': u'user',
+                             'role_status': u'approved'}
+                            for group in range(5)],
+        })
+        people.append(person)
+    return json.dumps({'people': people, 'unapproved_people': []})
+
+
+def convert(body, response_type):
+    data = wrap_response(json.loads(body), response_type)
+    return [person['username'] for person in data['people']]
+
+
+def run(body, response_type, repeat=3):
+    elapsed = None
+    for _ in range(repeat):
+        start = time.time()
+        convert(body, response_type)
+        took = time.time() - start
+        if elapsed is None or took < elapsed:
+            elapsed = took
+
+    # tracemalloc slows allocation down a lot so measure memory separately
+    tracemalloc.start()
+    convert(body, response_type)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    body = make_payload(count)
+    print('%d people, %.1f MiB of JSON' % (count, len(body) / 1048576.0))
+    print('%-6s %10s %14s' % ('type', 'best s', 'peak MiB'))
+    for response_type in RESPONSE_TYPES:
+        elapsed, peak = run(body, response_type)
+        print('%-6s %10.3f %14.1f' % (response_type, elapsed,
+                                      peak / 1048576.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,642 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''
+Caches for data retrieved from Fedora Services
+
+All of the caches have the same interface: :meth:`~TTLCache.get`,
+:meth:`~TTLCache.set`, :meth:`~TTLCache.delete`, :meth:`~TTLCache.clear`,
+and a :attr:`~TTLCache.stats` dict.  :class:`TTLCache` is private to one
+process.  :class:`FileCache` and :class:`MemcachedCache` are shared by every
+process that points at the same directory or memcached servers, which lets
+the worker processes of a web application share cached data and see each
+other's invalidations.  :func:`make_cache` creates a cache from a string so
+that the backend can be chosen in a config file.
+
+:class:`CredentialCache` remembers which usernames and passwords a server
+accepted so that clients that send a password with every request do not
+have to be verified every time.
+
+The shared caches pickle the values they store.  Only point them at a
+directory or memcached servers that untrusted users cannot write to.
+
+.. versionadded:: 1.2.0
+'''
+from collections import OrderedDict
+import errno
+from hashlib import sha1, sha256
+import hmac
+import logging
+import os
+import socket
+import stat
+import tempfile
+import threading
+import time
+from zlib import crc32
+
+from kitchen.text.converters import to_bytes
+from six.moves import cPickle as pickle
+from six.moves.urllib.parse import parse_qs, urlparse
+
+log = logging.getLogger(__name__)
+
+_STAT_NAMES = ('hits', 'misses', 'evictions', 'expirations', 'invalidations')
+
+# memcached reads expiration times longer than 30 days as Unix timestamps
+_MEMCACHED_MAX_RELATIVE_EXPTIME = 30 * 24 * 60 * 60
+
+
+class TTLCache(object):
+    '''Bounded in-memory cache whose entries expire.
+
+    Each entry lives for at most ``ttl`` seconds.  When the cache holds
+    ``maxsize`` entries, adding another one evicts the least recently used
+    entry.  Instances are threadsafe.
+
+    .. attribute:: stats
+
+        dict of counters since the cache was created or last cleared, plus
+        the current ``size``:
+
+        :hits: lookups that found a live entry
+        :misses: lookups that found nothing or an expired entry
+        :evictions: entries dropped to make room for new ones
+        :expirations: entries dropped because their ttl had passed
+        :invalidations: entries removed with :meth:`delete`
+    '''
+
+    def __init__(self, maxsize=1024, ttl=60):
+        '''Create the cache.
+
+        :kwarg maxsize: Maximum number of entries.  Defaults to 1024.
+        :kwarg ttl: Default number of seconds an entry lives.  Defaults to 60.
+        '''
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(_STAT_NAMES, 0)
+
+    @property
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+        return stats
+
+    def get(self, key, default=None):
+        '''Return the value cached for ``key`` or ``default`` if there is none.
+        '''
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                self._stats['misses'] += 1
+                return default
+            if expires <= time.time():
+                del self._data[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            # Mark as most recently used
+            del self._data[key]
+            self._data[key] = (expires, value)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        '''Cache ``value`` under ``key``.
+
+        :kwarg ttl: Seconds the entry lives.  Defaults to :attr:`ttl`
+        '''
+        if ttl is None:
+            ttl = self.ttl
+        with self._lock:
+            self._data.pop(key, None)
+            while len(self._data) >= self.maxsize:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+            self._data[key] = (time.time() + ttl, value)
+
+    def delete(self, key):
+        '''Remove ``key`` from the cache if it is there.'''
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._stats['invalidations'] += 1
+
+    def clear(self):
+        '''Remove every entry and reset the :attr:`stats`.'''
+        with self._lock:
+            self._data.clear()
+            for key in self._stats:
+                self._stats[key] = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class CredentialCache(object):
+    '''Bounded in-memory cache of verified usernames and passwords.
+
+    Passwords are not stored.  Each entry holds an HMAC of the username and
+    password, keyed with a secret that is generated for each instance, so
+    the entries are of no use outside the process.  Entries are kept per
+    username, which lets :meth:`delete` forget a user after they log out or
+    their password is rejected.  Instances are threadsafe.
+
+    .. attribute:: stats
+
+        The :attr:`TTLCache.stats` of the entries
+
+    .. versionadded:: 1.2.0
+    '''
+
+    def __init__(self, maxsize=1024, ttl=60):
+        '''Create the cache.
+
+        :kwarg maxsize: Maximum number of users.  The least recently used
+            user is dropped to make room for a new one.  Defaults to 1024.
+        :kwarg ttl: Seconds that a verified password is trusted.  Defaults to
+            60.
+        '''
+        self._secret = os.urandom(32)
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @property
+    def stats(self):
+        return self._cache.stats
+
+    def _digest(self, username, password):
+        return hmac.new(self._secret, to_bytes(username) + b'\0' +
+                        to_bytes(password), sha256).digest()
+
+    def get(self, username, password, default=None):
+        '''Return the value cached for a verified username and password.
+
+        :returns: The value given to :meth:`set` or ``default`` if the
+            password was not verified recently or is not the one that was
+        '''
+        entry = self._cache.get(username)
+        if entry is None or not hmac.compare_digest(
+                entry[0], self._digest(username, password)):
+            return default
+        return entry[1]
+
+    def set(self, username, password, value=True, ttl=None):
+        '''Remember that the server accepted ``password`` for ``username``.
+
+        :kwarg value: Data to return from :meth:`get`, such as the user's
+            information
+        :kwarg ttl: Seconds to trust the password.  Defaults to the ``ttl``
+            of the cache.
+        '''
+        self._cache.set(username, (self._digest(username, password), value),
+                        ttl=ttl)
+
+    def delete(self, username):
+        '''Forget the verified password of ``username``.'''
+        self._cache.delete(username)
+
+    def clear(self):
+        '''Forget every verified password.'''
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class _SharedCache(object):
+    '''Bookkeeping shared by the caches that store pickled values.'''
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(_STAT_NAMES + ('errors',), 0)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    @property
+    def stats(self):
+        '''Counters for this process.  See :attr:`TTLCache.stats`.
+
+        Evictions are done by the backend and are not counted.  ``errors``
+        counts operations that failed because the backend was unavailable.
+        '''
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _hashed(self, key):
+        return sha1(to_bytes(key)).hexdigest()
+
+
+def _default_cache_directory():
+    base = '/dev/shm'
+    if not os.path.isdir(base):
+        base = tempfile.gettempdir()
+    return os.path.join(base, 'python-fedora-cache-%s' % os.getuid())
+
+
+def _private_directory(directory):
+    '''Create ``directory`` if needed and check that only we can use it.
+
+    The entries are unpickled so a directory that another user can write to,
+    or that they created in our place, would let them run code in this
+    process.
+
+    :raises fedora.client.UnsafeFileError: if ``directory`` is a symlink,
+        is not a directory, is owned by another user, or can be accessed by
+        the group or other users
+    '''
+    # fedora.client imports this module
+    from fedora.client import UnsafeFileError
+    try:
+        os.makedirs(directory, 0o700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    info = os.lstat(directory)
+    if stat.S_ISLNK(info.st_mode):
+        raise UnsafeFileError(directory, 'Directory is a symlink')
+    if not stat.S_ISDIR(info.st_mode):
+        raise UnsafeFileError(directory, 'Not a directory')
+    if info.st_uid != os.getuid():
+        raise UnsafeFileError(directory, 'Directory not owned by current user')
+    if info.st_mode & 0o077:
+        raise UnsafeFileError(directory,
+                              'Directory is accessible by other users')
+
+
+class FileCache(_SharedCache):
+    '''Cache storing one file per entry in a directory.
+
+    Processes on the same machine share the entries.  Put the directory on a
+    memory backed filesystem like :file:`/dev/shm` (the default, when it
+    exists) so that the cache never touches the disk.  Entries are written to
+    a temporary file and renamed into place so readers never see partial
+    data.
+
+    Expired entries are removed when they are read and by :meth:`prune`,
+    which is run every ``prune_interval`` calls to :meth:`set`.  If
+    ``maxsize`` is set, :meth:`prune` also removes the least recently used
+    entries beyond that number, so the cache may briefly hold up to
+    ``prune_interval`` more entries than ``maxsize``.
+    '''
+
+    def __init__(self, directory=None, ttl=60, prune_interval=1000,
+                 maxsize=None):
+        '''Create the cache.
+
+        :kwarg directory: Directory to store the entries in.  It is created
+            accessible by its owner only if it does not exist.  It must be
+            owned by the current user and not be accessible by anyone else.
+            Defaults to a directory for this user in :file:`/dev/shm` or, if
+            that does not exist, in the system's temporary directory.
+        :kwarg ttl: Default number of seconds an entry lives.  Defaults to 60.
+        :kwarg prune_interval: Remove expired entries every this many calls to
+            :meth:`set`.  Defaults to 1000.
+        :kwarg maxsize: Maximum number of entries to keep when pruning.
+            Defaults to None, no limit.
+        :raises fedora.client.UnsafeFileError: if ``directory`` may be
+            used by other users
+        '''
+        super(FileCache, self).__init__(ttl)
+        if directory is None:
+            directory = _default_cache_directory()
+        self.directory = directory
+        self.prune_interval = prune_interval
+        self.maxsize = maxsize
+        self._sets = 0
+        _private_directory(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, self._hashed(key))
+
+    def get(self, key, default=None):
+        '''Return the value cached for ``key`` or ``default``.'''
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cache_file:
+                expires, value = pickle.load(cache_file)
+        except (IOError, OSError):
+            self._count('misses')
+            return default
+        except Exception as e:  # pylint:disable-msg=W0703
+            # Truncated or otherwise unreadable.  Treat as missing
+            log.warning('Unable to read cache entry %s: %s' % (path, e))
+            self._count('errors')
+            self._count('misses')
+            return default
+        if expires <= time.time():
+            self._unlink(path)
+            self._count('expirations')
+            self._count('misses')
+            return default
+        if self.maxsize:
+            # The modification time records when the entry was last used
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+        self._count('hits')
+        return value
+
+    def set(self, key, value, ttl=None):
+        '''Cache ``value`` under ``key``.
+
+        :kwarg ttl: Seconds the entry lives.  Defaults to :attr:`ttl`
+        '''
+        if ttl is None:
+            ttl = self.ttl
+        data = pickle.dumps((time.time() + ttl, value),
+                            pickle.HIGHEST_PROTOCOL)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as cache_file:
+                cache_file.write(data)
+            os.rename(tmp_path, self._path(key))
+        except Exception:
+            self._unlink(tmp_path)
+            raise
+
+        self._sets += 1
+        if self.prune_interval and self._sets % self.prune_interval == 0:
+            self.prune()
+
+    def delete(self, key):
+        '''Remove ``key`` from the cache if it is there.'''
+        if self._unlink(self._path(key)):
+            self._count('invalidations')
+
+    def clear(self):
+        '''Remove every entry.'''
+        for name in os.listdir(self.directory):
+            self._unlink(os.path.join(self.directory, name))
+
+    def prune(self):
+        '''Remove the entries that have expired and, if there are more than
+        ``maxsize``, the least recently used ones.'''
+        now = time.time()
+        live = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'rb') as cache_file:
+                    expires = pickle.load(cache_file)[0]
+                    last_used = os.fstat(cache_file.fileno()).st_mtime
+            except Exception:  # pylint:disable-msg=W0703
+                # Gone already or a temporary file that is being written
+                continue
+            if expires <= now:
+                self._unlink(path)
+                self._count('expirations')
+            else:
+                live.append((last_used, path))
+
+        if self.maxsize and len(live) > self.maxsize:
+            live.sort()
+            for last_used, path in live[:len(live) - self.maxsize]:
+                if self._unlink(path):
+                    self._count('evictions')
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            return False
+        return True
+
+
+class MemcachedCache(_SharedCache):
+    '''Cache stored in one or more memcached servers.
+
+    This speaks the memcached text protocol directly so it needs no client
+    library.  Keys are spread over the servers by hash.  If a server cannot be
+    reached, lookups miss and the error is logged and counted instead of being
+    raised.  Each thread uses its own connections.
+    '''
+
+    def __init__(self, servers=('127.0.0.1:11211',), ttl=60,
+                 prefix='python-fedora:', timeout=1.0):
+        '''Create the cache.
+
+        :kwarg servers: Sequence of ``host:port`` strings.  Defaults to a
+            memcached on the local machine.
+        :kwarg ttl: Default number of seconds an entry lives.  Defaults to 60.
+        :kwarg prefix: Prefix for the keys so that several applications can
+            share the servers.
+        :kwarg timeout: Seconds to wait for a server before giving up.
+            Defaults to 1 second.
+        '''
+        super(MemcachedCache, self).__init__(ttl)
+        self.servers = []
+        for server in servers:
+            host, port = server.rsplit(':', 1)
+            self.servers.append((host, int(port)))
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _key(self, key):
+        # Hashing keeps keys short and free of whitespace as memcached needs
+        return to_bytes(self.prefix) + to_bytes(self._hashed(key))
+
+    def _server(self, mc_key):
+        return self.servers[(crc32(mc_key) & 0xffffffff) % len(self.servers)]
+
+    def _connection(self, server):
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        if server not in connections:
+            sock = socket.create_connection(server, self.timeout)
+            connections[server] = (sock, sock.makefile('rb'))
+        return connections[server]
+
+    def _disconnect(self, server):
+        sock, reader = self._local.connections.pop(server)
+        reader.close()
+        sock.close()
+
+    def _command(self, mc_key, command, data=None):
+        '''Send a command and return the reader for its response.'''
+        server = self._server(mc_key)
+        sock, reader = self._connection(server)
+        message = command + b'\r\n'
+        if data is not None:
+            message += data + b'\r\n'
+        try:
+            sock.sendall(message)
+        except socket.error:
+            # The server may have closed an idle connection.  Try once more
+            self._disconnect(server)
+            sock, reader = self._connection(server)
+            sock.sendall(message)
+        return server, reader
+
+    def _call(self, operation, mc_key, *args):
+        try:
+            return operation(mc_key, *args)
+        except KeyError:
+            raise
+        except Exception as e:  # pylint:disable-msg=W0703
+            log.warning('memcached request failed: %s' % e)
+            self._count('errors')
+            try:
+                self._disconnect(self._server(mc_key))
+            except (KeyError, AttributeError, socket.error):
+                pass
+            raise _MemcachedError()
+
+    def _get(self, mc_key):
+        server, reader = self._command(mc_key, b'get ' + mc_key)
+        line = reader.readline()
+        if line.startswith(b'VALUE '):
+            length = int(line.split()[3])
+            data = reader.read(length + 2)[:-2]
+            line = reader.readline()
+            if line.rstrip() != b'END':
+                raise ValueError('Unexpected response: %r' % line)
+            return pickle.loads(data)
+        if line.rstrip() != b'END':
+            raise ValueError('Unexpected response: %r' % line)
+        raise KeyError(mc_key)
+
+    def _set(self, mc_key, data, ttl):
+        command = b'set ' + mc_key + (' 0 %d %d' % (ttl, len(data))).encode(
+            'ascii')
+        server, reader = self._command(mc_key, command, data)
+        line = reader.readline().rstrip()
+        if line != b'STORED':
+            raise ValueError('Unexpected response: %r' % line)
+
+    def _delete(self, mc_key):
+        server, reader = self._command(mc_key, b'delete ' + mc_key)
+        line = reader.readline().rstrip()
+        if line not in (b'DELETED', b'NOT_FOUND'):
+            raise ValueError('Unexpected response: %r' % line)
+        return line == b'DELETED'
+
+    def get(self, key, default=None):
+        '''Return the value cached for ``key`` or ``default``.'''
+        try:
+            value = self._call(self._get, self._key(key))
+        except (KeyError, _MemcachedError):
+            self._count('misses')
+            return default
+        self._count('hits')
+        return value
+
+    def set(self, key, value, ttl=None):
+        '''Cache ``value`` under ``key``.
+
+        :kwarg ttl: Seconds the entry lives.  Defaults to :attr:`ttl`
+        '''
+        if ttl is None:
+            ttl = self.ttl
+        if ttl <= 0:
+            # memcached treats 0 as "never expires"
+            self.delete(key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        exptime = max(int(round(ttl)), 1)
+        if exptime > _MEMCACHED_MAX_RELATIVE_EXPTIME:
+            exptime = int(time.time() + ttl)
+        try:
+            self._call(self._set, self._key(key), data, exptime)
+        except _MemcachedError:
+            pass
+
+    def delete(self, key):
+        '''Remove ``key`` from the cache if it is there.'''
+        try:
+            if self._call(self._delete, self._key(key)):
+                self._count('invalidations')
+        except _MemcachedError:
+            pass
+
+    def clear(self):
+        '''Remove every entry from every server.
+
+        Note that this removes the entries of other applications using the
+        same servers as well.
+        '''
+        for server in self.servers:
+            try:
+                sock, reader = self._connection(server)
+                sock.sendall(b'flush_all\r\n')
+                reader.readline()
+            except socket.error as e:
+                log.warning('memcached request failed: %s' % e)
+                self._count('errors')
+
+
+class _MemcachedError(Exception):
+    '''A memcached request failed.  Already logged.'''
+    pass
+
+
+def make_cache(spec, ttl=60, namespace=None):
+    '''Create a cache from a string, for instance from a config file.
+
+    :arg spec: One of:
+
+        :``memory``: a :class:`TTLCache`.  Add ``://SIZE`` to set its
+            maximum size.
+        :``file``: a :class:`FileCache` in the default directory.  Use
+            ``file:///path/to/dir`` for a different directory and add
+            ``?maxsize=SIZE`` to limit the number of entries.
+        :``memcached://HOST:PORT[,HOST:PORT...]``: a :class:`MemcachedCache`
+            using those servers.
+    :kwarg ttl: Default number of seconds an entry lives.  Defaults to 60.
+    :kwarg namespace: Name to keep the entries of this cache apart from
+        other caches made from the same ``spec``.  File caches use a
+        subdirectory of that name, with its own ``maxsize``, and memcached
+        keys are prefixed with it.  Each memory cache is separate anyway.
+    :returns: the new cache
+    :raises ValueError: if ``spec`` is not understood
+    '''
+    url = urlparse(spec)
+    scheme = url.scheme or spec
+    if scheme == 'memory':
+        if url.netloc:
+            return TTLCache(maxsize=int(url.netloc), ttl=ttl)
+        return TTLCache(ttl=ttl)
+    if scheme == 'file':
+        maxsize = parse_qs(url.query).get('maxsize')
+        directory = url.path or None
+        if namespace:
+            directory = directory or _default_cache_directory()
+            # Another user must not be able to swap the subdirectory
+            _private_directory(directory)
+            directory = os.path.join(directory, namespace)
+        return FileCache(directory, ttl=ttl,
+                         maxsize=int(maxsize[0]) if maxsize else None)
+    if scheme == 'memcached' and url.netloc:
+        prefix = 'python-fedora:'
+        if namespace:
+            prefix += namespace + ':'
+        return MemcachedCache(url.netloc.split(','), ttl=ttl, prefix=prefix)
+    raise ValueError('Unknown cache specification: %r' % (spec,))
+
+
+__all__ = ('CredentialCache', 'FileCache', 'MemcachedCache', 'TTLCache',
+           'make_cache')
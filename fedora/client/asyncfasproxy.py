@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''asyncio version of :class:`~fedora.client.FasProxyClient`.
+
+This module requires python 3.5 or later and `aiohttp
+<https://docs.aiohttp.org/>`_.
+
+.. versionadded:: 1.2.0
+'''
+
+from fedora import __version__
+from fedora.client import AuthError, AppError
+from fedora.client.asyncproxyclient import AsyncProxyClient
+
+
+class AsyncFasProxyClient(AsyncProxyClient):
+    '''An asyncio client to the Fedora Account System.
+
+    The methods of this class are coroutines which otherwise behave like the
+    methods of the same name on :class:`~fedora.client.FasProxyClient`.
+    '''
+
+    def __init__(self, base_url='https://admin.fedoraproject.org/accounts/',
+                 *args, **kwargs):
+        '''An asyncio client to the Fedora Account System.
+
+        :kwargs base_url: Base of every URL used to contact the server.
+            Defaults to the Fedora Project FAS instance.
+        :kwargs useragent: useragent string to use.  If not given, default to
+            "FAS Proxy Client/VERSION"
+
+        The remaining keyword arguments are the same as for
+        :class:`~fedora.client.asyncproxyclient.AsyncProxyClient`.
+        '''
+        if 'useragent' not in kwargs:
+            kwargs['useragent'] = 'FAS Proxy Client/%s' % __version__
+        super(AsyncFasProxyClient, self).__init__(base_url, *args, **kwargs)
+
+    async def login(self, username, password):
+        '''Login to the Account System
+
+        :arg username: username to send to FAS
+        :arg password: Password to verify the username with
+        :returns: a tuple of the session id FAS has associated with the user
+            and the user's account information.
+        :raises AuthError: if the username and password do not work
+        '''
+        return await self.send_request(
+            '/login',
+            auth_params={'username': username, 'password': password}
+        )
+
+    async def logout(self, session_id):
+        '''Logout of the Account System
+
+        :arg session_id: a FAS session_id to remove from FAS
+        '''
+        await self.send_request('/logout',
+                                auth_params={'session_id': session_id})
+
+    async def refresh_session(self, session_id):
+        '''Try to refresh a session_id to prevent it from timing out
+
+        :arg session_id: FAS session_id to refresh
+        :returns: session_id that FAS has set now
+        '''
+        return await self.send_request(
+            '', auth_params={'session_id': session_id})
+
+    async def verify_session(self, session_id):
+        '''Verify that a session is active.
+
+        :arg session_id: session_id to verify is currently associated with a
+            logged in user
+        :returns: True if the session_id is valid.  False otherwise.
+        '''
+        try:
+            await self.send_request('/home',
+                                    auth_params={'session_id': session_id})
+        except AuthError:
+            return False
+        return True
+
+    async def verify_password(self, username, password):
+        '''Return whether the username and password pair are valid.
+
+        :arg username: username to try authenticating
+        :arg password: password for the user
+        :returns: True if the username/password are valid.  False otherwise.
+        '''
+        try:
+            await self.send_request('/home',
+                                    auth_params={'username': username,
+                                                 'password': password})
+        except AuthError:
+            return False
+        return True
+
+    async def get_user_info(self, auth_params):
+        '''Retrieve information about a logged in user.
+
+        :arg auth_params: Auth information for a particular user.  Refer to
+            :meth:`fedora.client.proxyclient.ProxyClient.send_request` for
+            all the legal values for this.
+        :returns: a tuple of session_id and information about the user.
+        :raises AuthError: if the auth_params do not give access
+        '''
+        request = await self.send_request('/user/view',
+                                          auth_params=auth_params)
+        return (request[0], request[1]['person'])
+
+    async def person_by_id(self, person_id, auth_params):
+        '''Retrieve information about a particular person
+
+        :arg auth_params: Auth information for a particular user.  Refer to
+            :meth:`fedora.client.proxyclient.ProxyClient.send_request` for
+            all the legal values for this.
+        :returns: a tuple of session_id and information about the user.
+        :raises AppError: if the server returns an exception
+        :raises AuthError: if the auth_params do not give access
+        '''
+        request = await self.send_request('/json/person_by_id',
+                                          req_params={'person_id': person_id},
+                                          auth_params=auth_params)
+        if request[1]['success']:
+            if 'approved' in request[1]:
+                request[1]['person']['approved_memberships'] = \
+                    request[1]['approved']
+            if 'unapproved' in request[1]:
+                request[1]['person']['unapproved_memberships'] = \
+                    request[1]['unapproved']
+            return (request[0], request[1]['person'])
+        else:
+            raise AppError(name='Generic AppError',
+                           message=request[1]['tg_flash'])
+
+    async def group_list(self, auth_params):
+        '''Retrieve a list of groups
+
+        :arg auth_params: Auth information for a particular user.  Refer to
+            :meth:`fedora.client.proxyclient.ProxyClient.send_request` for
+            all the legal values for this.
+        :returns: a tuple of session_id and information about groups.
+        :raises AuthError: if the auth_params do not give access
+        '''
+        return await self.send_request('/group/list', auth_params=auth_params)
+
+
+__all__ = ('AsyncFasProxyClient',)
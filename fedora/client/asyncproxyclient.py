@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''asyncio version of :class:`~fedora.client.ProxyClient`.
+
+This module requires python 3.5 or later and `aiohttp
+<https://docs.aiohttp.org/>`_.  Install python-fedora with the ``async``
+extra to get it.
+
+.. versionadded:: 1.2.0
+'''
+
+import asyncio
+import json
+
+import aiohttp
+from kitchen.text.converters import to_unicode
+
+from fedora.client import FedoraServiceError, ServerError
+from fedora.client.proxyclient import ProxyClient
+
+
+def _form_fields(params):
+    '''Turn request parameters into a list of fields that aiohttp can send.
+
+    Lists of values are sent as repeated fields and byte strings are decoded
+    the same way that :mod:`requests` would encode them.
+    '''
+    fields = []
+    for key, value in params.items():
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        for item in value:
+            if isinstance(item, bytes):
+                item = to_unicode(item)
+            elif not isinstance(item, str):
+                item = str(item)
+            fields.append((key, item))
+    return fields
+
+
+class AsyncTransport(object):
+    '''Pooled, keep-alive HTTP transport for use within one asyncio loop.
+
+    The underlying :class:`aiohttp.ClientSession` is created on first use so
+    that it is bound to the event loop the requests are made from.  As with
+    :class:`~fedora.client.transport.PooledTransport`, cookies sent by the
+    server are returned with each response but never stored.
+    '''
+
+    def __init__(self, limit=100, limit_per_host=0, keepalive_timeout=60.0):
+        '''Create a transport.
+
+        :kwarg limit: Maximum number of simultaneous connections.  Requests
+            beyond this wait for a free connection.  Defaults to 100.
+        :kwarg limit_per_host: Maximum number of simultaneous connections to
+            a single host.  Defaults to 0, no limit other than ``limit``.
+        :kwarg keepalive_timeout: Close connections that have been idle for
+            this many seconds.  Defaults to 60 seconds.
+        '''
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout or None)
+            self._session = aiohttp.ClientSession(
+                connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+        return self._session
+
+    async def post(self, url, data=None, cookies=None, headers=None,
+                   auth=None, verify=True, timeout=None):
+        '''Make an HTTP POST request.
+
+        The arguments mirror those that :class:`~fedora.client.ProxyClient`
+        gives to :meth:`requests.Session.request`.
+
+        :returns: a tuple of the HTTP status, a dict of cookies set by the
+            server, and the body of the response as bytes.
+        '''
+        if auth:
+            auth = aiohttp.BasicAuth(*auth)
+        session = self._get_session()
+        async with session.post(
+                url, data=_form_fields(data or {}), cookies=cookies,
+                headers=headers, auth=auth, ssl=None if verify else False,
+                timeout=aiohttp.ClientTimeout(sock_connect=timeout,
+                                              sock_read=timeout)) as response:
+            body = await response.read()
+            new_cookies = dict((name, morsel.value) for name, morsel in
+                               response.cookies.items())
+            return response.status, new_cookies, body
+
+    async def close(self):
+        '''Close all pooled connections.'''
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncProxyClient(ProxyClient):
+    '''
+    A client to a Fedora Service for use from asyncio code.
+
+    This works like :class:`~fedora.client.ProxyClient` except that
+    :meth:`send_request` is a coroutine.  Many requests for different users
+    can be in flight at the same time from a single event loop without
+    blocking it or needing a thread per request.
+
+    Retries and timeouts apply to each :meth:`send_request` call on its own.
+    Waiting between retries uses :func:`asyncio.sleep` so other coroutines
+    keep running meanwhile.
+
+    An instance should only be used from one event loop.  Call :meth:`close`
+    (or use the instance as an ``async with`` context manager) when you are
+    done with it to close the pooled connections.
+
+    .. attribute:: transport
+
+        The :class:`AsyncTransport` that requests are sent over.
+    '''
+
+    _connection_errors = (aiohttp.ClientError,)
+
+    def __init__(self, base_url, useragent=None, session_name='tg-visit',
+                 debug=False, insecure=False, retries=None, timeout=None,
+                 transport=None, connection_limit=100,
+                 pool_idle_timeout=60.0, retry_policy=None,
+                 circuit_breaker=None, response_type='munch'):
+        '''Create a client configured for a particular service.
+
+        :arg base_url: Base of every URL used to contact the server
+
+        :kwarg useragent: useragent string to use.  If not given, default to
+            "Fedora ProxyClient/VERSION"
+        :kwarg session_name: name of the cookie to use with session handling
+        :kwarg debug: If True, log debug information
+        :kwarg insecure: If True, do not check server certificates against
+            their CA's.  This means that man-in-the-middle attacks are
+            possible.  Do not use this in production.
+        :kwarg retries: if we get an unknown or possibly transient error from
+            the server, retry this many times.  Setting this to a negative
+            number makes it try forever.  Defaults to zero, no retries.
+        :kwarg timeout: A float describing the timeout of the connection.
+            Defaults to 120 seconds.
+        :kwarg transport: An :class:`AsyncTransport` to send requests over.
+            If not given, a new one is created.
+        :kwarg connection_limit: Maximum number of simultaneous connections.
+            Defaults to 100.
+        :kwarg pool_idle_timeout: Close connections that have been idle for
+            this many seconds.  Defaults to 60 seconds.
+        :kwarg retry_policy: :class:`~fedora.client.retry.RetryPolicy` to
+            use when retrying requests.  Defaults to the policy shared by all
+            clients in the process.
+        :kwarg circuit_breaker: A
+            :class:`~fedora.client.circuitbreaker.CircuitBreakerRegistry` or
+            True.  See :class:`~fedora.client.ProxyClient`.
+        :kwarg response_type: How to return data from the server.  One of
+            ``munch``, ``dict``, or ``lazy``.  Defaults to ``munch``.
+        '''
+        super(AsyncProxyClient, self).__init__(
+            base_url, useragent=useragent, session_name=session_name,
+            session_as_cookie=False, debug=debug, insecure=insecure,
+            retries=retries, timeout=timeout, transport=transport,
+            pool_maxsize=connection_limit,
+            pool_idle_timeout=pool_idle_timeout, retry_policy=retry_policy,
+            circuit_breaker=circuit_breaker, response_type=response_type)
+
+    def _make_transport(self, pool_connections, pool_maxsize, idle_timeout):
+        return AsyncTransport(limit=pool_maxsize,
+                              keepalive_timeout=idle_timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        '''Close the connections held by our :attr:`transport`.'''
+        await self.transport.close()
+
+    async def _post(self, url, complete_params, cookies, headers, auth,
+                    retries, timeout):
+        '''POST a request to the server, retrying according to our policy.
+
+        :returns: a tuple of the HTTP status, cookies, and body of the
+            successful response
+        '''
+        retry_state = self.retry_policy.begin(retries)
+        while True:
+            try:
+                http_status, new_cookies, body = await self.transport.post(
+                    url,
+                    data=complete_params,
+                    cookies=cookies,
+                    headers=headers,
+                    auth=auth,
+                    verify=not self.insecure,
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                self.log.debug('Request timed out')
+                delay = retry_state.next_delay(-1)
+                if delay is not None:
+                    await asyncio.sleep(delay)
+                    continue
+                raise ServerError(
+                    url, -1, 'Request timed out after %s seconds' % timeout)
+
+            error = self._check_status(url, http_status)
+            if error:
+                delay = retry_state.next_delay(http_status)
+                if delay is not None:
+                    await asyncio.sleep(delay)
+                    continue
+                raise error
+            break
+        return http_status, new_cookies, body
+
+    async def send_request(self, method, req_params=None, auth_params=None,
+                           retries=None, timeout=None, response_type=None):
+        '''Make an HTTP request to a server method.
+
+        This is a coroutine.  The arguments, return value, and exceptions are
+        the same as for :meth:`fedora.client.ProxyClient.send_request` except
+        that uploading files is not supported.
+
+        :returns: a tuple of session_id and data from the server
+        '''
+        self.log.debug('asyncproxyclient.send_request: entered')
+
+        url, headers, complete_params, session_id, auth = \
+            self._prepare_request(method, req_params, auth_params)
+
+        cookies = None
+        if session_id:
+            cookies = {self.session_name: session_id}
+
+        if retries is None:
+            retries = self.retries
+
+        if timeout is None:
+            timeout = self.timeout
+
+        breaker = self._get_circuit_breaker(method, url)
+        try:
+            http_status, new_cookies, body = await self._post(
+                url, complete_params, cookies, headers, auth, retries,
+                timeout)
+        except asyncio.CancelledError:
+            # An Exception before python 3.8 but never a server outcome
+            if breaker:
+                breaker.release()
+            raise
+        except BaseException as e:
+            self._record_outcome(breaker, e)
+            raise
+        self._record_outcome(breaker)
+
+        # In case the server returned a new session cookie to us
+        new_session = new_cookies.get(self.session_name, '')
+
+        try:
+            # Our servers always send utf-8.  See ProxyClient.send_request
+            data = json.loads(body.decode('utf-8'))
+        except ValueError as e:
+            # The response wasn't JSON data
+            raise self._json_error(url, http_status, e)
+
+        self.log.debug('asyncproxyclient.send_request: exited')
+        return self._process_data(data, new_session, response_type)
+
+    def iter_request(self, *args, **kwargs):
+        '''Not supported.
+
+        Responses are read completely by :meth:`send_request`.  Use
+        :class:`~fedora.client.ProxyClient` to decode large responses
+        incrementally.
+
+        :raises TypeError: always
+        '''
+        raise TypeError('AsyncProxyClient does not support iter_request();'
+                        ' use send_request() or ProxyClient.iter_request()')
+
+    async def send_many(self, batch, max_workers=8, retries=None,
+                        timeout=None, response_type=None):
+        '''Make many independent requests concurrently.
+
+        This is a coroutine.  The arguments and return value are the same as
+        for :meth:`fedora.client.ProxyClient.send_many` except that the
+        requests run as tasks on the event loop instead of in threads.
+        '''
+        specs = [self._request_spec(spec) for spec in batch]
+        slots = asyncio.Semaphore(max(max_workers, 1))
+
+        async def send(spec):
+            method, req_params, auth_params = spec
+            async with slots:
+                try:
+                    return await self.send_request(
+                        method, req_params=req_params,
+                        auth_params=auth_params, retries=retries,
+                        timeout=timeout, response_type=response_type)
+                except (FedoraServiceError, aiohttp.ClientError,
+                        asyncio.TimeoutError) as e:
+                    return e
+
+        return await asyncio.gather(*[send(spec) for spec in specs])
+
+
+__all__ = ('AsyncProxyClient', 'AsyncTransport')
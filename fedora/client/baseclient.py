@@ -23,14 +23,12 @@
 .. moduleauthor:: Ralph Bean <rbean@redhat.com>
 '''
 
-import os
-import stat
 from os import path
 import logging
+import threading
 import warnings
 
 from kitchen.text.converters import to_bytes
-from six.moves import cPickle as pickle
 from six.moves import http_cookies as Cookie
 
 from fedora import __version__
@@ -39,8 +37,23 @@ log = logging.getLogger(__name__)
 
 b_SESSION_DIR = path.join(path.expanduser('~'), '.fedora')
 b_SESSION_FILE = path.join(b_SESSION_DIR, 'fedora_session')
+b_SESSION_DB = path.join(b_SESSION_DIR, 'baseclient-sessions.sqlite')
 
 from fedora.client import AuthError, ProxyClient
+from fedora.client.sessionstore import SessionStore
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def _get_default_store():
+    '''Return the :class:`SessionStore` shared by clients in this process.'''
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = SessionStore(b_SESSION_DB,
+                                          legacy_filename=b_SESSION_FILE)
+        return _default_store
 
 
 class BaseClient(ProxyClient):
@@ -51,7 +64,10 @@ class BaseClient(ProxyClient):
                  username=None, password=None, httpauth=None,
                  session_cookie=None, session_id=None,
                  session_name='tg-visit', cache_session=True,
-                 retries=None, timeout=None):
+                 retries=None, timeout=None, transport=None,
+                 retry_policy=None, circuit_breaker=None,
+                 response_type='munch', coalesce=False, http_cache=None,
+                 session_store=None):
         '''
         :arg base_url: Base of every URL used to contact the server
         :kwarg useragent: Useragent string to use.  If not given, default to
@@ -74,15 +90,40 @@ class BaseClient(ProxyClient):
         :kwarg session_id: id of the user's session
         :kwarg cache_session: If set to true, cache the user's session data on
             the filesystem between runs
+        :kwarg session_store: :class:`~fedora.client.sessionstore.SessionStore`
+            to cache the session data in.  Defaults to
+            :file:`~/.fedora/baseclient-sessions.sqlite`.
         :kwarg retries: if we get an unknown or possibly transient error from
             the server, retry this many times.  Setting this to a negative
             number makes it try forever.  Defaults to zero, no retries.
         :kwarg timeout: A float describing the timeout of the connection. The
             timeout only affects the connection process itself, not the
             downloading of the response body. Defaults to 120 seconds.
+        :kwarg transport: A
+            :class:`~fedora.client.transport.PooledTransport` to send
+            requests over.  If not given, a new one is created.
+        :kwarg retry_policy: :class:`~fedora.client.retry.RetryPolicy` to
+            use when retrying requests.  Defaults to the policy shared by all
+            clients in the process.
+        :kwarg circuit_breaker: A
+            :class:`~fedora.client.circuitbreaker.CircuitBreakerRegistry` to
+            keep a circuit breaker per server method in or True to create
+            one.  Defaults to None, no circuit breakers.
+        :kwarg response_type: How to return data from the server.  One of
+            ``munch``, ``dict``, or ``lazy``.  Defaults to ``munch``.  See
+            :mod:`fedora.client.responses`.
+        :kwarg coalesce: If True, identical requests made by several threads
+            at the same time share a single call to the server.  See
+            :class:`~fedora.client.ProxyClient`.  Defaults to False.
+        :kwarg http_cache: An :class:`~fedora.client.httpcache.HTTPCache` to
+            keep responses in, True to create one in memory, or a cache
+            specification string.  Defaults to None, no caching.
 
         .. versionchanged:: 0.3.33
             Added the timeout kwarg
+        .. versionchanged:: 1.2.0
+            Added the transport, retry_policy, circuit_breaker,
+            response_type, coalesce, http_cache, and session_store kwargs
         '''
         self.log = log
         self.useragent = useragent or 'Fedora BaseClient/%(version)s' % {
@@ -90,13 +131,17 @@ class BaseClient(ProxyClient):
         super(BaseClient, self).__init__(
             base_url, useragent=self.useragent,
             session_name=session_name, session_as_cookie=False,
-            debug=debug, insecure=insecure, retries=retries, timeout=timeout
+            debug=debug, insecure=insecure, retries=retries, timeout=timeout,
+            transport=transport, retry_policy=retry_policy,
+            circuit_breaker=circuit_breaker, response_type=response_type,
+            coalesce=coalesce, http_cache=http_cache
         )
 
         self.username = username
         self.password = password
         self.httpauth = httpauth
         self.cache_session = cache_session
+        self._session_store = session_store
         self._session_id = None
         if session_id:
             self.session_id = session_id
@@ -107,51 +152,13 @@ class BaseClient(ProxyClient):
             if session_id:
                 self.session_id = session_id.value
 
-    def __load_ids(self):
-        '''load id data from a file.
-
-        :Returns: Complete mapping of users to session ids
-        '''
-        saved_session = {}
-        session_file = None
-        if path.isfile(b_SESSION_FILE):
-            try:
-                with open(b_SESSION_FILE, 'rb') as session_file:
-                    saved_session = pickle.load(session_file)
-            except (IOError, EOFError):
-                self.log.info('Unable to load session from %(file)s' %
-                              {'file': b_SESSION_FILE})
-
-        return saved_session
-
-    def __save_ids(self, save):
-        '''Save the cached ids file.
-
-        :arg save: The dict of usernames to ids to save.
-        '''
-        # Make sure the directory exists
-        if not path.isdir(b_SESSION_DIR):
-            try:
-                os.mkdir(b_SESSION_DIR, 0o755)
-            except OSError as e:
-                self.log.warning('Unable to create %(dir)s: %(error)s' %
-                                 {'dir': b_SESSION_DIR, 'error': to_bytes(e)})
-
-        try:
-            with open(b_SESSION_FILE, 'wb') as session_file:
-                os.chmod(b_SESSION_FILE, stat.S_IRUSR | stat.S_IWUSR)
-                pickle.dump(save, session_file)
-        except Exception as e:  # pylint: disable-msg=W0703
-            # If we can't save the file, issue a warning but go on.  The
-            # session just keeps you from having to type your password over
-            # and over.
-            self.log.warning(
-                'Unable to write to session file %(session)s:'
-                ' %(error)s' % {
-                    'session': b_SESSION_FILE, 'error':
-                    to_bytes(e)
-                }
-            )
+    @property
+    def session_store(self):
+        '''The :class:`~fedora.client.sessionstore.SessionStore` that
+        session ids are cached in.'''
+        if self._session_store is None:
+            self._session_store = _get_default_store()
+        return self._session_store
 
     def _get_session_id(self):
         '''Attempt to retrieve the session id from the filesystem.
@@ -166,10 +173,8 @@ class BaseClient(ProxyClient):
         if not self.username:
             self._session_id = ''
         else:
-            saved_sessions = self.__load_ids()
-            self._session_id = saved_sessions.get(self.username, '')
-        if isinstance(self._session_id, Cookie.SimpleCookie):
-            self._session_id = ''
+            self._session_id = self.session_store.get(self.base_url,
+                                                      self.username)
 
         if not self._session_id:
             self.log.debug(
@@ -178,35 +183,26 @@ class BaseClient(ProxyClient):
         return self._session_id
 
     def _set_session_id(self, session_id):
-        '''Store our pickled session id.
+        '''Store our session id.
 
         :arg session_id: id to set our internal id to
 
-        This method loads our existing session file and modifies our
-        current user's id.  This allows us to retain ids for
-        multiple users.
+        Only the current user's id for this server is written to the
+        :attr:`session_store`.  This allows us to retain ids for multiple
+        users.
+
+        .. versionchanged:: 1.2.0
+            Save to the :attr:`session_store` instead of rewriting a pickle
+            file of every user's session
         '''
-        # Start with the previous users
         if self.cache_session and self.username:
-            save = self.__load_ids()
-            save[self.username] = session_id
-            # Save the ids to the filesystem
-            self.__save_ids(save)
+            self.session_store.set(self.base_url, self.username, session_id)
         self._session_id = session_id
 
     def _del_session_id(self):
         '''Delete the session id from the filesystem.'''
-        # Start with the previous users
-        save = self.__load_ids()
-        try:
-            del save[self.username]
-        except KeyError:
-            # This is fine we just want the session to exist in the new
-            # session file.
-            pass
-        else:
-            # Save the ids to the filesystem
-            self.__save_ids(save)
+        if self.username:
+            self.session_store.delete(self.base_url, self.username)
         self._session_id = None
 
     session_id = property(_get_session_id, _set_session_id,
@@ -277,8 +273,41 @@ class BaseClient(ProxyClient):
             pass
         del(self.session_id)
 
+    def _auth_params(self, auth):
+        '''Return the auth_params to give to ProxyClient for a request.
+
+        :arg auth: If True, include the credentials needed to authenticate
+        :raises AuthError: if auth is requested but there are no credentials
+        '''
+        auth_params = {'session_id': self.session_id}
+        if auth is True:
+            # We need something to do auth.  Check user/pass
+            if self.username and self.password:
+                # Add the username and password and we're all set
+                auth_params['username'] = self.username
+                auth_params['password'] = self.password
+                if self.httpauth:
+                    auth_params['httpauth'] = self.httpauth
+            else:
+                # No?  Check for session_id
+                if not self.session_id:
+                    # Not enough information to auth
+                    raise AuthError(
+                        'Auth was requested but no way to'
+                        ' perform auth was given.  Please set username'
+                        ' and password or session_id before calling'
+                        ' this function with auth=True')
+
+        # Remove empty params
+        # pylint: disable-msg=W0104
+        [auth_params.__delitem__(key)
+            for key, value in list(auth_params.items()) if not value]
+        # pylint: enable-msg=W0104
+        return auth_params
+
     def send_request(self, method, req_params=None, file_params=None,
-                     auth=False, retries=None, timeout=None, **kwargs):
+                     auth=False, retries=None, timeout=None,
+                     response_type=None, **kwargs):
         '''Make an HTTP request to a server method.
 
         The given method is called with any parameters set in req_params.  If
@@ -303,6 +332,9 @@ class BaseClient(ProxyClient):
             downloading of the response body. Default to use the
             :attr:`timeout` value set on the instance or in :meth:`__init__`
             (which defaults to 120s).
+        :kwarg response_type: How to return the data.  One of ``munch``,
+            ``dict``, or ``lazy``.  Defaults to the :attr:`response_type`
+            set on the instance.
 
         :rtype: Bunch
         :returns: The data from the server
@@ -312,6 +344,8 @@ class BaseClient(ProxyClient):
             * Add file_params to allow uploading files
         .. versionchanged:: 0.3.33
             * Added the timeout kwarg
+        .. versionchanged:: 1.2.0
+            * Added the response_type kwarg
         '''
         # Check for deprecated arguments.  This section can go once we hit 0.4
         if len(kwargs) >= 1:
@@ -337,36 +371,78 @@ class BaseClient(ProxyClient):
                 stacklevel=2)
             req_params = kwargs['input']
 
-        auth_params = {'session_id': self.session_id}
-        if auth is True:
-            # We need something to do auth.  Check user/pass
-            if self.username and self.password:
-                # Add the username and password and we're all set
-                auth_params['username'] = self.username
-                auth_params['password'] = self.password
-                if self.httpauth:
-                    auth_params['httpauth'] = self.httpauth
-            else:
-                # No?  Check for session_id
-                if not self.session_id:
-                    # Not enough information to auth
-                    raise AuthError(
-                        'Auth was requested but no way to'
-                        ' perform auth was given.  Please set username'
-                        ' and password or session_id before calling'
-                        ' this function with auth=True')
-
-        # Remove empty params
-        # pylint: disable-msg=W0104
-        [auth_params.__delitem__(key)
-            for key, value in list(auth_params.items()) if not value]
-        # pylint: enable-msg=W0104
+        auth_params = self._auth_params(auth)
 
         session_id, data = super(BaseClient, self).send_request(
             method, req_params=req_params, file_params=file_params,
-            auth_params=auth_params, retries=retries, timeout=timeout)
+            auth_params=auth_params, retries=retries, timeout=timeout,
+            response_type=response_type)
         # In case the server returned a new session id to us
         if self.session_id != session_id:
             self.session_id = session_id
 
         return data
+
+    def send_many(self, batch, max_workers=8, retries=None, timeout=None,
+                  response_type=None):
+        '''Make many independent requests concurrently.
+
+        See :meth:`fedora.client.ProxyClient.send_many` for the details.  If
+        there is no session yet, the first request is made on its own so
+        that the rest of the requests reuse the session it starts.
+
+        :arg batch: iterable of requests.  Each request is either a method
+            name or a tuple of method, ``req_params``, and ``auth`` as given
+            to :meth:`send_request`.  Trailing items of the tuple may be left
+            out.
+        :kwarg max_workers: Maximum number of requests in flight at once.
+            Defaults to 8.
+        :kwarg retries: Number of times to retry each request
+        :kwarg timeout: A float describing the timeout of the connection
+        :kwarg response_type: How to return the data
+        :returns: list with the data returned for each request, in the same
+            order as ``batch``, or the exception raised for it
+
+        .. versionadded:: 1.2.0
+        '''
+        batch = list(batch)
+        results = []
+        if batch and not self.session_id:
+            results = super(BaseClient, self).send_many(
+                batch[:1], max_workers=1, retries=retries, timeout=timeout,
+                response_type=response_type)
+            batch = batch[1:]
+        return results + super(BaseClient, self).send_many(
+            batch, max_workers=max_workers, retries=retries, timeout=timeout,
+            response_type=response_type)
+
+    def _send_spec(self, spec, retries, timeout, response_type):
+        '''Send one request for :meth:`send_many`.'''
+        method, req_params, auth = spec
+        return self.send_request(method, req_params=req_params,
+                                 auth=bool(auth), retries=retries,
+                                 timeout=timeout, response_type=response_type)
+
+    def iter_request(self, method, stream_keys, req_params=None, auth=False,
+                     retries=None, timeout=None):
+        '''Make an HTTP request and decode the response incrementally.
+
+        See :meth:`fedora.client.ProxyClient.iter_request` for the details.
+
+        :arg method: Method to call on the server
+        :arg stream_keys: Keys of the JSON response to decode incrementally
+        :kwarg req_params: Extra parameters to send to the server
+        :kwarg auth: If True perform auth to the server, else do not
+        :kwarg retries: Number of times to retry if the request fails
+        :kwarg timeout: A float describing the timeout of the connection
+        :returns: generator of ``(key, name, value)`` tuples
+
+        .. versionadded:: 1.2.0
+        '''
+        session_id, members = super(BaseClient, self).iter_request(
+            method, stream_keys, req_params=req_params,
+            auth_params=self._auth_params(auth), retries=retries,
+            timeout=timeout)
+        if self.session_id != session_id:
+            self.session_id = session_id
+        return members
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''Circuit breakers that make requests to a failing server fail fast.
+
+A :class:`CircuitBreaker` starts out *closed* and lets every request
+through.  After :attr:`~CircuitBreaker.failure_threshold` consecutive
+failures it *opens* and rejects requests without contacting the server.  Once
+:attr:`~CircuitBreaker.recovery_timeout` seconds have passed it becomes
+*half-open* and lets a limited number of probe requests through.  If the
+probes succeed the breaker closes again, if one fails it reopens.
+
+.. versionadded:: 1.2.0
+'''
+
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker(object):
+    '''Track the failures of one endpoint and decide whether to call it.
+
+    Instances are threadsafe.
+    '''
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0,
+                 half_open_max_calls=1, success_threshold=1):
+        '''Create a circuit breaker.
+
+        :kwarg failure_threshold: Number of consecutive failures that opens
+            the breaker.  Defaults to 5.
+        :kwarg recovery_timeout: Seconds to stay open before letting probe
+            requests through.  Defaults to 30 seconds.
+        :kwarg half_open_max_calls: Number of probe requests allowed in
+            flight at once while half-open.  Defaults to 1.
+        :kwarg success_threshold: Number of successful probes needed to close
+            the breaker again.  Defaults to 1.
+        '''
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.success_threshold = success_threshold
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._successes = 0
+        self._probes = 0
+        self._opened_at = None
+
+    def _update_state(self):
+        # Must be called with the lock held
+        if self._state == OPEN and \
+                time.time() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._successes = 0
+            self._probes = 0
+
+    def _open(self):
+        # Must be called with the lock held
+        self._state = OPEN
+        self._opened_at = time.time()
+        self._failures = 0
+
+    @property
+    def state(self):
+        '''One of :data:`CLOSED`, :data:`OPEN`, or :data:`HALF_OPEN`.'''
+        with self._lock:
+            self._update_state()
+            return self._state
+
+    def allow_request(self):
+        '''Return whether a request may be sent now.
+
+        When this returns True the caller must report the outcome with
+        :meth:`record_success` or :meth:`record_failure`, or call
+        :meth:`release` if the request was abandoned.
+        '''
+        with self._lock:
+            self._update_state()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and \
+                    self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            return False
+
+    def record_success(self):
+        '''Report that a request succeeded.'''
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+                self._successes += 1
+                if self._successes >= self.success_threshold:
+                    log.info('Circuit breaker closed')
+                    self._state = CLOSED
+            self._failures = 0
+
+    def release(self):
+        '''Report that a request was abandoned before it had an outcome.
+
+        Use this when a request is interrupted, for instance by
+        :exc:`KeyboardInterrupt` or because its task was cancelled.  The
+        state does not change but a half-open breaker can send another
+        probe.
+        '''
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+
+    def record_failure(self):
+        '''Report that a request failed.'''
+        with self._lock:
+            if self._state == HALF_OPEN:
+                log.warning('Probe request failed, circuit breaker reopened')
+                self._open()
+            elif self._state == CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    log.warning('Circuit breaker opened after %s failures'
+                                % self._failures)
+                    self._open()
+
+    def status(self):
+        '''Return a dict describing the breaker, suitable for health checks.
+
+        :returns: dict with the ``state``, the number of consecutive
+            ``failures`` while closed, and ``retry_in``, the seconds until
+            an open breaker lets a probe through (else None).
+        '''
+        with self._lock:
+            self._update_state()
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = max(self._opened_at + self.recovery_timeout -
+                               time.time(), 0)
+            return {'state': self._state, 'failures': self._failures,
+                    'retry_in': retry_in}
+
+
+class CircuitBreakerRegistry(object):
+    '''A set of :class:`CircuitBreaker` objects, one per endpoint.
+
+    Breakers are created the first time an endpoint is used.  All of them
+    share the settings given to the constructor.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Create a registry.
+
+        :kwarg kwargs: Arguments for every :class:`CircuitBreaker` that is
+            created.
+        '''
+        self.breaker_kwargs = kwargs
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint):
+        '''Return the breaker for ``endpoint``, creating it if needed.'''
+        try:
+            return self._breakers[endpoint]
+        except KeyError:
+            with self._lock:
+                if endpoint not in self._breakers:
+                    self._breakers[endpoint] = CircuitBreaker(
+                        **self.breaker_kwargs)
+                return self._breakers[endpoint]
+
+    def states(self):
+        '''Return a dict mapping each endpoint to its breaker's state.'''
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return dict((endpoint, breaker.state)
+                    for endpoint, breaker in breakers)
+
+    def status(self):
+        '''Return a dict mapping endpoints to :meth:`CircuitBreaker.status`.'''
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return dict((endpoint, breaker.status())
+                    for endpoint, breaker in breakers)
+
+
+__all__ = ('CircuitBreaker', 'CircuitBreakerRegistry', 'CLOSED', 'OPEN',
+           'HALF_OPEN')
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''Save the cookies of :class:`~fedora.client.OpenIdBaseClient` sessions.
+
+Each session key (server and username) is saved to its own file so saving
+one session never reads or rewrites the others.  Saves are written behind:
+:meth:`CookieStore.save` only records the cookies, and they are written
+``delay`` seconds later, together with any other saves made in the
+meantime.  Saving cookies that have not changed does nothing.  Pending
+saves are written when the interpreter exits.
+
+Older versions kept every session in a single JSON file.  Sessions that
+have no file of their own yet are read from there.
+
+.. versionadded:: 1.2.0
+'''
+
+import atexit
+from hashlib import sha1
+import json
+import logging
+import os
+import tempfile
+import threading
+import weakref
+
+from kitchen.text.converters import to_bytes
+
+from fedora.client import UnsafeFileError, check_file_permissions
+
+log = logging.getLogger(__name__)
+
+# Stores with saves that may still be pending.  Stores are not kept alive by
+# this: one with a pending save is referenced by its timer.
+_stores = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_stores():
+    '''Write the pending saves of every store when the program exits.'''
+    for store in list(_stores):
+        store.flush()
+
+
+class CookieStore(object):
+    '''Write-behind store of cookies keyed by session key.
+
+    Instances are threadsafe.
+    '''
+
+    def __init__(self, directory, legacy_filename=None, delay=1.0):
+        '''Create the store.
+
+        :arg directory: Directory to keep one file per session in.  It is
+            created readable by its owner only.
+        :kwarg legacy_filename: JSON file of every session written by older
+            versions to read sessions from that have no file of their own
+        :kwarg delay: Seconds to wait before writing a save so that several
+            saves are written at once.  If 0, saves are written immediately.
+            Defaults to 1 second.
+        '''
+        self.directory = directory
+        self.legacy_filename = legacy_filename
+        self.delay = delay
+        self._lock = threading.Lock()
+        # Cookies as last read or saved, by session key
+        self._cookies = {}
+        self._dirty = set()
+        self._timer = None
+        self._legacy = None
+        _stores.add(self)
+
+    def _path(self, session_key):
+        return os.path.join(self.directory,
+                            sha1(to_bytes(session_key)).hexdigest())
+
+    def load(self, session_key):
+        '''Return the saved cookies for a session.
+
+        The file is only read the first time a session is loaded.
+
+        :arg session_key: Key of the session
+        :returns: list of ``(name, value)`` pairs.  Empty if nothing was
+            saved.
+        '''
+        with self._lock:
+            if session_key not in self._cookies:
+                self._cookies[session_key] = self._read(session_key)
+            return list(self._cookies[session_key])
+
+    def _read(self, session_key):
+        path = self._path(session_key)
+        try:
+            check_file_permissions(path, True)
+            with open(path, 'rb') as cookie_file:
+                return [tuple(cookie) for cookie in
+                        json.loads(cookie_file.read().decode('utf-8'))]
+        except UnsafeFileError as e:
+            log.debug('Saved session ignored: {0}'.format(e))
+            return []
+        except (IOError, OSError):
+            pass
+        except ValueError:
+            log.warning('Unable to read saved session {0}'.format(path))
+            return []
+        return [tuple(cookie)
+                for cookie in self._legacy_sessions().get(session_key, [])]
+
+    def _legacy_sessions(self):
+        '''Read the file of every session that older versions wrote.'''
+        if self._legacy is None:
+            self._legacy = {}
+            if self.legacy_filename and \
+                    os.path.isfile(self.legacy_filename):
+                try:
+                    check_file_permissions(self.legacy_filename, True)
+                    with open(self.legacy_filename, 'rb') as legacy_file:
+                        self._legacy = json.loads(
+                            legacy_file.read().decode('utf-8'))
+                except Exception as e:  # pylint: disable-msg=W0703
+                    log.debug('Old sessions ignored: {0}'.format(e))
+        return self._legacy
+
+    def save(self, session_key, cookies):
+        '''Save the cookies of a session.
+
+        :arg session_key: Key of the session
+        :arg cookies: iterable of ``(name, value)`` pairs
+        '''
+        cookies = [tuple(cookie) for cookie in cookies]
+        with self._lock:
+            if self._cookies.get(session_key) == cookies:
+                return
+            self._cookies[session_key] = cookies
+            self._dirty.add(session_key)
+            if not self.delay:
+                self._write_dirty()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        '''Write the pending saves now.'''
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._write_dirty()
+
+    def _write_dirty(self):
+        '''Write the sessions that changed.  Must be called with the lock
+        held.'''
+        if not self._dirty:
+            return
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory, 0o700)
+        except OSError as e:
+            log.warning('Unable to create {0}: {1}'.format(self.directory, e))
+            self._dirty.clear()
+            return
+        for session_key in self._dirty:
+            data = json.dumps(self._cookies[session_key]).encode('utf-8')
+            tmp_path = None
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory,
+                                                prefix='.tmp')
+                with os.fdopen(fd, 'wb') as cookie_file:
+                    cookie_file.write(data)
+                os.rename(tmp_path, self._path(session_key))
+            except (IOError, OSError) as e:
+                # The saved session only keeps the user from having to log
+                # in again so go on without it
+                log.warning('Unable to save session: {0}'.format(e))
+                if tmp_path and os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+        self._dirty.clear()
+
+
+__all__ = ('CookieStore',)
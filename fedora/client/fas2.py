@@ -24,12 +24,16 @@ Provide a client module for talking to the Fedora Account System.
 .. moduleauthor:: Toshio Kuratomi <tkuratom@redhat.com>
 .. moduleauthor:: Ralph Bean <rbean@redhat.com>
 '''
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import md5
-import itertools
+import os
+import threading
+import time
 import warnings
 
 from munch import Munch
 from kitchen.text.converters import to_bytes
+import requests
 from six.moves.urllib.parse import quote, urlencode
 
 try:
@@ -69,6 +73,80 @@ USERFIELDS = [
     'unverified_email', 'timezone', 'username', 'security_question',
     'security_answer', ]
 
+# Fields kept for each person in the PeopleIndex
+INDEXFIELDS = ['id', 'username', 'email', 'human_name', 'bugzilla_email']
+
+# Seconds to wait before downloading the PeopleIndex again to find people it
+# is missing
+MISSING_PEOPLE_REFRESH = 60
+
+
+class PeopleIndex(object):
+    '''Every person in FAS, indexed by id and by username
+
+    The index is downloaded the first time it is used and again whenever it
+    is older than :attr:`ttl` seconds.  :meth:`refresh` rebuilds it right
+    away.  Each person record holds the fields in :data:`INDEXFIELDS`.
+    Instances are threadsafe.
+
+    .. versionadded:: 1.2.0
+    '''
+
+    def __init__(self, fetch, ttl=300):
+        '''Create the index.
+
+        :arg fetch: Callable returning an iterable of person records
+        :kwarg ttl: Seconds until the index is rebuilt.  Defaults to 300.
+        '''
+        self.fetch = fetch
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_id = None
+        self._by_username = None
+        self._built = 0
+
+    def refresh(self, max_age=None):
+        '''Download the people again.
+
+        :kwarg max_age: If given, only download the people if the index is
+            older than this many seconds
+        :returns: True if the people were downloaded
+        '''
+        if max_age is not None:
+            with self._lock:
+                if self._by_id is not None and \
+                        time.time() - self._built < max_age:
+                    return False
+        by_id = {}
+        by_username = {}
+        for person in self.fetch():
+            by_id[person['id']] = person
+            by_username[person['username']] = person
+        with self._lock:
+            self._by_id = by_id
+            self._by_username = by_username
+            self._built = time.time()
+        return True
+
+    def _current(self):
+        with self._lock:
+            if self._by_id is not None and \
+                    time.time() - self._built < self.ttl:
+                return self._by_id, self._by_username
+        self.refresh()
+        with self._lock:
+            return self._by_id, self._by_username
+
+    @property
+    def by_id(self):
+        '''dict mapping person ids to person records'''
+        return self._current()[0]
+
+    @property
+    def by_username(self):
+        '''dict mapping usernames to person records'''
+        return self._current()[1]
+
 
 class AccountSystem(BaseClient):
     '''An object for querying the Fedora Account System.
@@ -98,6 +176,16 @@ class AccountSystem(BaseClient):
     .. versionchanged:: 0.3.33
         Renamed :meth:`~fedora.client.AccountSystem.gravatar_url` to
         :meth:`~fedora.client.AccountSystem.avatar_url`.
+    .. versionchanged:: 1.2.0
+        Added the :attr:`people_index` attribute
+
+    .. attribute:: people_index
+
+        :class:`PeopleIndex` of everyone in FAS.  It is shared by
+        :meth:`people_by_groupname` and :meth:`people_by_id` so that they
+        don't download every account on each call.  Call its
+        :meth:`~PeopleIndex.refresh` method to pick up changes before its
+        ttl runs out.
     '''
     # proxy is a thread-safe connection to the fas server for verifying
     # passwords of other users
@@ -124,19 +212,28 @@ class AccountSystem(BaseClient):
         :kwargs session_id: user's session_id to connect to the server
         :kwargs cache_session: if set to true, cache the user's session cookie
             on the filesystem between runs.
+        :kwargs people_index_ttl: Seconds to reuse the :attr:`people_index`
+            before downloading it again.  Defaults to 300.
+
+        .. versionchanged:: 1.2.0
+            Added the people_index_ttl kwarg
         '''
+        people_index_ttl = kwargs.pop('people_index_ttl', 300)
         if 'useragent' not in kwargs:
             kwargs['useragent'] = \
                 'Fedora Account System Client/%s' % __version__
 
         super(AccountSystem, self).__init__(base_url, *args, **kwargs)
+        self.people_index = PeopleIndex(
+            lambda: self.iter_people(fields=INDEXFIELDS), ttl=people_index_ttl)
         # We need a single proxy for the class to verify username/passwords
         # against.
         if not self.proxy:
             self.proxy = FasProxyClient(base_url, useragent=self.useragent,
                                         session_as_cookie=False,
                                         debug=self.debug,
-                                        insecure=self.insecure)
+                                        insecure=self.insecure,
+                                        transport=self.transport)
 
         # Preseed a list of FAS accounts with bugzilla addresses
         # This allows us to specify a different email for bugzilla than is
@@ -300,7 +397,8 @@ class AccountSystem(BaseClient):
         self._insecure = insecure
         self.proxy = FasProxyClient(self.base_url, useragent=self.useragent,
                                     session_as_cookie=False, debug=self.debug,
-                                    insecure=insecure)
+                                    insecure=insecure,
+                                    transport=self.transport)
         return insecure
     #: If this attribute is set to True, do not check server certificates
     #: against their CA's.  This means that man-in-the-middle attacks are
@@ -462,6 +560,122 @@ class AccountSystem(BaseClient):
         else:
             return dict()
 
+    def person_by_ids(self, person_ids, fields=None, max_workers=8,
+                      bulk_threshold=50):
+        '''Look up many people by id at once
+
+        If ``fields`` is given and at least ``bulk_threshold`` ids are
+        requested, everyone is retrieved in a single streamed call to
+        ``/user/list`` and the requested people are picked out.  Otherwise
+        :meth:`person_by_id` is called for each id from up to
+        ``max_workers`` threads.
+
+        :arg person_ids: iterable of ids to look up
+        :kwarg fields: Fields to return for each person.  See
+            :meth:`people_by_key` for the valid fields.  The default is to
+            return the full records that :meth:`person_by_id` returns.
+        :kwarg max_workers: Maximum number of requests in flight at once when
+            making one request per person.  Defaults to 8.
+        :kwarg bulk_threshold: Minimum number of ids for which a single
+            request for every account is cheaper than one request per person.
+            Defaults to 50.
+        :returns: dict mapping each id to its person record, to an empty dict
+            if there is no such person, or to the exception that was raised
+            while looking the person up.
+
+        .. versionadded:: 1.2.0
+        '''
+        person_ids = self._unique(int(person_id) for person_id in person_ids)
+        if fields is not None and len(person_ids) >= bulk_threshold:
+            return self._people_from_list(person_ids, 'id', u'*', fields)
+        return self._people_concurrently(self.person_by_id, person_ids,
+                                         fields, max_workers)
+
+    def person_by_usernames(self, usernames, fields=None, max_workers=8,
+                            bulk_threshold=50):
+        '''Look up many people by username at once
+
+        If ``fields`` is given, the people are retrieved with a single call to
+        ``/user/list``.  The call searches for the prefix that all of the
+        usernames share or, if they have none and at least ``bulk_threshold``
+        usernames are requested, for everyone.  Otherwise
+        :meth:`person_by_username` is called for each username from up to
+        ``max_workers`` threads.
+
+        :arg usernames: iterable of usernames to look up
+        :kwarg fields: Fields to return for each person.  See
+            :meth:`people_by_key` for the valid fields.  The default is to
+            return the full records that :meth:`person_by_username` returns.
+        :kwarg max_workers: Maximum number of requests in flight at once when
+            making one request per person.  Defaults to 8.
+        :kwarg bulk_threshold: Minimum number of usernames for which a single
+            request for every account is cheaper than one request per person.
+            Defaults to 50.
+        :returns: dict mapping each username to its person record, to an
+            empty dict if there is no such person, or to the exception that
+            was raised while looking the person up.
+
+        .. versionadded:: 1.2.0
+        '''
+        usernames = self._unique(usernames)
+        if fields is not None and usernames:
+            prefix = os.path.commonprefix(usernames)
+            if prefix or len(usernames) >= bulk_threshold:
+                return self._people_from_list(usernames, 'username',
+                                              prefix + u'*', fields)
+        return self._people_concurrently(self.person_by_username, usernames,
+                                         fields, max_workers)
+
+    @staticmethod
+    def _unique(keys):
+        seen = set()
+        unique_keys = []
+        for key in keys:
+            if key not in seen:
+                seen.add(key)
+                unique_keys.append(key)
+        return unique_keys
+
+    def _people_from_list(self, keys, key, search, fields):
+        '''Pick the people in keys out of one ``/user/list`` call'''
+        results = dict((person_key, dict()) for person_key in keys)
+        try:
+            for person_key, person in self._iter_people(search, fields, key):
+                if person_key in results:
+                    results[person_key] = person
+        except (FedoraServiceError,
+                requests.exceptions.RequestException) as e:
+            # People read before the error are still returned
+            for person_key in keys:
+                if not results[person_key]:
+                    results[person_key] = e
+        return results
+
+    def _people_concurrently(self, lookup, keys, fields, max_workers):
+        '''Call lookup for each of keys from a pool of threads'''
+        def fetch(person_key):
+            try:
+                person = lookup(person_key)
+            except (FedoraServiceError,
+                    requests.exceptions.RequestException) as e:
+                return e
+            if fields is not None and person:
+                person = Munch((field, person.get(field))
+                               for field in fields)
+            return person
+
+        results = {}
+        if not keys:
+            return results
+        # The first request may start a new session.  Make it on its own so
+        # that the other requests all reuse that session.
+        results[keys[0]] = fetch(keys[0])
+        with ThreadPoolExecutor(max_workers) as executor:
+            for person_key, person in zip(keys[1:],
+                                          executor.map(fetch, keys[1:])):
+                results[person_key] = person
+        return results
+
     def avatar_url(self, username, size=64,
                    default=None, lookup_email=True,
                    service=None):
@@ -666,12 +880,53 @@ class AccountSystem(BaseClient):
         .. versionchanged:: 0.3.26
             Fixed to return a list with both people who have signed the CLA
             and have not
+        .. versionchanged:: 1.2.0
+            The response is decoded a person at a time, see
+            :meth:`iter_people`
         '''
         # Make sure we have a valid key value
         if key not in ('id', 'username', 'email'):
             raise KeyError('key must be one of "id", "username", or'
                            ' "email"')
 
+        people = Munch()
+        for person_key, person in self._iter_people(search, fields, key):
+            # Add the person record to the people dict
+            people[person_key] = person
+
+        return people
+
+    def iter_people(self, search=u'*', fields=None):
+        '''Generate people records one at a time
+
+        This returns the same records as :meth:`people_by_key` but decodes
+        the server's response incrementally as it is received.  Use it to go
+        through every account in FAS without holding them all in memory::
+
+            for person in FASCLIENT.iter_people(fields=['username', 'email']):
+                sync_account(person)
+
+        :kwarg search: Pattern to match usernames against.  Defaults to the
+            '*' wildcard which matches everyone.
+        :kwarg fields: Limit the data returned to a specific list of fields.
+            The default is to retrieve all fields.  See :meth:`people_by_key`
+            for the valid fields.
+        :returns: generator of :class:`munch.Munch` person records.  People
+            who have signed the CLA come before those who have not.
+
+        .. versionadded:: 1.2.0
+        '''
+        for dummy, person in self._iter_people(search, fields):
+            yield person
+
+    def _iter_people(self, search, fields, key=None):
+        '''Generate ``(person[key], person)`` pairs from ``/user/list``
+
+        :arg search: Pattern to match usernames against
+        :arg fields: List of fields to return or None for all of them
+        :kwarg key: Field to return alongside each record.  It is retrieved
+            from the server even if it is not in ``fields``.
+        '''
         if fields:
             fields = list(fields)
             for field in fields:
@@ -679,11 +934,11 @@ class AccountSystem(BaseClient):
                     raise KeyError('%(field)s is not a valid field to'
                                    ' filter' % {'field': to_bytes(field)})
         else:
-            fields = USERFIELDS
+            fields = list(USERFIELDS)
 
         # Make sure we retrieve the key value
         unrequested_fields = []
-        if key not in fields:
+        if key and key not in fields:
             unrequested_fields.append(key)
             fields.append(key)
         if 'bugzilla_email' in fields:
@@ -695,17 +950,17 @@ class AccountSystem(BaseClient):
                 unrequested_fields.append('email')
                 fields.append('email')
 
-        request = self.send_request(
-            '/user/list',
+        members = self.iter_request(
+            '/user/list', ('people', 'unapproved_people'),
             req_params={
                 'search': search,
                 'fields': [f for f in fields if f != 'bugzilla_email']
             },
             auth=True)
 
-        people = Munch()
-        for person in itertools.chain(request['people'],
-                                      request['unapproved_people']):
+        for list_name, dummy, person in members:
+            if list_name not in ('people', 'unapproved_people'):
+                continue
             # Retrieve bugzilla_email from our list if necessary
             if 'bugzilla_email' in fields:
                 if person['id'] in self.__bugzilla_email:
@@ -714,16 +969,13 @@ class AccountSystem(BaseClient):
                 else:
                     person['bugzilla_email'] = person['email']
 
-            person_key = person[key]
+            person_key = person[key] if key else None
             # Remove any fields that weren't requested by the user
             if unrequested_fields:
                 for field in unrequested_fields:
                     del person[field]
 
-            # Add the person record to the people dict
-            people[person_key] = person
-
-        return people
+            yield person_key, person
 
     def people_by_id(self):
         '''*Deprecated* Use people_by_key() instead.
@@ -733,6 +985,9 @@ class AccountSystem(BaseClient):
 
         .. versionchanged:: 0.3.21
             Return a Bunch instead of a DictContainer
+        .. versionchanged:: 1.2.0
+            Built from the :attr:`people_index` instead of downloading every
+            account each time
         '''
         warnings.warn(
             "people_by_id() is deprecated and will be removed in"
@@ -740,26 +995,9 @@ class AccountSystem(BaseClient):
             " fields=['human_name', 'email', 'username', 'bugzilla_email'])"
             " instead", DeprecationWarning, stacklevel=2)
 
-        request = self.send_request('/json/user_id', auth=True)
-        user_to_id = {}
         people = Munch()
-        for person_id, username in request['people'].items():
-            person_id = int(person_id)
-            # change userids from string back to integer
-            people[person_id] = {'username': username, 'id': person_id}
-            user_to_id[username] = person_id
-
-        # Retrieve further useful information about the users
-        request = self.send_request('/group/dump', auth=True)
-        for user in request['people']:
-            userid = user_to_id[user[0]]
-            person = people[userid]
-            person['email'] = user[1]
-            person['human_name'] = user[2]
-            if userid in self.__bugzilla_email:
-                person['bugzilla_email'] = self.__bugzilla_email[userid]
-            else:
-                person['bugzilla_email'] = person['email']
+        for person_id, person in self.people_index.by_id.items():
+            people[person_id] = dict(person)
 
         return people
 
@@ -770,13 +1008,28 @@ class AccountSystem(BaseClient):
 
         :arg groupname: Name of the group to look up
         :returns: A list of person objects from the group.  If the group
-            contains no entries, then an empty list is returned.
+            contains no entries, then an empty list is returned.  Members
+            that are not in ``/user/list``, like deleted accounts, are left
+            out.
+
+        .. versionchanged:: 1.2.0
+            Look the members up in the :attr:`people_index` so that only
+            the group is downloaded on each call
         '''
-        people = self.people_by_id()
         group = dict(self.group_by_name(groupname))
         userids = [user[u'person_id'] for user in
                    group[u'approved_roles'] + group[u'unapproved_roles']]
-        return [people[userid] for userid in userids]
+        people = self.people_index.by_id
+        if not all(userid in people for userid in userids):
+            # Someone may have joined FAS after the index was built
+            if self.people_index.refresh(max_age=MISSING_PEOPLE_REFRESH):
+                people = self.people_index.by_id
+        missing = [userid for userid in userids if userid not in people]
+        if missing:
+            self.log.warning('People not found in FAS: %(ids)r' %
+                             {'ids': missing})
+        return [dict(people[userid]) for userid in userids
+                if userid in people]
 
     ### Configs ###
 
@@ -958,3 +1211,46 @@ class AccountSystem(BaseClient):
                     ' information', name='FASError')
         except FedoraServiceError:
             raise
+
+    def iter_group_data(self, force_refresh=None):
+        '''Generate the data returned by :meth:`group_data` one group at a time
+
+        :arg force_refresh: If true, the returned data will be queried from the
+            database, as opposed to memcached.
+        :raises AppError: if the query failed on the server
+        :returns: generator of ``(group name, group data)`` tuples
+
+        .. versionadded:: 1.2.0
+        '''
+        params = {}
+        if force_refresh:
+            params['force_refresh'] = True
+
+        return self._iter_fas_client_data(
+            'json/fas_client/group_data', params,
+            'FAS server unable to retrieve group members')
+
+    def iter_user_data(self):
+        '''Generate the data returned by :meth:`user_data` one user at a time
+
+        :raises AppError: if the query failed on the server
+        :returns: generator of ``(user id, user data)`` tuples
+
+        .. versionadded:: 1.2.0
+        '''
+        return self._iter_fas_client_data(
+            'json/fas_client/user_data', {},
+            'FAS server unable to retrieve user information')
+
+    def _iter_fas_client_data(self, method, params, error_message):
+        '''Stream the ``data`` member of a fas_client method'''
+        success = False
+        for key, name, value in self.iter_request(method, ('data',),
+                                                  req_params=params,
+                                                  auth=True):
+            if key == 'data' and name is not None:
+                yield name, value
+            elif key == 'success':
+                success = value
+        if not success:
+            raise AppError(message=error_message, name='FASError')
@@ -25,6 +25,7 @@
 .. versionadded:: 0.3.17
 '''
 
+from fedora.cacheutils import CredentialCache
 from fedora.client import AuthError, AppError
 from fedora.client.proxyclient import ProxyClient
 from fedora import __version__
@@ -59,7 +60,18 @@ class FasProxyClient(ProxyClient):
             possible against the `BaseClient`. You might turn this option on
             for testing against a local version of a server with a self-signed
             certificate but it should be off in production.
+        :kwarg credential_cache: :class:`~fedora.cacheutils.CredentialCache`
+            that :meth:`verify_password` remembers accepted passwords in, or
+            True for a cache that trusts them for 60 seconds.  Defaults to
+            None, every password is verified with the server.
+
+        .. versionchanged:: 1.2.0
+            Added the credential_cache kwarg
         '''
+        credential_cache = kwargs.pop('credential_cache', None)
+        if credential_cache is True:
+            credential_cache = CredentialCache()
+        self.credential_cache = credential_cache
         if 'useragent' not in kwargs:
             kwargs['useragent'] = 'FAS Proxy Client/%s' % __version__
         if 'session_as_cookie' in kwargs and kwargs['session_as_cookie']:
@@ -122,15 +134,26 @@ class FasProxyClient(ProxyClient):
         :arg username: username to try authenticating
         :arg password: password for the user
         :returns: True if the username/password are valid.  False otherwise.
+
+        .. versionchanged:: 1.2.0
+            Passwords found in the :attr:`credential_cache` are not sent to
+            the server.
         '''
+        cache = self.credential_cache
+        if cache is not None and cache.get(username, password):
+            return True
         try:
             self.send_request('/home',
                               auth_params={'username': username,
                                            'password': password})
         except AuthError:
+            if cache is not None:
+                cache.delete(username)
             return False
         except:
             raise
+        if cache is not None:
+            cache.set(username, password)
         return True
 
     def get_user_info(self, auth_params):
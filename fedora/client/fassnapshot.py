@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''Share one download of the FAS user and group data between processes.
+
+:class:`SnapshotStore` saves the output of
+:meth:`~fedora.client.AccountSystem.user_data` and
+:meth:`~fedora.client.AccountSystem.group_data` to an sqlite file with
+indexes on user id, username, and email.  Scripts that only need to look up
+a few users open the file instead of downloading everything from FAS::
+
+    store = SnapshotStore('/var/cache/fas/snapshot.sqlite', max_age=3600)
+    store.refresh(fas)
+    user = store.user_by_username('toshio')
+
+:meth:`SnapshotStore.refresh` only downloads the data when the snapshot is
+older than ``max_age`` and only one process on the host downloads it at a
+time.  The new snapshot is written to a temporary file and renamed over the
+old one so readers never see a partial snapshot.  Readers open the file
+read-only and memory mapped, so many processes reading it share the pages in
+the OS page cache.
+
+The snapshot contains password hashes if the account that downloaded it may
+see them.  It is created readable only by its owner unless another ``mode``
+is passed to :class:`SnapshotStore`.
+
+.. versionadded:: 1.2.0
+'''
+
+import errno
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: processes are not kept from downloading at the same time
+    fcntl = None
+
+import six
+from six.moves.urllib.parse import quote
+
+SNAPSHOT_FILE = os.path.join(os.path.expanduser('~'), '.fedora',
+                             'fas-snapshot.sqlite')
+
+# Bump when the layout of the tables changes.  Snapshots with another version
+# are treated as missing.
+FORMAT_VERSION = 1
+
+_SCHEMA = (
+    'CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)',
+    'CREATE TABLE users (id TEXT PRIMARY KEY, username TEXT, email TEXT,'
+    ' data TEXT)',
+    'CREATE TABLE groups (name TEXT PRIMARY KEY, data TEXT)',
+)
+
+# Created after the rows are inserted, which is much faster than keeping them
+# up to date during the inserts.
+_INDEXES = (
+    'CREATE INDEX users_username ON users (username)',
+    'CREATE INDEX users_email ON users (email)',
+)
+
+
+class SnapshotStore(object):
+    '''sqlite snapshot of the FAS user and group data.'''
+
+    def __init__(self, path=None, max_age=3600, mmap_size=256 * 1024 * 1024,
+                 mode=0o600):
+        '''Create the store.
+
+        :kwarg path: File to keep the snapshot in.  Defaults to
+            :file:`~/.fedora/fas-snapshot.sqlite`.
+        :kwarg max_age: Seconds after which :meth:`refresh` downloads a new
+            snapshot
+        :kwarg mmap_size: Bytes of the snapshot that sqlite memory maps
+            instead of reading through its own page cache
+        :kwarg mode: Permissions of the snapshot file.  Defaults to 0600.
+            Use 0640 to let the file's group read it too.
+        '''
+        self.path = path or SNAPSHOT_FILE
+        self.mode = mode
+        self.max_age = max_age
+        self.mmap_size = mmap_size
+        self._connection = None
+        self._inode = None
+
+    def _connect(self):
+        '''Return a connection to the current snapshot or None.
+
+        The connection is reopened when the snapshot has been replaced since
+        it was opened.
+        '''
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            self.close()
+            return None
+        if self._connection is not None and inode == self._inode:
+            return self._connection
+
+        self.close()
+        if six.PY3:
+            # The file is never modified once it is in place so sqlite can
+            # skip locking it
+            connection = sqlite3.connect(
+                'file:%s?mode=ro&immutable=1' % quote(self.path), uri=True,
+                check_same_thread=False)
+        else:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute('PRAGMA mmap_size = %d' % self.mmap_size)
+        try:
+            version = connection.execute(
+                "SELECT value FROM metadata WHERE key = 'version'").fetchone()
+        except sqlite3.DatabaseError:
+            version = None
+        if not version or int(version[0]) != FORMAT_VERSION:
+            connection.close()
+            return None
+
+        self._connection = connection
+        self._inode = inode
+        return connection
+
+    def close(self):
+        '''Close the connection to the snapshot.'''
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
+        self._inode = None
+
+    def _query(self, sql, params=()):
+        connection = self._connect()
+        if connection is None:
+            return []
+        return connection.execute(sql, params)
+
+    def metadata(self):
+        '''Return the metadata of the snapshot.
+
+        :returns: dict with the ``created`` time of the snapshot, the
+            ``base_url`` it was downloaded from, and the number of ``users``
+            and ``groups`` in it.  Empty if there is no snapshot.
+        '''
+        metadata = dict(self._query('SELECT key, value FROM metadata'))
+        if 'created' in metadata:
+            metadata['created'] = float(metadata['created'])
+        for key in ('version', 'users', 'groups'):
+            if key in metadata:
+                metadata[key] = int(metadata[key])
+        return metadata
+
+    def age(self):
+        '''Return the age of the snapshot in seconds or None if there is
+        none.'''
+        created = self.metadata().get('created')
+        if created is None:
+            return None
+        return time.time() - created
+
+    def is_stale(self, max_age=None):
+        '''Return True if the snapshot is missing or older than ``max_age``.
+
+        :kwarg max_age: Defaults to the ``max_age`` of the store
+        '''
+        if max_age is None:
+            max_age = self.max_age
+        age = self.age()
+        return age is None or age > max_age
+
+    def _lookup(self, sql, params):
+        for row in self._query(sql, params):
+            return json.loads(row[0])
+        return None
+
+    def user_by_id(self, user_id):
+        '''Return the user data for a user id or None if it is unknown.'''
+        return self._lookup('SELECT data FROM users WHERE id = ?',
+                            (six.text_type(user_id),))
+
+    def user_by_username(self, username):
+        '''Return the user data for a username or None if it is unknown.'''
+        return self._lookup('SELECT data FROM users WHERE username = ?',
+                            (username,))
+
+    def user_by_email(self, email):
+        '''Return the user data for an email address or None if it is
+        unknown.'''
+        return self._lookup('SELECT data FROM users WHERE email = ?',
+                            (email,))
+
+    def group(self, name):
+        '''Return the group data for a group name or None if it is
+        unknown.'''
+        return self._lookup('SELECT data FROM groups WHERE name = ?', (name,))
+
+    def users(self):
+        '''Generate ``(user id, user data)`` tuples for every user.'''
+        for user_id, data in self._query('SELECT id, data FROM users'):
+            yield user_id, json.loads(data)
+
+    def groups(self):
+        '''Generate ``(group name, group data)`` tuples for every group.'''
+        for name, data in self._query('SELECT name, data FROM groups'):
+            yield name, json.loads(data)
+
+    def write(self, users, groups, base_url=None):
+        '''Replace the snapshot.
+
+        :arg users: iterable of ``(user id, user data)`` tuples, like
+            :meth:`~fedora.client.AccountSystem.iter_user_data` returns
+        :arg groups: iterable of ``(group name, group data)`` tuples, like
+            :meth:`~fedora.client.AccountSystem.iter_group_data` returns
+        :kwarg base_url: URL of the FAS server the data came from
+        '''
+        directory = os.path.dirname(self.path) or '.'
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o755)
+        fd, tmp_path = tempfile.mkstemp(
+            prefix='.%s.' % os.path.basename(self.path), dir=directory)
+        try:
+            # mkstemp() makes the file readable by its owner only
+            if self.mode != 0o600:
+                os.fchmod(fd, self.mode)
+        finally:
+            os.close(fd)
+        try:
+            connection = sqlite3.connect(tmp_path)
+            try:
+                # Nothing reads the file until it is complete so sqlite does
+                # not need to protect it against crashes
+                connection.execute('PRAGMA journal_mode = OFF')
+                connection.execute('PRAGMA synchronous = OFF')
+                for statement in _SCHEMA:
+                    connection.execute(statement)
+                cursor = connection.executemany(
+                    'INSERT INTO users VALUES (?, ?, ?, ?)',
+                    ((six.text_type(user_id), user.get('username'),
+                      user.get('email'), json.dumps(user))
+                     for user_id, user in users))
+                user_count = cursor.rowcount
+                cursor = connection.executemany(
+                    'INSERT INTO groups VALUES (?, ?)',
+                    ((name, json.dumps(group)) for name, group in groups))
+                group_count = cursor.rowcount
+                for statement in _INDEXES:
+                    connection.execute(statement)
+                metadata = {'version': FORMAT_VERSION,
+                            'created': repr(time.time()),
+                            'users': user_count, 'groups': group_count}
+                if base_url:
+                    metadata['base_url'] = base_url
+                connection.executemany(
+                    'INSERT INTO metadata VALUES (?, ?)',
+                    ((key, six.text_type(value))
+                     for key, value in metadata.items()))
+                connection.commit()
+            finally:
+                connection.close()
+            with open(tmp_path, 'rb') as snapshot:
+                os.fsync(snapshot.fileno())
+            os.rename(tmp_path, self.path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def refresh(self, fas, max_age=None, force_refresh=None):
+        '''Download a new snapshot if the current one is stale.
+
+        Only one process downloads the data at a time.  Processes that wait
+        for it use the snapshot that process wrote instead of downloading it
+        again.
+
+        :arg fas: :class:`~fedora.client.AccountSystem` to download the data
+            from
+        :kwarg max_age: Defaults to the ``max_age`` of the store
+        :kwarg force_refresh: Passed to
+            :meth:`~fedora.client.AccountSystem.iter_group_data`
+        :returns: True if a new snapshot was downloaded
+        '''
+        if not self.is_stale(max_age):
+            return False
+
+        directory = os.path.dirname(self.path) or '.'
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o755)
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                if not self.is_stale(max_age):
+                    return False
+                self.write(fas.iter_user_data(),
+                           fas.iter_group_data(force_refresh=force_refresh),
+                           base_url=getattr(fas, 'base_url', None))
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        return True
+
+    def load(self):
+        '''Return the snapshot as arguments for an AccountSync.
+
+        Lets a sync engine started by a new process report the changes since
+        the snapshot instead of everything::
+
+            sync = AccountSync(fas, **store.load())
+
+        :returns: dict with the ``users``, ``groups``, and ``last_sync``
+            keyword arguments of :class:`~fedora.client.fassync.AccountSync`
+        '''
+        return {'users': dict(self.users()), 'groups': dict(self.groups()),
+                'last_sync': self.metadata().get('created')}
+
+
+__all__ = ('SnapshotStore', 'SNAPSHOT_FILE')
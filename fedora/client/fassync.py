@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''Keep a local copy of FAS user and group data in sync.
+
+Scripts like fasClient regularly download
+:meth:`~fedora.client.AccountSystem.user_data` and
+:meth:`~fedora.client.AccountSystem.group_data` and regenerate everything
+from them.  :class:`AccountSync` keeps the previous download and reports only
+what changed since then as :class:`Change` events, so the consumers of the
+data (writing ssh keys, generating group files) can do work in proportion to
+the number of changes::
+
+    sync = AccountSync(AccountSystem(username=..., password=...))
+    sync.subscribe(update_ssh_key, kinds=(USER,))
+    while True:
+        sync.sync()
+        time.sleep(300)
+
+The first call to :meth:`AccountSync.sync` reports everything as added.
+
+.. versionadded:: 1.2.0
+'''
+
+from collections import namedtuple
+import time
+
+USER = 'user'
+GROUP = 'group'
+MEMBERSHIP = 'membership'
+
+ADDED = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+
+class Change(namedtuple('Change', 'kind action key old new')):
+    '''One difference between two snapshots.
+
+    .. attribute:: kind
+
+        :data:`USER`, :data:`GROUP`, or :data:`MEMBERSHIP`
+
+    .. attribute:: action
+
+        :data:`ADDED`, :data:`CHANGED`, or :data:`REMOVED`
+
+    .. attribute:: key
+
+        The user id for users, the group name for groups, and a tuple of
+        group name and user id for memberships
+
+    .. attribute:: old
+
+        The previous record (the role for memberships) or None if it was
+        added
+
+    .. attribute:: new
+
+        The current record (the role for memberships) or None if it was
+        removed
+    '''
+    __slots__ = ()
+
+
+def diff(old, new, kind):
+    '''Compare two dicts of records.
+
+    :arg old: dict mapping keys to records in the previous snapshot
+    :arg new: dict mapping keys to records in the current snapshot
+    :arg kind: kind of record to set on the :class:`Change` objects
+    :returns: generator of :class:`Change`
+    '''
+    for key, record in new.items():
+        if key not in old:
+            yield Change(kind, ADDED, key, None, record)
+        elif old[key] != record:
+            yield Change(kind, CHANGED, key, old[key], record)
+    for key, record in old.items():
+        if key not in new:
+            yield Change(kind, REMOVED, key, record, None)
+
+
+def memberships(group):
+    '''Return a dict mapping the members of a group to their role.
+
+    :arg group: group record from
+        :meth:`~fedora.client.AccountSystem.group_data`.  Each field that is
+        a list is taken to be the ids of the members with that role.
+    '''
+    members = {}
+    for role, member_ids in group.items():
+        if isinstance(member_ids, (list, tuple)):
+            for member_id in member_ids:
+                members[member_id] = role
+    return members
+
+
+def diff_memberships(old, new):
+    '''Compare the memberships of two snapshots of groups.
+
+    :arg old: dict mapping group names to groups in the previous snapshot
+    :arg new: dict mapping group names to groups in the current snapshot
+    :returns: generator of :class:`Change` with a ``kind`` of
+        :data:`MEMBERSHIP`
+    '''
+    for name in set(old) | set(new):
+        old_group = old.get(name)
+        new_group = new.get(name)
+        if old_group == new_group:
+            continue
+        old_members = memberships(old_group) if old_group else {}
+        new_members = memberships(new_group) if new_group else {}
+        for change in diff(old_members, new_members, MEMBERSHIP):
+            yield change._replace(key=(name, change.key))
+
+
+# Order in which changes are reported so that records exist before anything
+# refers to them and references are gone before the records are removed.
+_PHASES = {
+    (USER, ADDED): 0, (USER, CHANGED): 0,
+    (GROUP, ADDED): 1, (GROUP, CHANGED): 1,
+    (MEMBERSHIP, ADDED): 2, (MEMBERSHIP, CHANGED): 2,
+    (MEMBERSHIP, REMOVED): 2,
+    (GROUP, REMOVED): 3,
+    (USER, REMOVED): 4,
+}
+
+
+class AccountSync(object):
+    '''Report the changes to FAS users and groups since the last sync.
+
+    .. attribute:: users
+
+        dict mapping user ids to the user records from the last sync
+
+    .. attribute:: groups
+
+        dict mapping group names to the group records from the last sync
+
+    .. attribute:: last_sync
+
+        :func:`time.time` of the last successful sync or None
+    '''
+
+    def __init__(self, fas, users=None, groups=None, last_sync=None):
+        '''Create the sync engine.
+
+        :arg fas: :class:`~fedora.client.AccountSystem` to read the data from
+        :kwarg users: Users from a previous sync to compare against.  Defaults
+            to none, everyone is reported as added by the first sync.
+        :kwarg groups: Groups from a previous sync to compare against
+        :kwarg last_sync: Time of the previous sync
+        '''
+        self.fas = fas
+        self.users = users or {}
+        self.groups = groups or {}
+        self.last_sync = last_sync
+        self._listeners = []
+
+    def subscribe(self, callback, kinds=None):
+        '''Call ``callback`` with each :class:`Change` found by :meth:`sync`.
+
+        :arg callback: Callable taking a :class:`Change`
+        :kwarg kinds: Only report changes of these kinds.  Defaults to all.
+        '''
+        self._listeners.append((callback, kinds))
+
+    def sync(self, force_refresh=None):
+        '''Download the current data and report what changed.
+
+        The user and group data are streamed from the server and compared
+        against the previous sync.  Listeners added with :meth:`subscribe`
+        are called with each change.  Users and groups are added before
+        memberships refer to them and removed after the memberships are.
+
+        The new data only replaces the previous sync once every listener has
+        returned.  If a listener raises, the exception propagates and the
+        next sync reports the same changes again, so listeners may see a
+        change more than once but never miss one.
+
+        :kwarg force_refresh: If true, ask FAS to read the group data from
+            its database instead of its cache
+        :returns: list of :class:`Change`
+        '''
+        users = dict(self.fas.iter_user_data())
+        groups = dict(self.fas.iter_group_data(force_refresh=force_refresh))
+
+        changes = list(diff(self.users, users, USER))
+        changes.extend(diff(self.groups, groups, GROUP))
+        changes.extend(diff_memberships(self.groups, groups))
+        changes.sort(key=lambda change: _PHASES[(change.kind, change.action)])
+
+        for change in changes:
+            for callback, kinds in self._listeners:
+                if kinds is None or change.kind in kinds:
+                    callback(change)
+
+        self.users = users
+        self.groups = groups
+        self.last_sync = time.time()
+        return changes
+
+
+__all__ = ('AccountSync', 'Change', 'diff', 'diff_memberships',
+           'memberships', 'USER', 'GROUP', 'MEMBERSHIP', 'ADDED', 'CHANGED',
+           'REMOVED')
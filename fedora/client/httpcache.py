@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''Cache responses from Fedora Services and revalidate them.
+
+When a :class:`~fedora.client.ProxyClient` is created with an
+:class:`HTTPCache`, responses are kept according to their
+``Cache-Control`` and ``Expires`` headers.  While a response is fresh it is
+returned without contacting the server.  Afterwards, if the server sent an
+``ETag`` or ``Last-Modified`` header, the request is sent with
+``If-None-Match`` or ``If-Modified-Since`` and a ``304 Not Modified`` reply
+is answered from the cache::
+
+    fas = AccountSystem(username=..., password=..., http_cache=True)
+
+Entries are keyed by the URL, the parameters, and a hash of the session and
+credentials the request was made with so that one user is never served
+another user's data.  Responses with ``Cache-Control: no-store`` and
+errors returned by the application are never stored.
+
+.. versionadded:: 1.2.0
+'''
+
+from collections import namedtuple
+from email.utils import mktime_tz, parsedate_tz
+from hashlib import sha1
+import threading
+import time
+
+from kitchen.text.converters import to_bytes
+import six
+
+from fedora.cacheutils import TTLCache, make_cache
+
+
+class CachedResponse(namedtuple('CachedResponse',
+                                'body etag last_modified fresh_until')):
+    '''A response body with the information needed to revalidate it.'''
+    __slots__ = ()
+
+    def is_fresh(self, now=None):
+        '''Return True if the response may be used without asking the
+        server.'''
+        return self.fresh_until > (now or time.time())
+
+    def conditional_headers(self):
+        '''Return the headers that ask the server whether this response is
+        still current.'''
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def parse_cache_control(value):
+    '''Parse a ``Cache-Control`` header into a dict.
+
+    Directives without a value map to True.
+    '''
+    directives = {}
+    for directive in (value or '').split(','):
+        name, _sep, arg = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') if _sep else True
+    return directives
+
+
+def fresh_until(headers, now=None):
+    '''Return the time until which a response may be reused or None if it
+    must not be stored.
+
+    :arg headers: mapping of the response headers
+    :kwarg now: Time the response was received.  Defaults to now.
+    '''
+    if now is None:
+        now = time.time()
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return now
+    try:
+        return now + int(directives['max-age'])
+    except (KeyError, ValueError):
+        pass
+    expires = headers.get('Expires')
+    if expires:
+        parsed = parsedate_tz(expires)
+        if parsed:
+            return mktime_tz(parsed)
+    return now
+
+
+class HTTPCache(object):
+    '''Cache of responses keyed by request and identity.
+
+    .. attribute:: cache
+
+        The cache from :mod:`fedora.cacheutils` that holds the entries
+
+    .. attribute:: stats
+
+        dict counting the responses that were served ``fresh`` from the
+        cache, ``revalidated`` with a ``304 Not Modified``, and ``fetched``
+        from the server
+    '''
+
+    def __init__(self, cache=None, ttl=86400):
+        '''Create the cache.
+
+        :kwarg cache: Cache from :mod:`fedora.cacheutils` to keep the
+            responses in or a string for :func:`~fedora.cacheutils.make_cache`
+            such as ``file:///var/cache/myapp?maxsize=1000``.  Defaults to an
+            in memory cache of 256 responses.  The least recently used
+            responses are dropped when the cache is full.
+        :kwarg ttl: Seconds to keep a response that can be revalidated after
+            it is no longer fresh.  Defaults to a day.
+        '''
+        if cache is None:
+            cache = TTLCache(maxsize=256, ttl=ttl)
+        elif isinstance(cache, six.string_types):
+            cache = make_cache(cache, ttl=ttl)
+        self.cache = cache
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {'fresh': 0, 'revalidated': 0, 'fetched': 0}
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def count(self, name):
+        '''Add one to the ``name`` counter in :attr:`stats`.'''
+        with self._lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def key(url, params, identity):
+        '''Return the cache key for a request.
+
+        :arg url: URL of the request
+        :arg params: dict of parameters sent with the request
+        :arg identity: Sequence of the session id and credentials the request
+            is made with
+        '''
+        key = sha1(to_bytes(url))
+        for name, value in sorted(params.items()):
+            key.update(b'\0' + to_bytes(name) + b'=' + to_bytes(repr(value)))
+        key.update(b'\0\0')
+        for part in identity:
+            key.update(to_bytes(repr(part)) + b'\0')
+        return key.hexdigest()
+
+    def get(self, key):
+        '''Return the :class:`CachedResponse` for ``key`` or None.'''
+        return self.cache.get(key)
+
+    def store(self, key, response, previous=None):
+        '''Cache a response from the server.
+
+        :arg key: Key from :meth:`key`
+        :arg response: :class:`requests.Response` with the full body or, when
+            ``previous`` is given, a ``304 Not Modified`` response
+        :kwarg previous: :class:`CachedResponse` that a ``304`` response
+            revalidated
+        :returns: the :class:`CachedResponse` or None if the response may
+            not be cached
+        '''
+        headers = response.headers
+        until = fresh_until(headers)
+        if until is None:
+            self.cache.delete(key)
+            return None
+        if previous is not None:
+            entry = previous._replace(
+                etag=headers.get('ETag') or previous.etag,
+                last_modified=(headers.get('Last-Modified')
+                               or previous.last_modified),
+                fresh_until=until)
+        else:
+            entry = CachedResponse(response.content, headers.get('ETag'),
+                                   headers.get('Last-Modified'), until)
+        if not (entry.etag or entry.last_modified or entry.is_fresh()):
+            # Nothing to gain from keeping it
+            return entry
+        self.cache.set(key, entry, ttl=max(self.ttl, until - time.time()))
+        return entry
+
+
+__all__ = ('CachedResponse', 'HTTPCache', 'fresh_until',
+           'parse_cache_control')
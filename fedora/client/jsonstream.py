@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''Incremental decoding of large JSON responses.
+
+Some server methods (the FAS ``/user/list`` method for instance) return a
+JSON object with one huge array or object in it.  :func:`iter_members`
+decodes such a response a piece at a time as it is read from the network so
+that the whole document never has to be held in memory at once.
+
+.. versionadded:: 1.2.0
+'''
+
+import codecs
+import json
+
+_WHITESPACE = u' \t\n\r'
+_NUMBER_CHARS = u'0123456789+-.eE'
+
+
+class _Reader(object):
+    '''Read JSON tokens and values from an iterable of utf-8 byte chunks.
+
+    Text that has been consumed is dropped from the buffer whenever more data
+    is read so memory use is bounded by about twice the size of the largest
+    single value.
+    '''
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buf = u''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size=0):
+        '''Read more data into the buffer.
+
+        :kwarg size: Keep reading until more than this many characters are
+            waiting to be consumed.  Defaults to reading one chunk.
+        :returns: False if there was no more data to read, else True
+        '''
+        if self._eof:
+            return False
+        parts = [self._buf[self._pos:]]
+        self._pos = 0
+        length = len(parts[0])
+        read = False
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                parts.append(text)
+                length += len(text)
+                read = True
+                if length > size:
+                    break
+        else:
+            self._eof = True
+            parts.append(self._decoder.decode(b'', True))
+        self._buf = u''.join(parts)
+        return read
+
+    def peek(self):
+        '''Return the next non-whitespace character or '' at end of input.'''
+        while True:
+            buf = self._buf
+            while self._pos < len(buf) and buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(buf):
+                return buf[self._pos]
+            if not self._fill():
+                return u''
+
+    def expect(self, chars):
+        '''Consume the next character, which must be one of ``chars``.'''
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError('Expected one of %r but found %r' %
+                             (chars, char or 'end of input'))
+        self._pos += 1
+        return char
+
+    def value(self):
+        '''Decode and return the next complete JSON value.'''
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except ValueError:
+                # Probably truncated.  Read at least as much again before
+                # trying again so that a value spread over many chunks is
+                # not parsed from the start once per chunk
+                if self._fill(2 * (len(self._buf) - self._pos)):
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if self._buf[self._pos] in _NUMBER_CHARS and \
+                    not self._buf[end:].lstrip(_NUMBER_CHARS) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_members(chunks, stream_keys=()):
+    '''Decode a JSON object incrementally.
+
+    :arg chunks: iterable of byte strings holding a utf-8 encoded JSON object.
+        :meth:`requests.Response.iter_content` returns a suitable iterable.
+    :kwarg stream_keys: Keys of the object whose values should be decoded an
+        element at a time.  These values must be JSON arrays or objects.
+    :returns: generator of ``(key, name, value)`` tuples.  For the members of
+        the object that are not in ``stream_keys``, ``name`` is None and
+        ``value`` is the whole decoded value.  For the values in
+        ``stream_keys``, one tuple is generated per element with ``name``
+        set to the index of the element in an array or to the key of the
+        element in an object.
+    :raises ValueError: if the data is not a JSON object
+    '''
+    reader = _Reader(chunks)
+    reader.expect(u'{')
+    if reader.peek() == u'}':
+        reader.expect(u'}')
+    else:
+        while True:
+            key = reader.value()
+            if not isinstance(key, type(u'')):
+                raise ValueError('Expected a string for the object key but'
+                                 ' found %r' % (key,))
+            reader.expect(u':')
+            if key in stream_keys and reader.peek() in (u'[', u'{'):
+                opener = reader.expect(u'[{')
+                closer = u']' if opener == u'[' else u'}'
+                index = 0
+                if reader.peek() == closer:
+                    reader.expect(closer)
+                else:
+                    while True:
+                        if opener == u'{':
+                            name = reader.value()
+                            reader.expect(u':')
+                        else:
+                            name = index
+                            index += 1
+                        yield key, name, reader.value()
+                        if reader.expect(u',' + closer) == closer:
+                            break
+            else:
+                yield key, None, reader.value()
+            if reader.expect(u',}') == u'}':
+                break
+    if reader.peek():
+        raise ValueError('Extra data after the JSON object')
+
+
+__all__ = ('iter_members',)
@@ -32,33 +32,43 @@
 #   or py2 not both.
 # :E0611: No name $X in module: This was renamed in python3
 
-import json
 import logging
 import os
 
-import lockfile
 import requests
 import requests.adapters
 from requests.packages.urllib3.util import Retry
 from six.moves.urllib.parse import urljoin
 
 from functools import wraps
-from munch import munchify
 from kitchen.text.converters import to_bytes
 
 from fedora import __version__
 from fedora.client import (AuthError,
                            LoginRequiredError,
-                           ServerError,
-                           UnsafeFileError,
-                           check_file_permissions)
+                           ServerError)
+from fedora.client.cookiestore import CookieStore
 from fedora.client.openidproxyclient import (
     OpenIdProxyClient, absolute_url, openid_login)
+from fedora.client.responses import RESPONSE_TYPES, wrap_response
 
 log = logging.getLogger(__name__)
 
 b_SESSION_DIR = os.path.join(os.path.expanduser('~'), '.fedora')
 b_SESSION_FILE = os.path.join(b_SESSION_DIR, 'openidbaseclient-sessions.cache')
+b_COOKIE_DIR = os.path.join(b_SESSION_DIR, 'openidbaseclient-sessions')
+
+_default_cookie_store = None
+
+
+def _get_default_cookie_store():
+    '''Return the :class:`~fedora.client.cookiestore.CookieStore` shared by
+    the clients that were not given one.'''
+    global _default_cookie_store
+    if _default_cookie_store is None:
+        _default_cookie_store = CookieStore(b_COOKIE_DIR,
+                                            legacy_filename=b_SESSION_FILE)
+    return _default_cookie_store
 
 
 def requires_login(func):
@@ -98,7 +108,8 @@ class OpenIdBaseClient(OpenIdProxyClient):
     def __init__(self, base_url, login_url=None, useragent=None, debug=False,
                  insecure=False, openid_insecure=False, username=None,
                  cache_session=True, retries=None, timeout=None,
-                 retry_backoff_factor=0):
+                 retry_backoff_factor=0, response_type='munch',
+                 cookie_store=None):
         """Client for interacting with web services relying on fas_openid auth.
 
         :arg base_url: Base of every URL used to contact the server
@@ -121,6 +132,10 @@ class OpenIdBaseClient(OpenIdProxyClient):
         :kwarg username: Username for establishing authenticated connections
         :kwarg cache_session: If set to true, cache the user's session data on
             the filesystem between runs
+        :kwarg cookie_store: :class:`~fedora.client.cookiestore.CookieStore`
+            to cache the session in when ``cache_session`` is set.  Defaults
+            to a store in :file:`~/.fedora/openidbaseclient-sessions/` shared
+            by all clients in the process.
         :kwarg retries: if we get an unknown or possibly transient error from
             the server, retry this many times.  Setting this to a negative
             number makes it try forever.  Defaults to zero, no retries.
@@ -136,6 +151,15 @@ class OpenIdBaseClient(OpenIdProxyClient):
             ...seconds inbetween attempts.  The backoff factor scales the rate
             at which we back off.   Defaults to 0 (backoff disabled).
             Note that this attribute can only be set at object initialization.
+        :kwarg response_type: How :meth:`send_request` returns data from the
+            server.  One of ``munch``, ``dict``, or ``lazy``.  Defaults to
+            ``munch``.  See :mod:`fedora.client.responses`.
+
+        .. versionchanged:: 1.2.0
+            Added the response_type kwarg
+        .. versionchanged:: 1.2.0
+            Added the cookie_store kwarg.  Each session is saved to its own
+            file and saves are written in the background.
         """
 
         # These are also needed by OpenIdProxyClient
@@ -148,15 +172,17 @@ class OpenIdBaseClient(OpenIdProxyClient):
         self.openid_insecure = openid_insecure
         self.retries = retries
         self.timeout = timeout
+        if response_type not in RESPONSE_TYPES:
+            raise ValueError('response_type must be one of %s' %
+                             ', '.join(RESPONSE_TYPES))
+        self.response_type = response_type
 
         # These are specific to OpenIdBaseClient
         self.username = username
         self.cache_session = cache_session
-        self.cache_lock = lockfile.FileLock(b_SESSION_FILE)
-
-        # Make sure the database for storing the session cookies exists
-        if cache_session:
-            self._initialize_session_cache()
+        if cache_session and cookie_store is None:
+            cookie_store = _get_default_cookie_store()
+        self.cookie_store = cookie_store
 
         # python-requests session.  Holds onto cookies
         self._session = requests.session()
@@ -177,22 +203,21 @@ class OpenIdBaseClient(OpenIdProxyClient):
                     ),
                 ))
 
+        # The session is never replaced so the functions to send requests
+        # with can be looked up once
+        self._authed_verb_dispatcher = {
+            (False, 'POST'): self._session.post,
+            (False, 'GET'): self._session.get,
+            (False, 'PUT'): self._session.put,
+            (False, 'DELETE'): self._session.delete,
+            (True, 'POST'): self._authed_post,
+            (True, 'GET'): self._authed_get,
+            (True, 'PUT'): self._authed_put,
+            (True, 'DELETE'): self._authed_delete}
+
         # See if we have any cookies kicking around from a previous run
         self._load_cookies()
 
-    def _initialize_session_cache(self):
-        # Note -- fallback to returning None on any problems as this isn't
-        # critical.  It just makes it so that we don't have to ask the user
-        # for their password over and over.
-        if not os.path.isdir(b_SESSION_DIR):
-            try:
-                os.makedirs(b_SESSION_DIR, mode=0o750)
-            except OSError as err:
-                log.warning('Unable to create {file}: {error}'.format(
-                    file=b_SESSION_DIR, error=err))
-                self.cache_session = False
-                return None
-
     @requires_login
     def _authed_post(self, url, params=None, data=None, **kwargs):
         """ Return the request object of a post query."""
@@ -217,7 +242,8 @@ class OpenIdBaseClient(OpenIdProxyClient):
         response = self._session.delete(url, params=params, data=data, **kwargs)
         return response
 
-    def send_request(self, method, auth=False, verb='POST', **kwargs):
+    def send_request(self, method, auth=False, verb='POST',
+                     response_type=None, **kwargs):
         """Make an HTTP request to a server method.
 
         The given method is called with any parameters set in req_params.  If
@@ -234,20 +260,17 @@ class OpenIdBaseClient(OpenIdProxyClient):
             files to a single file field, pass the paths as a list of paths.
         :kwarg verb: HTTP verb to use.  GET and POST are currently supported.
             POST is the default.
+        :kwarg response_type: How to return the data.  One of ``munch``,
+            ``dict``, or ``lazy``.  Defaults to the ``response_type`` set on
+            the instance.
+
+        .. versionchanged:: 1.2.0
+            Added the response_type kwarg
         """
         # Decide on the set of auth cookies to use
 
         method = absolute_url(self.base_url, method)
 
-        self._authed_verb_dispatcher = {(False, 'POST'): self._session.post,
-                                        (False, 'GET'): self._session.get,
-                                        (False, 'PUT'): self._session.put,
-                                        (False, 'DELETE'): self._session.delete,
-                                        (True, 'POST'): self._authed_post,
-                                        (True, 'GET'): self._authed_get,
-                                        (True, 'PUT'): self._authed_put,
-                                        (True, 'DELETE'): self._authed_delete}
-
         if 'timeout' not in kwargs:
             kwargs['timeout'] = self.timeout
 
@@ -274,7 +297,7 @@ class OpenIdBaseClient(OpenIdProxyClient):
                     'output': to_bytes(output.text),
                 })
 
-        data = munchify(data)
+        data = wrap_response(data, response_type or self.response_type)
 
         return data
 
@@ -298,16 +321,19 @@ class OpenIdBaseClient(OpenIdProxyClient):
         # collide various cookies, and clear every cookie we had up until now
         # for this service.
         self._session.cookies.clear()
-        self._save_cookies()
-
-        response = openid_login(
-            session=self._session,
-            login_url=self.login_url,
-            username=username,
-            password=password,
-            otp=otp,
-            openid_insecure=self.openid_insecure)
-        self._save_cookies()
+
+        try:
+            response = openid_login(
+                session=self._session,
+                login_url=self.login_url,
+                username=username,
+                password=password,
+                otp=otp,
+                openid_insecure=self.openid_insecure)
+        finally:
+            # Saves the new session or, if the login failed, that there is
+            # no longer a session
+            self._save_cookies()
         return response
 
     @property
@@ -321,50 +347,18 @@ class OpenIdBaseClient(OpenIdProxyClient):
         if not self.cache_session:
             return
 
-        try:
-            check_file_permissions(b_SESSION_FILE, True)
-        except UnsafeFileError as e:
-            log.debug('Current sessions ignored: {}'.format(str(e)))
-            return
-
-        try:
-            with self.cache_lock:
-                with open(b_SESSION_FILE, 'rb') as f:
-                    data = json.loads(f.read().decode('utf-8'))
-            for key, value in data[self.session_key]:
-                self._session.cookies[key] = value
-        except KeyError:
+        cookies = self.cookie_store.load(self.session_key)
+        if not cookies:
             log.debug("No pre-existing session for %s" % self.session_key)
-        except IOError:
-            # The file doesn't exist, so create it.
-            log.debug("Creating %s", b_SESSION_FILE)
-            oldmask = os.umask(0o027)
-            with open(b_SESSION_FILE, 'wb') as f:
-                f.write(json.dumps({}).encode('utf-8'))
-            os.umask(oldmask)
+        for key, value in cookies:
+            self._session.cookies[key] = value
 
     def _save_cookies(self):
         if not self.cache_session:
             return
 
-        with self.cache_lock:
-            try:
-                check_file_permissions(b_SESSION_FILE, True)
-                with open(b_SESSION_FILE, 'rb') as f:
-                    data = json.loads(f.read().decode('utf-8'))
-            except UnsafeFileError as e:
-                log.debug('Clearing sessions: {}'.format(str(e)))
-                os.unlink(b_SESSION_FILE)
-                data = {}
-            except Exception:
-                log.warn("Failed to open cookie cache before saving.")
-                data = {}
-
-            oldmask = os.umask(0o027)
-            data[self.session_key] = self._session.cookies.items()
-            with open(b_SESSION_FILE, 'wb') as f:
-                f.write(json.dumps(data).encode('utf-8'))
-            os.umask(oldmask)
+        self.cookie_store.save(self.session_key,
+                               self._session.cookies.items())
 
 
 __all__ = ('OpenIdBaseClient', 'requires_login')
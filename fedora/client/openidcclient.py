@@ -22,16 +22,39 @@
 Implementation note: this implementation hardcodes certain endpoints at the IdP
 to the ones as implemented by Ipsilon 2.0 and higher.
 
+:class:`OpenIDCBaseClient` keeps the access tokens it uses in memory and
+refreshes them shortly before they expire.  Only one thread of a process,
+and only one of the processes sharing a ``cachedir``, refreshes a token at a
+time; the others wait for it and then use the new token.  A request that
+gets a ``401 Unauthorized`` is retried once with a refreshed token.
+
 .. moduleauthor:: Patrick Uiterwijk <puiterwijk@redhat.com>
 
 .. versionadded: 0.3.35
 
 """
 
+from copy import copy
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: only the threads of this process are kept from refreshing
+    # the same token
+    fcntl = None
+
+import requests
+
 from fedora import __version__
 
 from openidc_client import OpenIDCClient
 
+log = logging.getLogger(__name__)
+
 PROD_IDP = 'https://id.fedoraproject.org/openidc/'
 STG_IDP = 'https://id.stg.fedoraproject.org/openidc/'
 DEV_IDP = 'https://iddev.fedorainfracloud.org/openidc/'
@@ -39,7 +62,8 @@ DEV_IDP = 'https://iddev.fedorainfracloud.org/openidc/'
 
 class OpenIDCBaseClient(OpenIDCClient):
     def __init__(self, app_identifier, id_provider, client_id,
-                 client_secret=None, use_post=False, cachedir=None):
+                 client_secret=None, use_post=False, cachedir=None,
+                 refresh_margin=60):
         """Client for interacting with web services relying on OpenID Connect.
 
         :arg app_identifier: Identifier for storage of retrieved tokens
@@ -51,6 +75,12 @@ class OpenIDCBaseClient(OpenIDCClient):
         :kwarg cachedir: The directory in which to store the token caches. Will
             be put through expanduer. Default is ~/.fedora. If this does not
             exist and we are unable to create it, the OSError will e thrown up.
+        :kwarg refresh_margin: Refresh access tokens this many seconds before
+            they expire.  Defaults to 60.
+
+        .. versionchanged:: 1.2.0
+            Added the refresh_margin kwarg.  Tokens are kept in memory and
+            refreshed before they expire.
         """
         if cachedir is None:
             cachedir = '~/.fedora/'
@@ -64,3 +94,180 @@ class OpenIDCBaseClient(OpenIDCClient):
             use_post=use_post,
             useragent='Python-Fedora/%s' % __version__,
             cachedir=cachedir)
+        self.refresh_margin = refresh_margin
+        # (uuid, access_token, expires_at) of the token to use, by frozenset
+        # of the scopes it was requested for
+        self._tokens = {}
+        self._token_lock = threading.Lock()
+        self._session = requests.Session()
+        self._session.headers['User-Agent'] = self.useragent
+
+    @property
+    def _lockfile(self):
+        return os.path.join(self.cachedir, 'oidc_%s.lock' % self.app_id)
+
+    def get_token(self, scopes, new_token=True):
+        """Return an access token that has the given scopes.
+
+        A token that is not about to expire is returned from memory.
+        Otherwise the token cache is read again, in case another process
+        refreshed the token, and the token is refreshed if needed.
+
+        :arg scopes: list of scopes the token must have
+        :kwarg new_token: If True and there is no token that can be used, ask
+            the user to authorize a new one.
+        :returns: The access token or None
+
+        .. versionchanged:: 1.2.0
+            Tokens are kept in memory and refreshed before they expire.
+        """
+        if not isinstance(scopes, list):
+            raise ValueError('Scopes must be a list')
+        entry = self._tokens.get(frozenset(scopes))
+        if entry is None or \
+                entry[2] - self.refresh_margin <= time.time():
+            entry = self._renew(scopes, new_token)
+            if entry is None:
+                return None
+        self.last_returned_uuid = entry[0]
+        self.problem_reported = False
+        return entry[1]
+
+    def _find_token(self, scopes):
+        """Return the uuid and token of the cached token with ``scopes``
+        that expires last or None."""
+        found = None
+        for uuid, token in list(self._cache.items()):
+            if token['idp'] != self.idp or \
+                    not set(scopes).issubset(token['scopes']):
+                continue
+            if found is None or token['expires_at'] > found[1]['expires_at']:
+                found = (uuid, token)
+        return found
+
+    def _remember(self, scopes, uuid, token):
+        entry = (uuid, token['access_token'], token['expires_at'])
+        self._tokens[frozenset(scopes)] = entry
+        return entry
+
+    def _renew(self, scopes, new_token, stale=None):
+        """Find or refresh a token for ``scopes``.
+
+        Threads wait on each other and processes on a lock file so that
+        only one of them refreshes the token.  The others use the token it
+        got.  Where :mod:`fcntl` is not available, only the threads are
+        kept from refreshing at the same time.
+
+        :arg scopes: list of scopes the token must have
+        :arg new_token: If True and no token can be refreshed, ask the user
+            to authorize a new one
+        :kwarg stale: Access token that the server rejected.  It is
+            refreshed even if it has not expired yet.
+        :returns: tuple of the token's uuid, access token and expiration time
+            or None
+        """
+        with self._token_lock:
+            if fcntl is None:
+                return self._renew_locked(scopes, new_token, stale)
+            with open(self._lockfile, 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    return self._renew_locked(scopes, new_token, stale)
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _renew_locked(self, scopes, new_token, stale):
+        now = time.time()
+        entry = self._tokens.get(frozenset(scopes))
+        if entry is not None and entry[1] != stale and \
+                entry[2] - self.refresh_margin > now:
+            # Another thread renewed it while we waited
+            return entry
+
+        self._refresh_cache()
+        found = self._find_token(scopes)
+        if found is not None:
+            uuid, token = found
+            if token['access_token'] != stale and \
+                    token['expires_at'] - self.refresh_margin > now:
+                return self._remember(scopes, uuid, token)
+            try:
+                refreshed = self._refresh_token(uuid)
+            except requests.exceptions.RequestException as e:
+                if stale is None and token['expires_at'] > now:
+                    # The token still works for a little while
+                    log.warning('Unable to refresh token: %s', e)
+                    return self._remember(scopes, uuid, token)
+                raise
+            if refreshed:
+                return self._remember(scopes, uuid, self._cache[uuid])
+            self._delete_token(uuid)
+
+        self._tokens.pop(frozenset(scopes), None)
+        if not new_token:
+            return None
+        uuid = self._get_new_token(scopes)
+        if not uuid:
+            return None
+        return self._remember(scopes, uuid, self._cache[uuid])
+
+    def report_token_issue(self):
+        """Report an error with the last token that was returned.
+
+        See :meth:`openidc_client.OpenIDCClient.report_token_issue`.
+        """
+        self._tokens.clear()
+        return super(OpenIDCBaseClient, self).report_token_issue()
+
+    def send_request(self, *args, **kwargs):
+        """Make a python-requests request with an access token.
+
+        Takes the arguments of :meth:`requests.Session.request` except the
+        method, plus the following keyword arguments.  If the server replies
+        ``401 Unauthorized``, the token is refreshed and the request is sent
+        once more.
+
+        :kwarg scopes: Scopes required for this call.  Required.
+        :kwarg new_token: If True, ask the user to authorize a new token if
+            there is no token with ``scopes``.  Defaults to True.
+        :kwarg auto_refresh: If False, return a ``401`` response instead of
+            refreshing the token and retrying.  Defaults to True.
+        :kwarg http_method: HTTP method to use.  Defaults to POST.
+        :returns: :class:`requests.Response` or None if there is no token
+
+        .. versionchanged:: 1.2.0
+            Safe to call from several threads at once.  Connections are
+            reused between requests.
+        """
+        kwargs = copy(kwargs)
+        scopes = kwargs.pop('scopes')
+        new_token = kwargs.pop('new_token', True)
+        auto_refresh = kwargs.pop('auto_refresh', True)
+        method = kwargs.pop('http_method', 'POST')
+
+        token = self.get_token(scopes, new_token=new_token)
+        if not token:
+            return None
+        response = self._send(method, token, args, kwargs)
+        if response.status_code != 401 or not auto_refresh:
+            return response
+
+        entry = self._renew(scopes, False, stale=token)
+        if entry is None:
+            return response
+        return self._send(method, entry[1], args, kwargs)
+
+    def _send(self, method, token, args, kwargs):
+        kwargs = copy(kwargs)
+        if self.use_post:
+            if 'json' in kwargs:
+                raise ValueError('Cannot provide json in a post call')
+            if method not in ['POST']:
+                raise ValueError('Cannot use POST tokens in %s method' %
+                                 method)
+            kwargs['data'] = dict(kwargs.get('data') or {},
+                                  access_token=token)
+        else:
+            kwargs['headers'] = dict(kwargs.get('headers') or {},
+                                     Authorization='Bearer %s' % token)
+        return self._session.request(method, *args, **kwargs)
@@ -27,7 +27,10 @@
 """
 
 import copy
+import hashlib
+import hmac
 import logging
+import os
 import re
 # For handling an exception that's coming from requests:
 import ssl
@@ -57,6 +60,8 @@ import urllib3
 
 from fedora import __version__
 from fedora.client import AuthError, ServerError, FedoraServiceError
+from fedora.client.retry import DEFAULT_RETRY_POLICY
+from fedora.client.sessionpool import SessionPool
 
 log = logging.getLogger(__name__)
 log.addHandler(NullHandler())
@@ -157,8 +162,10 @@ class OpenIdProxyClient(object):
     A client to a Fedora Service.  This class is optimized to proxy multiple
     users to a service.  OpenIdProxyClient is designed to be usable by code
     that creates a single instance of this class and uses it in multiple
-    threads. However it is not completely threadsafe.  See the information
-    on setting attributes below.
+    threads.  Each user that logs in through :meth:`send_request` gets their
+    own session from the :attr:`session_pool` so requests for different
+    users can run at the same time.  However it is not completely
+    threadsafe.  See the information on setting attributes below.
 
     If you want something that can manage one user's connection to a Fedora
     Service, then look into using :class:`~fedora.client.OpenIdBaseClient`
@@ -201,7 +208,12 @@ class OpenIdProxyClient(object):
 
         Setting this to a positive integer will retry failed requests to the
         web server this many times.  Setting to a negative integer will retry
-        forever.
+        until the :attr:`retry_policy` gives up.
+
+    .. attribute:: retry_policy
+
+        The :class:`~fedora.client.retry.RetryPolicy` that decides how long
+        to wait between retries and when to stop retrying.
 
     .. attribute:: timeout
 
@@ -209,11 +221,17 @@ class OpenIdProxyClient(object):
         affects the connection process itself, not the downloading of the
         response body. Defaults to 120 seconds.
 
+    .. attribute:: session_pool
+
+        The :class:`~fedora.client.sessionpool.SessionPool` holding the
+        sessions of the users that have logged in.
+
     """
 
     def __init__(self, base_url, login_url=None, useragent=None,
                  session_name='session', debug=False, insecure=False,
-                 openid_insecure=False, retries=None, timeout=None):
+                 openid_insecure=False, retries=None, timeout=None,
+                 retry_policy=None, session_pool=None):
         """Create a client configured for a particular service.
 
         :arg base_url: Base of every URL used to contact the server
@@ -241,7 +259,16 @@ class OpenIdProxyClient(object):
         :kwarg timeout: A float describing the timeout of the connection.
             The timeout only affects the connection process itself, not the
             downloading of the response body. Defaults to 120 seconds.
-
+        :kwarg retry_policy: :class:`~fedora.client.retry.RetryPolicy` to
+            use when retrying requests.  Defaults to a policy with
+            exponential backoff that is shared by all clients in the process.
+        :kwarg session_pool: :class:`~fedora.client.sessionpool.SessionPool`
+            to keep the users' sessions in.  Share one between clients to
+            share the connections to the servers as well.  Defaults to a new
+            pool of 256 sessions.
+
+        .. versionchanged:: 1.2.0
+            Added the retry_policy and session_pool kwargs
         """
         self.debug = debug
         log.debug('proxyclient.__init__:entered')
@@ -273,6 +300,12 @@ class OpenIdProxyClient(object):
             self.timeout = 120.0
         else:
             self.timeout = timeout
+        self.retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+
+        self.session_pool = session_pool or SessionPool()
+        # Passwords are only kept as a digest keyed with a per-instance secret
+        # to check that later requests use the same password.
+        self._session_secret = os.urandom(32)
         log.debug('proxyclient.__init__:exited')
 
     def __get_debug(self):
@@ -315,7 +348,7 @@ class OpenIdProxyClient(object):
             provider and the session used to by this provider.
 
         """
-        session = requests.session()
+        session = self.session_pool.new_session()
         response = openid_login(
             session=session,
             login_url=self.login_url,
@@ -325,6 +358,148 @@ class OpenIdProxyClient(object):
             openid_insecure=self.openid_insecure)
         return (response, session)
 
+    def _send(self, session, verb, url, complete_params, cookies, headers,
+              auth, retries, timeout, unauthorized_ok=False):
+        """Make the request for :meth:`send_request`, retrying according to
+        our policy.
+
+        :kwarg unauthorized_ok: If True, return a 401 Unauthorized response
+            instead of raising so the caller can log in again
+        :returns: the successful :class:`requests.Response`
+        :raises AuthError: if the server rejected our credentials
+        :raises ServerError: if the request timed out or returned an error
+            status and we ran out of retries
+        """
+        retry_state = self.retry_policy.begin(retries)
+        while True:
+            try:
+                response = session.request(
+                    method=verb,
+                    url=url,
+                    data=complete_params,
+                    cookies=cookies,
+                    headers=headers,
+                    auth=auth,
+                    verify=not self.insecure,
+                    timeout=timeout,
+                )
+            except (requests.Timeout, requests.exceptions.SSLError) as err:
+                if isinstance(err, requests.exceptions.SSLError):
+                    # And now we know how not to code a library exception
+                    # hierarchy...  We're expecting that requests is raising
+                    # the following stupidity:
+                    # requests.exceptions.SSLError(
+                    #   urllib3.exceptions.SSLError(
+                    #     ssl.SSLError('The read operation timed out')))
+                    # If we weren't interested in reraising the exception with
+                    # full traceback we could use a try: except instead of
+                    # this gross conditional.  But we need to code defensively
+                    # because we don't want to raise an unrelated exception
+                    # here and if requests/urllib3 can do this sort of
+                    # nonsense, they may change the nonsense in the future
+                    if not (err.args and isinstance(
+                                err.args[0], urllib3.exceptions.SSLError)
+                            and err.args[0].args
+                            and isinstance(err.args[0].args[0], ssl.SSLError)
+                            and err.args[0].args[0].args
+                            and 'timed out' in err.args[0].args[0].args[0]):
+                        # We're only interested in timeouts here
+                        raise
+                log.debug('Request timed out')
+                delay = retry_state.next_delay(-1)
+                if delay is not None:
+                    time.sleep(delay)
+                    continue
+                # Fail and raise an error
+                # Raising our own exception protects the user from the
+                # implementation detail of requests vs pycurl vs urllib
+                raise ServerError(
+                    url, -1, 'Request timed out after %s seconds' % timeout)
+
+            # When the python-requests module gets a response, it attempts to
+            # guess the encoding using chardet (or a fork)
+            # That process can take an extraordinarily long time for long
+            # response.text strings.. upwards of 30 minutes for FAS queries to
+            # /accounts/user/list JSON api!  Therefore, we cut that codepath
+            # off at the pass by assuming that the response is 'utf-8'.  We can
+            # make that assumption because we're only interfacing with servers
+            # that we run (and we know that they all return responses
+            # encoded 'utf-8').
+            response.encoding = 'utf-8'
+
+            # Check for auth failures
+            # Note: old TG apps returned 403 Forbidden on authentication
+            # failures.
+            # Updated apps return 401 Unauthorized
+            # We need to accept both until all apps are updated to return 401.
+            http_status = response.status_code
+            if http_status == 401 and unauthorized_ok:
+                break
+            if http_status in (401, 403):
+                # Wrong username or password
+                log.debug('Authentication failed logging in')
+                raise AuthError(
+                    'Unable to log into server.  Invalid '
+                    'authentication tokens.  Send new username and password'
+                )
+            elif http_status >= 400:
+                delay = retry_state.next_delay(http_status)
+                if delay is not None:
+                    # Retry the request
+                    time.sleep(delay)
+                    continue
+                # Fail and raise an error
+                try:
+                    msg = httplib.responses[http_status]
+                except (KeyError, AttributeError):
+                    msg = 'Unknown HTTP Server Response'
+                raise ServerError(url, http_status, msg)
+            # Successfully returned data
+            break
+
+        return response
+
+    def _session_expired(self, response):
+        """Return True if a response shows that our session was not accepted.
+
+        Instead of returning an error, OpenID protected applications
+        redirect requests without a valid session to their login page.
+        Others answer 401 Unauthorized.  A 403 Forbidden means that the
+        user is not allowed to do this, which logging in again won't fix.
+        """
+        if response.status_code == 401:
+            return True
+        if not response.history:
+            return False
+        return (response.url.startswith(self.login_url)
+                or bool(FEDORA_OPENID_RE.match(response.url)))
+
+    def _authenticated_session(self, username, password, stale=None):
+        """Return a session logged in as ``username``.
+
+        Sessions are cached per username and :attr:`base_url` and reused as
+        long as they are given the same password.  Only one thread logs a
+        user in at a time; the others wait for and reuse its session.
+
+        :arg username: the FAS username to log in as
+        :arg password: the FAS password of the user
+        :kwarg stale: A session that the server rejected.  If it is still
+            the cached session, log in again.
+        :returns: a tuple of the session and whether it was just logged in
+        """
+        digest = hmac.new(self._session_secret, to_bytes(password),
+                          hashlib.sha256).digest()
+        entry = self.session_pool.get((username, self.base_url))
+        with entry.lock:
+            if entry.session is not None and \
+                    hmac.compare_digest(entry.credentials, digest):
+                if stale is None or entry.session is not stale:
+                    return entry.session, False
+            response, session = self.login(username, password, otp=None)
+            entry.session = session
+            entry.credentials = digest
+            return session, True
+
     def send_request(self, method, verb='POST', req_params=None,
                      auth_params=None, file_params=None, retries=None,
                      timeout=None, headers=None):
@@ -369,8 +544,9 @@ class OpenIdProxyClient(object):
             files to a single file field, pass the paths as a list of paths.
         :kwarg retries: if we get an unknown or possibly transient error
             from the server, retry this many times.  Setting this to a
-            negative number makes it try forever.  Default to use the
-            :attr:`retries` value set on the instance or in :meth:`__init__`.
+            negative number retries until the :attr:`retry_policy` gives up.
+            Default to use the :attr:`retries` value set on the instance or
+            in :meth:`__init__`.
         :kwarg timeout: A float describing the timeout of the connection.
             The timeout only affects the connection process itself, not the
             downloading of the response body. Defaults to the :attr:`timeout`
@@ -380,6 +556,9 @@ class OpenIdProxyClient(object):
         :returns: A tuple of session_id and data.
         :rtype: tuple of session information and data from server
 
+        .. versionchanged:: 1.2.0
+            Reuse the session of an earlier login with the same username and
+            password.  Log in again only when the server rejects it.
         """
         log.debug('openidproxyclient.send_request: entered')
 
@@ -440,10 +619,14 @@ class OpenIdProxyClient(object):
         complete_params = req_params or {}
 
         auth = None
+        fresh = True
         if username and password:
-            # OpenID login
-            resp, session = self.login(username, password, otp=None)
+            # OpenID login, reusing the session from an earlier login when
+            # there is one
+            session, fresh = self._authenticated_session(username, password)
             cookies = session.cookies
+        else:
+            session = self.session_pool.new_session()
 
         # If debug, give people our debug info
         log.debug('Creating request %s', to_bytes(url))
@@ -462,92 +645,18 @@ class OpenIdProxyClient(object):
         if timeout is None:
             timeout = self.timeout
 
-        num_tries = 0
-        while True:
-            try:
-                response = session.request(
-                    method=verb,
-                    url=url,
-                    data=complete_params,
-                    cookies=cookies,
-                    headers=headers,
-                    auth=auth,
-                    verify=not self.insecure,
-                    timeout=timeout,
-                )
-            except (requests.Timeout, requests.exceptions.SSLError) as err:
-                if isinstance(err, requests.exceptions.SSLError):
-                    # And now we know how not to code a library exception
-                    # hierarchy...  We're expecting that requests is raising
-                    # the following stupidity:
-                    # requests.exceptions.SSLError(
-                    #   urllib3.exceptions.SSLError(
-                    #     ssl.SSLError('The read operation timed out')))
-                    # If we weren't interested in reraising the exception with
-                    # full traceback we could use a try: except instead of
-                    # this gross conditional.  But we need to code defensively
-                    # because we don't want to raise an unrelated exception
-                    # here and if requests/urllib3 can do this sort of
-                    # nonsense, they may change the nonsense in the future
-                    if not (err.args and isinstance(
-                                err.args[0], urllib3.exceptions.SSLError)
-                            and err.args[0].args
-                            and isinstance(err.args[0].args[0], ssl.SSLError)
-                            and err.args[0].args[0].args
-                            and 'timed out' in err.args[0].args[0].args[0]):
-                        # We're only interested in timeouts here
-                        raise
-                log.debug('Request timed out')
-                if retries < 0 or num_tries < retries:
-                    num_tries += 1
-                    log.debug('Attempt #%s failed', num_tries)
-                    time.sleep(0.5)
-                    continue
-                # Fail and raise an error
-                # Raising our own exception protects the user from the
-                # implementation detail of requests vs pycurl vs urllib
-                raise ServerError(
-                    url, -1, 'Request timed out after %s seconds' % timeout)
-
-            # When the python-requests module gets a response, it attempts to
-            # guess the encoding using chardet (or a fork)
-            # That process can take an extraordinarily long time for long
-            # response.text strings.. upwards of 30 minutes for FAS queries to
-            # /accounts/user/list JSON api!  Therefore, we cut that codepath
-            # off at the pass by assuming that the response is 'utf-8'.  We can
-            # make that assumption because we're only interfacing with servers
-            # that we run (and we know that they all return responses
-            # encoded 'utf-8').
-            response.encoding = 'utf-8'
-
-            # Check for auth failures
-            # Note: old TG apps returned 403 Forbidden on authentication
-            # failures.
-            # Updated apps return 401 Unauthorized
-            # We need to accept both until all apps are updated to return 401.
-            http_status = response.status_code
-            if http_status in (401, 403):
-                # Wrong username or password
-                log.debug('Authentication failed logging in')
-                raise AuthError(
-                    'Unable to log into server.  Invalid '
-                    'authentication tokens.  Send new username and password'
-                )
-            elif http_status >= 400:
-                if retries < 0 or num_tries < retries:
-                    # Retry the request
-                    num_tries += 1
-                    log.debug('Attempt #%s failed', num_tries)
-                    time.sleep(0.5)
-                    continue
-                # Fail and raise an error
-                try:
-                    msg = httplib.responses[http_status]
-                except (KeyError, AttributeError):
-                    msg = 'Unknown HTTP Server Response'
-                raise ServerError(url, http_status, msg)
-            # Successfully returned data
-            break
+        response = self._send(session, verb, url, complete_params,
+                              cookies, headers, auth, retries, timeout,
+                              unauthorized_ok=not fresh)
+        if not fresh and self._session_expired(response):
+            # The server no longer accepts the cached session
+            log.debug('Session for %s expired, logging in again',
+                      to_bytes(username))
+            session, fresh = self._authenticated_session(
+                username, password, stale=session)
+            response = self._send(session, verb, url, complete_params,
+                                  session.cookies, headers, auth, retries,
+                                  timeout)
 
         # In case the server returned a new session cookie to us
         new_session = session.cookies.get(self.session_name, '')
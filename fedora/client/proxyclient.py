@@ -23,23 +23,33 @@
 .. moduleauthor:: Ralph Bean <rbean@redhat.com>
 '''
 
+from concurrent.futures import ThreadPoolExecutor
 import copy
 from hashlib import sha1
+import json
 import logging
 # For handling an exception that's coming from requests:
 import ssl
 import time
 import warnings
 
-from munch import munchify
 from kitchen.text.converters import to_bytes
 import requests
+import six
 from six.moves import http_client as httplib
 from six.moves import http_cookies as Cookie
 from six.moves.urllib.parse import quote, urljoin, urlparse
 
 from fedora import __version__
-from fedora.client import AppError, AuthError, ServerError
+from fedora.client import AppError, AuthError, FedoraServiceError, \
+    ServerError
+from fedora.client.circuitbreaker import CircuitBreakerRegistry
+from fedora.client.httpcache import HTTPCache
+from fedora.client.jsonstream import iter_members
+from fedora.client.responses import RESPONSE_TYPES, wrap_response
+from fedora.client.retry import DEFAULT_RETRY_POLICY
+from fedora.client.singleflight import SingleFlight
+from fedora.client.transport import PooledTransport
 
 log = logging.getLogger(__name__)
 
@@ -98,7 +108,29 @@ class ProxyClient(object):
 
         Setting this to a positive integer will retry failed requests to the
         web server this many times.  Setting to a negative integer will retry
-        forever.
+        until the :attr:`retry_policy` gives up.
+
+    .. attribute:: retry_policy
+
+        The :class:`~fedora.client.retry.RetryPolicy` that decides how long
+        to wait between retries and when to stop retrying.  Its counters can
+        be used for metrics.
+
+    .. attribute:: circuit_breaker
+
+        :data:`None` or a
+        :class:`~fedora.client.circuitbreaker.CircuitBreakerRegistry` with a
+        circuit breaker for each server method.  While a method's breaker is
+        open, :meth:`send_request` raises :exc:`~fedora.client.ServerError`
+        right away instead of contacting the server.  Use
+        :meth:`~fedora.client.circuitbreaker.CircuitBreakerRegistry.status`
+        to report on the breakers in health checks.
+
+    .. attribute:: response_type
+
+        How :meth:`send_request` returns the data from the server.  One of
+        ``munch`` (the default), ``dict``, or ``lazy``.  See
+        :mod:`fedora.client.responses`.
 
     .. attribute:: timeout
 
@@ -106,15 +138,30 @@ class ProxyClient(object):
         affects the connection process itself, not the downloading of the
         response body. Defaults to 120 seconds.
 
+    .. attribute:: transport
+
+        The :class:`~fedora.client.transport.PooledTransport` that requests
+        are sent over.  Connections to the server are kept alive and reused
+        by all the threads using this :class:`ProxyClient`.  The transport
+        can be shared with other clients by passing it to their constructor.
+
     .. versionchanged:: 0.3.33
         Added the timeout attribute
+    .. versionchanged:: 1.2.0
+        Added the transport, retry_policy, circuit_breaker, and
+        response_type attributes
     '''
     log = log
+    # Exceptions from the transport which mean we couldn't talk to the server
+    _connection_errors = (requests.exceptions.RequestException,)
 
     def __init__(self, base_url, useragent=None, session_name='tg-visit',
                  session_as_cookie=True, debug=False, insecure=False,
                  retries=None,
-                 timeout=None):
+                 timeout=None, transport=None, pool_connections=10,
+                 pool_maxsize=10, pool_idle_timeout=60.0, retry_policy=None,
+                 circuit_breaker=None, response_type='munch', coalesce=False,
+                 http_cache=None):
         '''Create a client configured for a particular service.
 
         :arg base_url: Base of every URL used to contact the server
@@ -138,9 +185,45 @@ class ProxyClient(object):
         :kwarg timeout: A float describing the timeout of the connection. The
             timeout only affects the connection process itself, not the
             downloading of the response body. Defaults to 120 seconds.
+        :kwarg transport: A
+            :class:`~fedora.client.transport.PooledTransport` to send
+            requests over.  If not given, a new one is created using the
+            ``pool_*`` kwargs.
+        :kwarg pool_connections: Number of hosts to keep connection pools
+            for.  Defaults to 10.
+        :kwarg pool_maxsize: Maximum number of keep-alive connections to
+            a single host.  This should be at least the number of threads
+            sharing this client.  Defaults to 10.
+        :kwarg pool_idle_timeout: Close connections to a host that have been
+            idle for this many seconds.  Defaults to 60 seconds.
+        :kwarg retry_policy: :class:`~fedora.client.retry.RetryPolicy` to
+            use when retrying requests.  Defaults to a policy with
+            exponential backoff that is shared by all clients in the process.
+        :kwarg circuit_breaker: A
+            :class:`~fedora.client.circuitbreaker.CircuitBreakerRegistry` to
+            keep a circuit breaker per server method in.  If set to True,
+            a registry with the default settings is created.  Defaults to
+            None, no circuit breakers.
+        :kwarg response_type: How to return data from the server.  One of
+            ``munch``, ``dict``, or ``lazy``.  Defaults to ``munch``.  See
+            :mod:`fedora.client.responses`.
+        :kwarg coalesce: If True, identical requests made by several threads
+            at the same time share a single call to the server.  May also be
+            a :class:`~fedora.client.singleflight.SingleFlight` to share
+            between clients.  Only enable this for clients whose requests do
+            not change data on the server.  Defaults to False.
+        :kwarg http_cache: An :class:`~fedora.client.httpcache.HTTPCache` to
+            keep responses in and revalidate them with conditional requests.
+            If set to True, an in-memory cache is created.  If set to
+            a string, it is passed to the cache as its ``cache``.  Defaults
+            to None, no caching.
 
         .. versionchanged:: 0.3.33
             Added the timeout kwarg
+        .. versionchanged:: 1.2.0
+            Added the transport, pool_connections, pool_maxsize,
+            pool_idle_timeout, retry_policy, circuit_breaker, response_type,
+            coalesce, and http_cache kwargs
         '''
         # Setup our logger
         self._log_handler = logging.StreamHandler()
@@ -160,6 +243,10 @@ class ProxyClient(object):
             base_url = base_url + '/'
         self.base_url = base_url
         self.domain = urlparse(self.base_url).netloc
+        if transport is None:
+            transport = self._make_transport(pool_connections, pool_maxsize,
+                                             pool_idle_timeout)
+        self.transport = transport
         self.useragent = useragent or 'Fedora ProxyClient/%(version)s' % {
             'version': __version__}
         self.session_name = session_name
@@ -183,8 +270,32 @@ class ProxyClient(object):
             self.timeout = 120.0
         else:
             self.timeout = timeout
+
+        self.retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+        if circuit_breaker is True:
+            circuit_breaker = CircuitBreakerRegistry()
+        self.circuit_breaker = circuit_breaker
+        if response_type not in RESPONSE_TYPES:
+            raise ValueError('response_type must be one of %s' %
+                             ', '.join(RESPONSE_TYPES))
+        self.response_type = response_type
+        if coalesce is True:
+            coalesce = SingleFlight()
+        self.single_flight = coalesce or None
+        if http_cache is True:
+            http_cache = HTTPCache()
+        elif isinstance(http_cache, six.string_types):
+            http_cache = HTTPCache(cache=http_cache)
+        self.http_cache = http_cache
+
         self.log.debug('proxyclient.__init__:exited')
 
+    def _make_transport(self, pool_connections, pool_maxsize, idle_timeout):
+        '''Create the transport to use when one isn't given to __init__.'''
+        return PooledTransport(pool_connections=pool_connections,
+                               pool_maxsize=pool_maxsize,
+                               idle_timeout=idle_timeout)
+
     def __get_debug(self):
         '''Return whether we have debug logging turned on.
 
@@ -213,7 +324,8 @@ class ProxyClient(object):
     ''')
 
     def send_request(self, method, req_params=None, auth_params=None,
-                     file_params=None, retries=None, timeout=None):
+                     file_params=None, retries=None, timeout=None,
+                     response_type=None):
         '''Make an HTTP request to a server method.
 
         The given method is called with any parameters set in ``req_params``.
@@ -254,12 +366,16 @@ class ProxyClient(object):
             files to a single file field, pass the paths as a list of paths.
         :kwarg retries: if we get an unknown or possibly transient error from
             the server, retry this many times.  Setting this to a negative
-            number makes it try forever.  Default to use the :attr:`retries`
-            value set on the instance or in :meth:`__init__`.
+            number retries until the :attr:`retry_policy` gives up.  Default
+            to use the :attr:`retries` value set on the instance or in
+            :meth:`__init__`.
         :kwarg timeout: A float describing the timeout of the connection. The
             timeout only affects the connection process itself, not the
             downloading of the response body. Defaults to the :attr:`timeout`
             value set on the instance or in :meth:`__init__`.
+        :kwarg response_type: How to return the data.  One of ``munch``,
+            ``dict``, or ``lazy``.  Defaults to the :attr:`response_type`
+            set on the instance.
         :returns: If ProxyClient is created with session_as_cookie=True (the
             default), a tuple of session cookie and data from the server.
             If ProxyClient was created with session_as_cookie=False, a tuple
@@ -274,52 +390,25 @@ class ProxyClient(object):
             * Add file_params to allow uploading files
         .. versionchanged:: 0.3.33
             Added the timeout kwarg
+        .. versionchanged:: 1.2.0
+            * Requests are sent over the pooled :attr:`transport` instead of
+              opening a new connection each time.
+            * Wait between retries according to the :attr:`retry_policy`
+              instead of a fixed half second.
+            * Fail fast when the :attr:`circuit_breaker` for the method is
+              open.
+            * Share the call with identical concurrent requests when the
+              client was created with ``coalesce``.
+            * Serve and revalidate responses from the :attr:`http_cache`.
+            * Added the response_type kwarg
         '''
         self.log.debug('proxyclient.send_request: entered')
 
         # parameter mangling
         file_params = file_params or {}
 
-        # Check whether we need to authenticate for this request
-        session_id = None
-        username = None
-        password = None
-        if auth_params:
-            if 'session_id' in auth_params:
-                session_id = auth_params['session_id']
-            elif 'cookie' in auth_params:
-                warnings.warn(
-                    'Giving a cookie to send_request() to'
-                    ' authenticate is deprecated and will be removed in 0.4.'
-                    ' Please port your code to use session_id instead.',
-                    DeprecationWarning, stacklevel=2)
-                session_id = auth_params['cookie'].output(attrs=[],
-                                                          header='').strip()
-            if 'username' in auth_params and 'password' in auth_params:
-                username = auth_params['username']
-                password = auth_params['password']
-            elif 'username' in auth_params or 'password' in auth_params:
-                raise AuthError('username and password must both be set in'
-                                ' auth_params')
-            if not (session_id or username):
-                raise AuthError(
-                    'No known authentication methods'
-                    ' specified: set "cookie" in auth_params or set both'
-                    ' username and password in auth_params')
-
-        # urljoin is slightly different than os.path.join().  Make sure method
-        # will work with it.
-        method = method.lstrip('/')
-        # And join to make our url.
-        url = urljoin(self.base_url, quote(method))
-
-        data = None     # decoded JSON via json.load()
-
-        # Set standard headers
-        headers = {
-            'User-agent': self.useragent,
-            'Accept': 'application/json',
-        }
+        url, headers, complete_params, session_id, auth = \
+            self._prepare_request(method, req_params, auth_params)
 
         # Files to upload
         for field_name, local_file_name in file_params:
@@ -334,50 +423,149 @@ class ProxyClient(object):
             # cookie generated client-side.
             cookies.set(self.session_name, session_id)
 
-        complete_params = req_params or {}
-        if session_id:
-            # Add the csrf protection token
-            token = sha1(to_bytes(session_id))
-            complete_params.update({'_csrf_token': token.hexdigest()})
+        if retries is None:
+            retries = self.retries
 
-        auth = None
-        if username and password:
-            if auth_params.get('httpauth', '').lower() == 'basic':
-                # HTTP Basic auth login
-                auth = (username, password)
-            else:
-                # TG login
-                # Adding this to the request data prevents it from being
-                # logged by apache.
-                complete_params.update({
-                    'user_name': to_bytes(username),
-                    'password': to_bytes(password),
-                    'login': 'Login',
-                })
+        if timeout is None:
+            timeout = self.timeout
 
-        # If debug, give people our debug info
-        self.log.debug('Creating request %(url)s' %
-                       {'url': to_bytes(url)})
-        self.log.debug('Headers: %(header)s' %
-                       {'header': to_bytes(headers, nonstring='simplerepr')})
-        if self.debug and complete_params:
-            debug_data = copy.deepcopy(complete_params)
+        cache_key = None
+        if self.http_cache is not None and not file_params:
+            cache_key = self.http_cache.key(url, complete_params,
+                                            (session_id, auth))
+
+        def fetch():
+            cached = None
+            request_headers = headers
+            if cache_key is not None:
+                cached = self.http_cache.get(cache_key)
+                if cached is not None:
+                    if cached.is_fresh():
+                        self.http_cache.count('fresh')
+                        # Like a response without a session cookie
+                        return self._decode_cached(url, cached), ''
+                    request_headers = dict(headers)
+                    request_headers.update(cached.conditional_headers())
+
+            breaker = self._get_circuit_breaker(method, url)
+            try:
+                response = self._post(url, complete_params, cookies,
+                                      request_headers, auth, retries, timeout)
+            except BaseException as e:
+                self._record_outcome(breaker, e)
+                raise
+            self._record_outcome(breaker)
+            http_status = response.status_code
 
-            if 'password' in debug_data:
-                debug_data['password'] = 'xxxxxxx'
+            # In case the server returned a new session cookie to us
+            new_session = response.cookies.get(self.session_name, '')
 
-            self.log.debug('Data: %r' % debug_data)
+            if cached is not None and http_status == 304:
+                self.http_cache.count('revalidated')
+                self.http_cache.store(cache_key, response, cached)
+                return self._decode_cached(url, cached), new_session
 
-        if retries is None:
-            retries = self.retries
+            try:
+                data = response.json()
+            except ValueError as e:
+                # The response wasn't JSON data
+                raise self._json_error(url, http_status, e)
+            if cache_key is not None:
+                self.http_cache.count('fetched')
+                if 'exc' not in data:
+                    # Don't replay an error from the application
+                    self.http_cache.store(cache_key, response)
+            return data, new_session
+
+        if self.single_flight is not None and not file_params:
+            key = (url, session_id, auth,
+                   tuple(sorted((name, repr(value)) for name, value
+                                in complete_params.items())))
+            data, new_session = self.single_flight.do(key, fetch)
+        else:
+            data, new_session = fetch()
 
-        if timeout is None:
-            timeout = self.timeout
+        self.log.debug('proxyclient.send_request: exited')
+        return self._process_data(data, new_session, response_type)
+
+    def send_many(self, batch, max_workers=8, retries=None, timeout=None,
+                  response_type=None):
+        '''Make many independent requests concurrently.
+
+        The requests are sent from up to ``max_workers`` threads over the
+        shared :attr:`transport`.  Keep ``max_workers`` no larger than the
+        ``pool_maxsize`` of the transport or the extra connections are closed
+        instead of being reused.  To cap the number of requests in flight to
+        a server across every thread and client that shares the transport,
+        create the :class:`~fedora.client.transport.PooledTransport` with
+        ``max_per_host``.
+
+        :arg batch: iterable of requests.  Each request is either a method
+            name or a tuple of method, ``req_params``, and ``auth_params`` as
+            given to :meth:`send_request`.  Trailing items of the tuple may
+            be left out.
+        :kwarg max_workers: Maximum number of requests in flight at once.
+            Defaults to 8.
+        :kwarg retries: Number of times to retry each request.  See
+            :meth:`send_request`
+        :kwarg timeout: A float describing the timeout of the connection
+        :kwarg response_type: How to return the data.  See
+            :meth:`send_request`
+        :returns: list with an entry for each request, in the same order as
+            ``batch``.  The entry is what :meth:`send_request` returned for
+            the request or the exception that it raised.
+
+        .. versionadded:: 1.2.0
+        '''
+        specs = [self._request_spec(spec) for spec in batch]
 
-        num_tries = 0
+        def send(spec):
+            try:
+                return self._send_spec(spec, retries, timeout, response_type)
+            except (FedoraServiceError,
+                    requests.exceptions.RequestException) as e:
+                return e
+
+        if len(specs) <= 1 or max_workers <= 1:
+            return [send(spec) for spec in specs]
+        with ThreadPoolExecutor(min(max_workers, len(specs))) as executor:
+            return list(executor.map(send, specs))
+
+    @staticmethod
+    def _request_spec(spec):
+        '''Normalize one request given to :meth:`send_many` to a tuple of
+        method, req_params, and auth.'''
+        if isinstance(spec, six.string_types):
+            return (spec, None, None)
+        spec = tuple(spec)
+        if not 1 <= len(spec) <= 3:
+            raise TypeError('send_many() requests must have a method and at'
+                            ' most req_params and auth_params: %r' % (spec,))
+        return spec + (None,) * (3 - len(spec))
+
+    def _send_spec(self, spec, retries, timeout, response_type):
+        '''Send one request for :meth:`send_many`.'''
+        method, req_params, auth_params = spec
+        return self.send_request(method, req_params=req_params,
+                                 auth_params=auth_params, retries=retries,
+                                 timeout=timeout, response_type=response_type)
+
+    def _post(self, url, complete_params, cookies, headers, auth, retries,
+              timeout, stream=False):
+        '''POST a request to the server, retrying according to our policy.
+
+        If ``stream`` is True, the body of the response is not read.  The
+        caller must read it or close the response.
+
+        :returns: the successful :class:`requests.Response`
+        :raises AuthError: if the server rejected our credentials
+        :raises ServerError: if the request timed out or returned an error
+            status and we ran out of retries
+        '''
+        retry_state = self.retry_policy.begin(retries)
         while True:
             try:
-                response = requests.post(
+                response = self.transport.post(
                     url,
                     data=complete_params,
                     cookies=cookies,
@@ -385,6 +573,7 @@ class ProxyClient(object):
                     auth=auth,
                     verify=not self.insecure,
                     timeout=timeout,
+                    stream=stream,
                 )
             except (requests.Timeout, requests.exceptions.SSLError) as e:
                 if isinstance(e, requests.exceptions.SSLError):
@@ -427,11 +616,9 @@ class ProxyClient(object):
                         # We're only interested in timeouts here
                         raise
                 self.log.debug('Request timed out')
-                if retries < 0 or num_tries < retries:
-                    num_tries += 1
-                    self.log.debug(
-                        'Attempt #%(try)s failed' % {'try': num_tries})
-                    time.sleep(0.5)
+                delay = retry_state.next_delay(-1)
+                if delay is not None:
+                    time.sleep(delay)
                     continue
                 # Fail and raise an error
                 # Raising our own exception protects the user from the
@@ -450,47 +637,311 @@ class ProxyClient(object):
             # encoded 'utf-8').
             response.encoding = 'utf-8'
 
-            # Check for auth failures
-            # Note: old TG apps returned 403 Forbidden on authentication
-            # failures.
-            # Updated apps return 401 Unauthorized
-            # We need to accept both until all apps are updated to return 401.
             http_status = response.status_code
-            if http_status in (401, 403):
-                # Wrong username or password
-                self.log.debug('Authentication failed logging in')
-                raise AuthError(
-                    'Unable to log into server.  Invalid'
-                    ' authentication tokens.  Send new username and password')
-            elif http_status >= 400:
-                if retries < 0 or num_tries < retries:
+            error = self._check_status(url, http_status)
+            if error:
+                # Give the connection back to the pool
+                response.close()
+                delay = retry_state.next_delay(http_status)
+                if delay is not None:
                     # Retry the request
-                    num_tries += 1
-                    self.log.debug(
-                        'Attempt #%(try)s failed' % {'try': num_tries})
-                    time.sleep(0.5)
+                    time.sleep(delay)
                     continue
                 # Fail and raise an error
-                try:
-                    msg = httplib.responses[http_status]
-                except (KeyError, AttributeError):
-                    msg = 'Unknown HTTP Server Response'
-                raise ServerError(url, http_status, msg)
+                raise error
             # Successfully returned data
             break
 
-        # In case the server returned a new session cookie to us
+        return response
+
+    def iter_request(self, method, stream_keys, req_params=None,
+                     auth_params=None, retries=None, timeout=None,
+                     chunk_size=65536):
+        '''Make an HTTP request and decode the response incrementally.
+
+        This is like :meth:`send_request` but is meant for server methods
+        that return very large arrays or objects.  The values of
+        ``stream_keys`` in the JSON response are decoded an element at a time
+        as they are read from the network so only one element is held in
+        memory at once.
+
+        :arg method: Method to call on the server.  See :meth:`send_request`
+        :arg stream_keys: Keys of the JSON response to decode incrementally
+        :kwarg req_params: Extra parameters to send to the server
+        :kwarg auth_params: Means of authenticating to the server.  See
+            :meth:`send_request`
+        :kwarg retries: Number of times to retry if the request fails.  Only
+            failures before the response body is read are retried.
+        :kwarg timeout: A float describing the timeout of the connection
+        :kwarg chunk_size: Number of bytes to read from the network at once
+        :returns: tuple of the session_id and a generator of
+            ``(key, name, value)`` tuples as returned by
+            :func:`fedora.client.jsonstream.iter_members`.  Values are
+            converted according to :attr:`response_type`.  Members of the
+            response that are not in ``stream_keys`` are generated after the
+            streamed ones.  The connection is released when the generator is
+            exhausted or closed.
+        :raises AppError: from the generator if the server returned an
+            exception
+
+        .. versionadded:: 1.2.0
+        '''
+        self.log.debug('proxyclient.iter_request: entered')
+
+        url, headers, complete_params, session_id, auth = \
+            self._prepare_request(method, req_params, auth_params)
+
+        cookies = requests.cookies.RequestsCookieJar()
+        if session_id:
+            cookies.set(self.session_name, session_id)
+
+        if retries is None:
+            retries = self.retries
+
+        if timeout is None:
+            timeout = self.timeout
+
+        breaker = self._get_circuit_breaker(method, url)
+        try:
+            response = self._post(url, complete_params, cookies, headers, auth,
+                                  retries, timeout, stream=True)
+        except BaseException as e:
+            self._record_outcome(breaker, e)
+            raise
+        self._record_outcome(breaker)
+
         new_session = response.cookies.get(self.session_name, '')
+        if self.session_as_cookie:
+            cookie = Cookie.SimpleCookie()
+            cookie[self.session_name] = new_session
+            new_session = cookie
+
+        self.log.debug('proxyclient.iter_request: exited')
+        return new_session, self._iter_response(url, response, stream_keys,
+                                                chunk_size)
 
+    def _iter_response(self, url, response, stream_keys, chunk_size):
+        '''Generate the decoded members of a streamed JSON response.'''
+        extras = {}
         try:
-            data = response.json()
-        except ValueError as e:
-            # The response wasn't JSON data
-            raise ServerError(
-                url, http_status, 'Error returned from'
-                ' json module while processing %(url)s: %(err)s' %
-                {'url': to_bytes(url), 'err': to_bytes(e)})
+            members = iter_members(response.iter_content(chunk_size),
+                                   stream_keys)
+            try:
+                for key, name, value in members:
+                    if name is None:
+                        extras[key] = value
+                        if 'exc' in extras and 'tg_flash' in extras:
+                            break
+                    else:
+                        yield key, name, wrap_response(
+                            value, self.response_type)
+            except ValueError as e:
+                # The response wasn't JSON data
+                raise self._json_error(url, response.status_code, e)
+        finally:
+            response.close()
+
+        if 'exc' in extras:
+            name = extras.pop('exc')
+            message = extras.pop('tg_flash', None)
+            raise AppError(name=name, message=message, extras=extras)
+        for key, value in extras.items():
+            yield key, None, wrap_response(value, self.response_type)
+
+    def _get_circuit_breaker(self, method, url):
+        '''Return the circuit breaker for a server method.
+
+        :arg method: method on the server that is being called
+        :arg url: full url to the method, used in the error message
+        :returns: the :class:`~fedora.client.circuitbreaker.CircuitBreaker`
+            for the method or None if we don't use circuit breakers
+        :raises ServerError: if the circuit breaker is open
+        '''
+        if not self.circuit_breaker:
+            return None
+        breaker = self.circuit_breaker.get(method.strip('/'))
+        if not breaker.allow_request():
+            self.log.debug('Circuit breaker for %(url)s is open' %
+                           {'url': to_bytes(url)})
+            raise ServerError(url, -1, 'Circuit breaker open: %s has been'
+                              ' failing, not contacting it' % url)
+        return breaker
+
+    def _record_outcome(self, breaker, error=None):
+        '''Tell a circuit breaker how a request went.
+
+        :arg breaker: :class:`~fedora.client.circuitbreaker.CircuitBreaker`
+            returned by :meth:`_get_circuit_breaker`.  May be None.
+        :kwarg error: Exception raised by the request, if any
+        '''
+        if not breaker:
+            return
+        if error is not None and not isinstance(error, Exception):
+            # KeyboardInterrupt, SystemExit, or a cancelled task.  Nothing is
+            # known about the server but the probe slot must be freed.
+            breaker.release()
+            return
+        # Only count errors that mean the server is unreachable or broken.
+        # Anything else (an AuthError or a 404 for instance) means that the
+        # server is up and answering.
+        if isinstance(error, self._connection_errors) or (
+                isinstance(error, ServerError)
+                and (error.code == -1 or error.code >= 500)):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def _parse_auth_params(self, auth_params):
+        '''Extract the credentials from the ``auth_params`` to send_request.
+
+        :arg auth_params: ``auth_params`` as given to :meth:`send_request`
+        :returns: a tuple of session_id, username, and password.  Any of these
+            may be None.
+        :raises AuthError: if the auth_params are incomplete
+        '''
+        session_id = None
+        username = None
+        password = None
+        if auth_params:
+            if 'session_id' in auth_params:
+                session_id = auth_params['session_id']
+            elif 'cookie' in auth_params:
+                warnings.warn(
+                    'Giving a cookie to send_request() to'
+                    ' authenticate is deprecated and will be removed in 0.4.'
+                    ' Please port your code to use session_id instead.',
+                    DeprecationWarning, stacklevel=3)
+                session_id = auth_params['cookie'].output(attrs=[],
+                                                          header='').strip()
+            if 'username' in auth_params and 'password' in auth_params:
+                username = auth_params['username']
+                password = auth_params['password']
+            elif 'username' in auth_params or 'password' in auth_params:
+                raise AuthError('username and password must both be set in'
+                                ' auth_params')
+            if not (session_id or username):
+                raise AuthError(
+                    'No known authentication methods'
+                    ' specified: set "cookie" in auth_params or set both'
+                    ' username and password in auth_params')
+        return session_id, username, password
+
+    def _prepare_request(self, method, req_params, auth_params):
+        '''Assemble the pieces of a request that don't depend on the transport.
+
+        :arg method: Method to call on the server
+        :arg req_params: dict of parameters to send to the server
+        :arg auth_params: dict of credentials.  See :meth:`send_request`
+        :returns: a tuple of url, headers, the complete set of parameters to
+            send, the session_id to send as a cookie, and a (username,
+            password) tuple if HTTP Basic Auth should be used (else None).
+        '''
+        # Check whether we need to authenticate for this request
+        session_id, username, password = self._parse_auth_params(auth_params)
+
+        # urljoin is slightly different than os.path.join().  Make sure method
+        # will work with it.
+        method = method.lstrip('/')
+        # And join to make our url.
+        url = urljoin(self.base_url, quote(method))
+
+        # Set standard headers
+        headers = {
+            'User-agent': self.useragent,
+            'Accept': 'application/json',
+        }
+
+        complete_params = req_params or {}
+        if session_id:
+            # Add the csrf protection token.  The header lets the server find
+            # it without parsing the body.  Older servers only look in the
+            # body.
+            token = sha1(to_bytes(session_id)).hexdigest()
+            headers['X-CSRF-Token'] = token
+            complete_params.update({'_csrf_token': token})
+
+        auth = None
+        if username and password:
+            if auth_params.get('httpauth', '').lower() == 'basic':
+                # HTTP Basic auth login
+                auth = (username, password)
+            else:
+                # TG login
+                # Adding this to the request data prevents it from being
+                # logged by apache.
+                complete_params.update({
+                    'user_name': to_bytes(username),
+                    'password': to_bytes(password),
+                    'login': 'Login',
+                })
 
+        # If debug, give people our debug info
+        self.log.debug('Creating request %(url)s' %
+                       {'url': to_bytes(url)})
+        self.log.debug('Headers: %(header)s' %
+                       {'header': to_bytes(headers, nonstring='simplerepr')})
+        if self.debug and complete_params:
+            debug_data = copy.deepcopy(complete_params)
+
+            if 'password' in debug_data:
+                debug_data['password'] = 'xxxxxxx'
+
+            self.log.debug('Data: %r' % debug_data)
+
+        return url, headers, complete_params, session_id, auth
+
+    def _check_status(self, url, http_status):
+        '''Check the HTTP status code of a response.
+
+        :arg url: url that the request was made to
+        :arg http_status: HTTP status code returned by the server
+        :returns: None if the request succeeded.  A :exc:`ServerError` to
+            raise if the request failed in a way that may be worth retrying.
+        :raises AuthError: if the server rejected our credentials
+        '''
+        # Check for auth failures
+        # Note: old TG apps returned 403 Forbidden on authentication
+        # failures.
+        # Updated apps return 401 Unauthorized
+        # We need to accept both until all apps are updated to return 401.
+        if http_status in (401, 403):
+            # Wrong username or password
+            self.log.debug('Authentication failed logging in')
+            raise AuthError(
+                'Unable to log into server.  Invalid'
+                ' authentication tokens.  Send new username and password')
+        elif http_status >= 400:
+            try:
+                msg = httplib.responses[http_status]
+            except (KeyError, AttributeError):
+                msg = 'Unknown HTTP Server Response'
+            return ServerError(url, http_status, msg)
+        return None
+
+    def _decode_cached(self, url, cached):
+        '''Decode the body of a response from the :attr:`http_cache`.'''
+        try:
+            return json.loads(cached.body.decode('utf-8'))
+        except ValueError as e:
+            raise self._json_error(url, 200, e)
+
+    def _json_error(self, url, http_status, error):
+        '''Return the exception to raise when a response isn't JSON.'''
+        return ServerError(
+            url, http_status, 'Error returned from'
+            ' json module while processing %(url)s: %(err)s' %
+            {'url': to_bytes(url), 'err': to_bytes(error)})
+
+    def _process_data(self, data, new_session, response_type=None):
+        '''Turn decoded JSON data into the return value of send_request.
+
+        :arg data: data decoded from the server's JSON response
+        :arg new_session: value of the session cookie the server sent back
+        :kwarg response_type: How to return the data.  Defaults to
+            :attr:`response_type`
+        :returns: tuple of session information and data from server
+        :raises AppError: if the server returned an exception
+        '''
         if 'exc' in data:
             name = data.pop('exc')
             message = data.pop('tg_flash')
@@ -502,8 +953,7 @@ class ProxyClient(object):
             cookie[self.session_name] = new_session
             new_session = cookie
 
-        self.log.debug('proxyclient.send_request: exited')
-        data = munchify(data)
+        data = wrap_response(data, response_type or self.response_type)
         return new_session, data
 
 __all__ = (ProxyClient,)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''Containers for the data decoded from a server's JSON response.
+
+The clients return data as :class:`munch.Munch` objects by default.
+:func:`munch.munchify` copies the whole decoded tree, which is expensive for
+responses with many thousands of records.  The ``response_type`` of a client
+or of a single ``send_request()`` call selects something cheaper:
+
+:munch: (default) The whole response is converted to :class:`munch.Munch`
+    up front.
+:dict: The plain :class:`dict` and :class:`list` objects from the JSON
+    decoder are returned unchanged.
+:lazy: The response is wrapped in a :class:`LazyMunch`.  Nested objects are
+    only converted when they are accessed, so code that looks at a few
+    fields of a large response pays for just those.
+
+.. versionadded:: 1.2.0
+'''
+
+from munch import Munch, munchify
+
+RESPONSE_TYPES = ('munch', 'dict', 'lazy')
+
+
+def _wrap(value):
+    # Only convert the exact types that come out of the json module so that
+    # values which were already converted are returned as is
+    value_type = type(value)
+    if value_type is dict:
+        return LazyMunch(value)
+    if value_type is list:
+        return LazyList(value)
+    return value
+
+
+class LazyMunch(Munch):
+    '''A :class:`munch.Munch` that converts its values on first access.
+
+    Values that are dicts or lists are wrapped in :class:`LazyMunch` or
+    :class:`LazyList` the first time they are looked up.  The wrapped value
+    replaces the original so later lookups return the same object and changes
+    made to it are kept.
+    '''
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        wrapped = _wrap(value)
+        if wrapped is not value:
+            dict.__setitem__(self, key, wrapped)
+        return wrapped
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def itervalues(self):
+        for key in self:
+            yield self[key]
+
+    def iteritems(self):
+        for key in self:
+            yield key, self[key]
+
+    def pop(self, key, *default):
+        value = dict.pop(self, key, *default)
+        return _wrap(value)
+
+    def copy(self):
+        return LazyMunch(self)
+
+    def toDict(self):
+        '''Return a deep copy of the data as plain dicts and lists.'''
+        return unlazify(self)
+
+
+class LazyList(list):
+    '''A list that wraps its dict and list items on first access.'''
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LazyList(list.__getitem__(self, index))
+        value = list.__getitem__(self, index)
+        wrapped = _wrap(value)
+        if wrapped is not value:
+            list.__setitem__(self, index, wrapped)
+        return wrapped
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def pop(self, *index):
+        return _wrap(list.pop(self, *index))
+
+
+def unlazify(data):
+    '''Convert lazily wrapped data back to plain dicts and lists.
+
+    :arg data: data returned from a request with the ``lazy`` response type
+    :returns: a deep copy of ``data`` with no :class:`LazyMunch` or
+        :class:`LazyList` in it
+    '''
+    if isinstance(data, dict):
+        return dict((key, unlazify(value))
+                    for key, value in dict.items(data))
+    if isinstance(data, list):
+        return [unlazify(value) for value in list.__iter__(data)]
+    return data
+
+
+def wrap_response(data, response_type='munch'):
+    '''Convert decoded JSON data to the requested response type.
+
+    :arg data: data from the JSON decoder
+    :kwarg response_type: one of :data:`RESPONSE_TYPES`.  Defaults to
+        ``munch``.
+    :returns: the converted data
+    :raises ValueError: if ``response_type`` is not known
+    '''
+    if response_type == 'munch':
+        return munchify(data)
+    if response_type == 'dict':
+        return data
+    if response_type == 'lazy':
+        return _wrap(data)
+    raise ValueError('response_type must be one of %s, not %r' %
+                     (', '.join(RESPONSE_TYPES), response_type))
+
+
+__all__ = ('LazyMunch', 'LazyList', 'RESPONSE_TYPES', 'unlazify',
+           'wrap_response')
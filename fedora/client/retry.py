@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''Policies deciding whether and when the clients retry a failed request.
+
+A :class:`RetryPolicy` waits an exponentially growing, randomized amount of
+time between attempts so that many clients which saw the same failure do not
+all retry at the same moment.  Retries are also paid for out of a
+:class:`RetryBudget` that is shared by the whole process.  When most requests
+are failing the budget runs dry and the clients stop retrying instead of
+multiplying the load on a server that is already in trouble.
+
+.. versionadded:: 1.2.0
+'''
+
+import logging
+import random
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class RetryBudget(object):
+    '''Token bucket that limits retries to a fraction of requests.
+
+    Every request deposits :attr:`ratio` tokens and every retry withdraws one
+    token.  In the steady state this allows one retry for every
+    ``1 / ratio`` requests.  :attr:`min_per_second` tokens are added each
+    second regardless of traffic so that clients making few requests can
+    still retry.  The bucket never holds more than :attr:`max_tokens`.
+
+    Instances are threadsafe and are meant to be shared.
+    '''
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, max_tokens=10.0):
+        '''Create a retry budget.
+
+        :kwarg ratio: Tokens deposited per request.  Defaults to 0.2, retries
+            may add at most 20% to the number of requests sent.
+        :kwarg min_per_second: Tokens added per second no matter how many
+            requests are made.  Defaults to 1.
+        :kwarg max_tokens: Size of the bucket.  This is the largest burst of
+            retries that is allowed.  Defaults to 10.
+        '''
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = float(max_tokens)
+        self._last_refill = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.time()
+        elapsed = max(now - self._last_refill, 0)
+        self._last_refill = now
+        self._tokens = min(self.max_tokens,
+                           self._tokens + elapsed * self.min_per_second)
+
+    def deposit(self):
+        '''Record that a request was made.'''
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        '''Try to pay for a retry.
+
+        :returns: True if there was enough budget for a retry, else False
+        '''
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def tokens(self):
+        '''Number of retries that could be made right now.'''
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class RetryPolicy(object):
+    '''Decide whether a failed request is retried and how long to wait first.
+
+    The delay before retry ``n`` (counting from zero) is picked uniformly from
+    ``[0, min(backoff_max, backoff_base * 2 ** n)]`` ("full jitter").
+
+    The number of retries is given by the ``retries`` value of the client or
+    of the individual call.  On top of that, a request is not retried once
+    :attr:`max_elapsed` seconds have passed since the first attempt or when
+    the :attr:`budget` is exhausted.
+
+    One policy can be shared by any number of clients and threads.  Its
+    :attr:`counters` can be exported for metrics.
+
+    .. attribute:: counters
+
+        A dict with the following counts since the policy was created:
+
+        :requests: calls that have been made under this policy
+        :retries: retries that were made
+        :giveups: failed attempts that were not retried because the retries
+            or :attr:`max_elapsed` were used up
+        :budget_exhausted: failed attempts that were not retried because the
+            :attr:`budget` was empty
+    '''
+
+    def __init__(self, backoff_base=0.5, backoff_max=30.0, max_elapsed=None,
+                 retry_on=None, retry_on_timeout=True, budget=None):
+        '''Create a retry policy.
+
+        :kwarg backoff_base: Upper bound, in seconds, of the delay before the
+            first retry.  Doubles for every further retry.  Defaults to 0.5.
+        :kwarg backoff_max: Largest delay, in seconds, between two attempts.
+            Defaults to 30 seconds.
+        :kwarg max_elapsed: Stop retrying once this many seconds have passed
+            since the first attempt.  Defaults to None, no limit.
+        :kwarg retry_on: Set of HTTP status codes to retry.  Defaults to
+            None, which retries every status code of 400 or greater that is
+            not an authentication failure.
+        :kwarg retry_on_timeout: Whether to retry requests that timed out.
+            Defaults to True.
+        :kwarg budget: :class:`RetryBudget` to pay for retries from.  Defaults
+            to a budget shared by every policy in this process.  Set to False
+            to disable the budget.
+        '''
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_elapsed = max_elapsed
+        if retry_on is not None:
+            retry_on = frozenset(retry_on)
+        self.retry_on = retry_on
+        self.retry_on_timeout = retry_on_timeout
+        if budget is None:
+            budget = DEFAULT_RETRY_BUDGET
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._counters = {'requests': 0, 'retries': 0, 'giveups': 0,
+                          'budget_exhausted': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    @property
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def backoff(self, attempt):
+        '''Return the number of seconds to wait before retry ``attempt``.
+
+        :arg attempt: Number of retries already made for this request
+        '''
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def is_retryable(self, status):
+        '''Return whether a failure with this HTTP status may be retried.
+
+        :arg status: HTTP status code.  -1 means the request timed out.
+        '''
+        if status == -1:
+            return self.retry_on_timeout
+        if self.retry_on is None:
+            return status >= 400
+        return status in self.retry_on
+
+    def begin(self, retries):
+        '''Start tracking the retries of a single request.
+
+        :arg retries: Maximum number of retries for this request.  A negative
+            number means no limit other than :attr:`max_elapsed` and the
+            :attr:`budget`.
+        :returns: a :class:`RetryState` for the request
+        '''
+        self._count('requests')
+        if self.budget:
+            self.budget.deposit()
+        return RetryState(self, retries)
+
+
+class RetryState(object):
+    '''Retry bookkeeping for a single request.
+
+    Created by :meth:`RetryPolicy.begin`.  Not threadsafe; each request gets
+    its own.
+    '''
+
+    def __init__(self, policy, retries):
+        self.policy = policy
+        self.retries = retries
+        self.num_tries = 0
+        self.started = time.time()
+
+    def next_delay(self, status):
+        '''Decide whether to retry after a failed attempt.
+
+        :arg status: HTTP status code of the failure or -1 for a timeout
+        :returns: the number of seconds to wait before retrying or None if
+            the request should not be retried
+        '''
+        policy = self.policy
+        if not policy.is_retryable(status):
+            return None
+        if 0 <= self.retries <= self.num_tries:
+            policy._count('giveups')
+            return None
+        delay = policy.backoff(self.num_tries)
+        if policy.max_elapsed is not None and \
+                time.time() + delay - self.started > policy.max_elapsed:
+            policy._count('giveups')
+            return None
+        if policy.budget and not policy.budget.withdraw():
+            log.debug('Retry budget exhausted, not retrying')
+            policy._count('budget_exhausted')
+            return None
+        self.num_tries += 1
+        policy._count('retries')
+        log.debug('Attempt #%s failed, retrying in %.2fs'
+                  % (self.num_tries, delay))
+        return delay
+
+
+#: Budget shared by every :class:`RetryPolicy` that isn't given its own
+DEFAULT_RETRY_BUDGET = RetryBudget()
+
+#: Policy used by the clients when they aren't given one
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+__all__ = ('RetryBudget', 'RetryPolicy', 'RetryState',
+           'DEFAULT_RETRY_BUDGET', 'DEFAULT_RETRY_POLICY')
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''A pool of per-user HTTP sessions that share their connections.
+
+Clients that proxy many users need one :class:`requests.Session` per user
+so that the users' cookies stay apart.  :class:`SessionPool` keeps those
+sessions, drops the ones that have not been used for a while or that do not
+fit in the pool, and mounts one :class:`requests.adapters.HTTPAdapter` on
+all of them so that the TCP and TLS connections to a server are reused no
+matter which user a request is for.
+
+.. versionadded:: 1.2.0
+'''
+
+from collections import OrderedDict
+import threading
+import time
+
+import requests
+import requests.adapters
+
+
+class PooledSession(object):
+    '''A user's entry in a :class:`SessionPool`.
+
+    .. attribute:: session
+
+        The user's :class:`requests.Session` or None until the user has
+        logged in
+
+    .. attribute:: credentials
+
+        Whatever the client uses to check that a later request is for the
+        same user, such as a digest of the password
+
+    .. attribute:: lock
+
+        Held while the session is being created or replaced.  Requests made
+        with the session do not need it.
+    '''
+    __slots__ = ('session', 'credentials', 'lock', 'last_used')
+
+    def __init__(self):
+        self.session = None
+        self.credentials = None
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+
+
+class SessionPool(object):
+    '''Threadsafe pool of :class:`PooledSession` keyed by user.
+
+    .. attribute:: maxsize
+
+        Maximum number of users to keep sessions for.  The least recently
+        used session is dropped to make room for a new one.
+
+    .. attribute:: idle_timeout
+
+        Drop the sessions that have not been used for this many seconds.
+        None to keep them until they are pushed out by newer ones.
+    '''
+
+    def __init__(self, maxsize=256, idle_timeout=3600, pool_connections=10,
+                 pool_maxsize=10):
+        '''Create the pool.
+
+        :kwarg maxsize: Maximum number of user sessions.  Defaults to 256.
+        :kwarg idle_timeout: Seconds after which an unused session is
+            dropped.  Defaults to an hour.
+        :kwarg pool_connections: Number of hosts to keep connection pools
+            for.  Defaults to 10.
+        :kwarg pool_maxsize: Maximum number of connections to keep open to
+            a single host, shared by all users.  Defaults to 10.
+        '''
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def new_session(self):
+        '''Return a new :class:`requests.Session` that uses the shared
+        connections.'''
+        session = requests.Session()
+        for prefix in ('http://', 'https://'):
+            session.mount(prefix, self._adapter)
+        return session
+
+    def get(self, key):
+        '''Return the :class:`PooledSession` for ``key``, adding an empty one
+        if there is none.
+
+        :arg key: Hashable identifying the user, for instance a tuple of
+            username and server url
+        '''
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and self.idle_timeout and \
+                    now - entry.last_used > self.idle_timeout:
+                entry = None
+            if entry is None:
+                entry = PooledSession()
+                self._prune(now)
+            entry.last_used = now
+            # Mark as most recently used
+            self._entries[key] = entry
+            return entry
+
+    def _prune(self, now):
+        '''Make room for one more entry.  Must be called with the lock
+        held.'''
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if len(self._entries) < self.maxsize and not (
+                    self.idle_timeout and
+                    now - oldest.last_used > self.idle_timeout):
+                break
+            # Sessions are not closed here because that would close the
+            # shared adapter.  A thread still using the session can finish
+            # its request.
+            self._entries.popitem(last=False)
+
+    def discard(self, key):
+        '''Drop the session for ``key``.'''
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def close(self):
+        '''Drop every session and close the shared connections.'''
+        with self._lock:
+            self._entries.clear()
+        self._adapter.close()
+
+
+__all__ = ('PooledSession', 'SessionPool')
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''Store the session ids of :class:`~fedora.client.BaseClient` on disk.
+
+Session ids are kept in an sqlite database in WAL mode, one row per server
+and username, so that saving one user's session reads and writes only that
+row and any number of processes can use the database at the same time.
+Older versions of python-fedora pickled every session into a single file.
+The sessions in that file are imported the first time the database is
+created.  They apply to any server until a session for a specific server is
+saved.
+
+.. versionadded:: 1.2.0
+'''
+
+import logging
+import os
+from os import path
+import sqlite3
+import threading
+import time
+
+from kitchen.text.converters import to_bytes
+import six
+from six.moves import cPickle as pickle
+
+log = logging.getLogger(__name__)
+
+# Schema version stored in the database's user_version
+_SCHEMA_VERSION = 1
+
+# Sessions imported from the old pickle file are not tied to a server
+_ANY_SERVER = ''
+
+
+class SessionStore(object):
+    '''Session ids keyed by server and username.
+
+    Instances are threadsafe.  Each thread uses its own connection to the
+    database and sqlite locks the database between processes.  Errors
+    reading or writing the database are logged instead of raised; the
+    sessions only save having to log in again.
+    '''
+
+    def __init__(self, filename, legacy_filename=None, timeout=10.0):
+        '''Create the store.
+
+        :arg filename: sqlite database to keep the sessions in.  It is
+            created readable by its owner only.
+        :kwarg legacy_filename: Pickled session file of older versions of
+            python-fedora to import sessions from when the database is
+            created
+        :kwarg timeout: Seconds to wait for another process that is writing
+            to the database.  Defaults to 10.
+        '''
+        self.filename = filename
+        self.legacy_filename = legacy_filename
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            return connection
+
+        directory = path.dirname(self.filename)
+        if directory and not path.isdir(directory):
+            os.makedirs(directory, 0o755)
+        # Create the file ourselves so that it is private from the start
+        os.close(os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o600))
+
+        # Autocommit mode; transactions are started explicitly
+        connection = sqlite3.connect(self.filename, timeout=self.timeout,
+                                     isolation_level=None)
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        self._create_schema(connection)
+        self._local.connection = connection
+        return connection
+
+    def _create_schema(self, connection):
+        if connection.execute(
+                'PRAGMA user_version').fetchone()[0] == _SCHEMA_VERSION:
+            return
+        # Take the write lock so only one process creates the table and
+        # imports the old sessions
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if connection.execute(
+                    'PRAGMA user_version').fetchone()[0] != _SCHEMA_VERSION:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS sessions ('
+                    ' base_url TEXT NOT NULL, username TEXT NOT NULL,'
+                    ' session_id TEXT NOT NULL, updated REAL NOT NULL,'
+                    ' PRIMARY KEY (base_url, username))')
+                connection.executemany(
+                    'INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)',
+                    [(_ANY_SERVER, username, session_id, time.time())
+                     for username, session_id in self._legacy_sessions()])
+                connection.execute('PRAGMA user_version = %d' %
+                                   _SCHEMA_VERSION)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _legacy_sessions(self):
+        '''Return (username, session_id) tuples from the old pickle file.'''
+        if not self.legacy_filename or not path.isfile(self.legacy_filename):
+            return []
+        try:
+            with open(self.legacy_filename, 'rb') as session_file:
+                saved = pickle.load(session_file)
+        except Exception as e:  # pylint: disable-msg=W0703
+            log.info('Unable to import sessions from %(file)s: %(error)s' %
+                     {'file': self.legacy_filename, 'error': to_bytes(e)})
+            return []
+        # Very old versions saved Cookie.SimpleCookies.  Those are ignored
+        # by BaseClient anyway.
+        return [(username, session_id)
+                for username, session_id in saved.items()
+                if isinstance(session_id, six.string_types) and session_id]
+
+    def get(self, base_url, username):
+        '''Return the saved session id or an empty string.'''
+        try:
+            row = self._connect().execute(
+                'SELECT session_id FROM sessions'
+                ' WHERE username = ? AND base_url IN (?, ?)'
+                ' ORDER BY base_url DESC LIMIT 1',
+                (username, base_url, _ANY_SERVER)).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            log.info('Unable to load session from %(file)s: %(error)s' %
+                     {'file': self.filename, 'error': to_bytes(e)})
+            return ''
+        return row[0] if row else ''
+
+    def set(self, base_url, username, session_id):
+        '''Save a session id.'''
+        try:
+            connection = self._connect()
+            if session_id:
+                connection.execute(
+                    'INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)',
+                    (base_url, username, session_id, time.time()))
+            else:
+                self._delete(connection, base_url, username)
+        except (sqlite3.Error, OSError) as e:
+            # If we can't save the session, issue a warning but go on.  The
+            # session just keeps you from having to type your password over
+            # and over.
+            log.warning('Unable to write to session file %(file)s:'
+                        ' %(error)s' % {'file': self.filename,
+                                        'error': to_bytes(e)})
+
+    def delete(self, base_url, username):
+        '''Forget the session of a user.'''
+        try:
+            self._delete(self._connect(), base_url, username)
+        except (sqlite3.Error, OSError) as e:
+            log.warning('Unable to delete session from %(file)s:'
+                        ' %(error)s' % {'file': self.filename,
+                                        'error': to_bytes(e)})
+
+    def _delete(self, connection, base_url, username):
+        connection.execute(
+            'DELETE FROM sessions WHERE username = ? AND base_url IN (?, ?)',
+            (username, base_url, _ANY_SERVER))
+
+
+__all__ = ('SessionStore',)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''Share one call between threads that make the same request at once.
+
+When many threads of a web application look up the same user at the same
+moment, each of them would normally make its own request to the server.
+With a :class:`SingleFlight`, the first thread makes the request and the
+others wait for it and receive a copy of its result::
+
+    client = FasProxyClient(coalesce=True)
+
+Only enable this for clients whose requests do not change anything on the
+server.  Two identical requests made at the same time are sent once.
+
+.. versionadded:: 1.2.0
+'''
+
+import copy
+import threading
+
+
+class _Call(object):
+    '''A call in flight and the threads waiting for it.'''
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    '''Coalesce concurrent calls that have the same key.
+
+    .. attribute:: stats
+
+        dict counting the ``calls`` that were actually made and the calls
+        that were ``coalesced`` into a call already in flight
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key, func):
+        '''Call ``func`` unless a call with the same ``key`` is in flight.
+
+        If another thread is already running a call with ``key``, wait for it
+        to finish instead and return a deep copy of its result or raise the
+        exception that it raised.
+
+        :arg key: Hashable identifying the call
+        :arg func: Callable taking no arguments that makes the call
+        :returns: The return value of ``func``
+        '''
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.stats['calls'] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.stats['coalesced'] += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waiters = call.waiters
+            if waiters and call.error is None:
+                # The caller may change its result as soon as we return so
+                # keep a pristine copy for the waiters to copy from
+                call.result = copy.deepcopy(result)
+            call.done.set()
+        return result
+
+
+__all__ = ('SingleFlight',)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''Pooled, keep-alive HTTP transport shared by the proxy clients.
+
+.. versionadded:: 1.2.0
+'''
+
+import logging
+import threading
+import time
+
+import requests
+import requests.adapters
+from six.moves import http_cookiejar as cookielib
+from six.moves.urllib.parse import urlparse
+
+log = logging.getLogger(__name__)
+
+#: Port to use for the pool key when the url doesn't specify one
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class _RejectCookiesPolicy(cookielib.DefaultCookiePolicy):
+    '''Cookie policy that never stores cookies sent by the server.
+
+    The :class:`PooledTransport` shares one :class:`requests.Session` between
+    every user of a :class:`~fedora.client.ProxyClient`.  If the session were
+    allowed to keep the cookies that the server sets, one user's session
+    cookie could be sent along with another user's request.  Cookies set by
+    the server are still available on each individual response.
+    '''
+    def set_ok(self, cookie, request):
+        return False
+
+
+def _host_key(url):
+    '''Return the (scheme, host, port) tuple that a url's pool is keyed by.'''
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    port = parsed.port or _DEFAULT_PORTS.get(scheme)
+    return (scheme, (parsed.hostname or '').lower(), port)
+
+
+class PooledTransport(object):
+    '''Threadsafe HTTP transport with per-host keep-alive connection pools.
+
+    One instance of this class can be shared by any number of threads and
+    clients.  Connections to each host are kept alive and reused between
+    requests so that we only pay for the TCP and TLS handshakes once per
+    connection instead of once per request.  Connections to a host which has
+    not been contacted for :attr:`idle_timeout` seconds are closed.
+
+    The transport holds no per-user state.  Cookies set by the server are
+    returned on the response but are never stored in the transport so the
+    session semantics of :meth:`fedora.client.ProxyClient.send_request` are
+    unchanged.
+
+    .. attribute:: pool_connections
+
+        Number of hosts to keep connection pools for.
+
+    .. attribute:: pool_maxsize
+
+        Maximum number of connections to keep open to a single host.
+
+    .. attribute:: idle_timeout
+
+        Close the pooled connections to a host that has not been used for
+        this many seconds.  Set to :data:`None` or ``0`` to never close idle
+        connections.
+
+    .. attribute:: max_per_host
+
+        Maximum number of requests to send to a single host at the same time
+        or None for no limit.  Threads wait for one of the requests to finish
+        before sending more.
+    '''
+
+    def __init__(self, pool_connections=10, pool_maxsize=10,
+                 idle_timeout=60.0, max_per_host=None):
+        '''Create a transport.
+
+        :kwarg pool_connections: Number of hosts to keep connection pools
+            for.  Defaults to 10.
+        :kwarg pool_maxsize: Maximum number of connections to keep open to
+            a single host.  Defaults to 10.  Set this to at least the number
+            of threads that will talk to the server concurrently.
+        :kwarg idle_timeout: Close the pooled connections to a host after
+            they have been unused for this many seconds.  Defaults to 60
+            seconds.
+        :kwarg max_per_host: Maximum number of requests in flight to one
+            host, shared by every thread and client using the transport.
+            Defaults to None, no limit.
+        '''
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+        self.max_per_host = max_per_host
+
+        self._session = requests.Session()
+        self._session.cookies.set_policy(_RejectCookiesPolicy())
+        self._adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        for prefix in ('http://', 'https://'):
+            self._session.mount(prefix, self._adapter)
+
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._last_reap = time.time()
+        self._host_slots = {}
+
+    def _touch(self, host):
+        with self._lock:
+            self._last_used[host] = time.time()
+
+    def _slots(self, host):
+        '''Return the semaphore limiting the requests in flight to host.'''
+        with self._lock:
+            slots = self._host_slots.get(host)
+            if slots is None:
+                slots = threading.BoundedSemaphore(self.max_per_host)
+                self._host_slots[host] = slots
+            return slots
+
+    def request(self, method, url, **kwargs):
+        '''Make an HTTP request over a pooled connection.
+
+        :arg method: HTTP verb to use
+        :arg url: URL to send the request to
+        :kwarg kwargs: Any other keyword arguments are passed on to
+            :meth:`requests.Session.request`
+        :returns: the :class:`requests.Response` from the server
+        '''
+        self.reap_idle()
+        host = _host_key(url)
+        if not self.max_per_host:
+            return self._request(host, method, url, kwargs)
+        with self._slots(host):
+            return self._request(host, method, url, kwargs)
+
+    def _request(self, host, method, url, kwargs):
+        self._touch(host)
+        try:
+            return self._session.request(method, url, **kwargs)
+        finally:
+            self._touch(host)
+
+    def post(self, url, **kwargs):
+        '''Make an HTTP POST request over a pooled connection.
+
+        See :meth:`request` for the arguments.
+        '''
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        '''Make an HTTP GET request over a pooled connection.
+
+        See :meth:`request` for the arguments.
+        '''
+        return self.request('GET', url, **kwargs)
+
+    def reap_idle(self):
+        '''Close the connection pools of hosts that have been idle too long.
+
+        This is called at the start of every request so there is normally no
+        need to call it directly.  The scan is only done every
+        :attr:`idle_timeout` / 2 seconds so it is cheap to call.
+        '''
+        if not self.idle_timeout:
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._last_reap < self.idle_timeout / 2.0:
+                return
+            self._last_reap = now
+            stale = [host for host, last_used in self._last_used.items()
+                     if now - last_used > self.idle_timeout]
+            for host in stale:
+                del self._last_used[host]
+
+        for host in stale:
+            log.debug('Closing idle connections to %s://%s:%s' % host)
+            self._close_host(host)
+
+    def _close_host(self, host):
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            if (key.key_scheme, key.key_host, key.key_port) == host:
+                try:
+                    # Removing the pool from the container closes its idle
+                    # connections.  Connections in use by another thread are
+                    # closed when they are released.
+                    del pools[key]
+                except KeyError:
+                    # Another thread got here first
+                    pass
+
+    def close(self):
+        '''Close all pooled connections.'''
+        with self._lock:
+            self._last_used.clear()
+        self._session.close()
+
+
+__all__ = ('PooledTransport',)
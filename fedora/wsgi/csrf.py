@@ -45,11 +45,15 @@ from paste.httpexceptions import HTTPFound
 from paste.response import replace_header
 from repoze.who.interfaces import IMetadataProvider
 from zope.interface import implements
+from six.moves.urllib.parse import unquote_plus, urljoin
 
 from fedora.urlutils import update_qs
 
 log = logging.getLogger(__name__)
 
+_FORM_CONTENT_TYPES = ('application/x-www-form-urlencoded',
+                       'multipart/form-data')
+
 
 class CSRFProtectionMiddleware(object):
     '''
@@ -128,10 +132,17 @@ class CSRFProtectionMiddleware(object):
         attached to ``environ['repoze.who.identity']['_csrf_token']``.  If it
         does not match, or if a token is not provided, it will remove the
         user from the ``environ``, based on the ``clear_env`` setting.
+
+        The response of the application is passed through as it is
+        produced.  Only its headers are changed, and only when the user is
+        logging in.
+
+        .. versionchanged:: 1.2.0
+            Responses are streamed instead of being read into memory.
         '''
-        request = Request(environ)
         log.debug('CSRFProtectionMiddleware(%(r_path)s)' %
-                  {'r_path': to_bytes(request.path)})
+                  {'r_path': to_bytes(environ.get('SCRIPT_NAME', '') +
+                                      environ.get('PATH_INFO', ''))})
 
         token = environ.get('repoze.who.identity', {}).get(self.csrf_token_id)
         csrf_token = environ.get(self.token_env)
@@ -154,21 +165,28 @@ class CSRFProtectionMiddleware(object):
                                 {'u_token': to_bytes(csrf_token),
                                  'e_token': to_bytes(token)})
 
-        response = request.get_response(self.application)
-
-        if environ.get(self.auth_state):
-            log.debug('CSRF_AUTH_STATE; rewriting headers')
-            token = environ.get('repoze.who.identity', {})\
-                           .get(self.csrf_token_id)
+        def csrf_start_response(status, headers, exc_info=None):
+            if environ.get(self.auth_state):
+                headers = self._add_token_to_location(environ, headers)
+                environ[self.auth_state] = None
+            return start_response(status, headers, exc_info)
 
-            loc = update_qs(
-                response.location, {self.csrf_token_id: str(token)})
-            response.location = loc
-            log.debug('response.location = %(r_loc)s' %
-                      {'r_loc': to_bytes(response.location)})
-            environ[self.auth_state] = None
+        return self.application(environ, csrf_start_response)
 
-        return response(environ, start_response)
+    def _add_token_to_location(self, environ, headers):
+        '''Return ``headers`` with the CSRF token added to the Location'''
+        log.debug('CSRF_AUTH_STATE; rewriting headers')
+        token = environ.get('repoze.who.identity', {}).get(self.csrf_token_id)
+        new_headers = []
+        for name, value in headers:
+            if name.lower() == 'location':
+                # Resolve relative locations the way webob does
+                value = update_qs(urljoin(Request(environ).path_url, value),
+                                  {self.csrf_token_id: str(token)})
+                log.debug('response.location = %(r_loc)s' %
+                          {'r_loc': to_bytes(value)})
+            new_headers.append((name, value))
+        return new_headers
 
 
 class CSRFMetadataProvider(object):
@@ -192,6 +210,13 @@ class CSRFMetadataProvider(object):
         base_config.sa_auth.mdproviders = [('csrfmd', CSRFMetadataProvider())]
 
     Note: If you use the faswho plugin, this is turned on automatically.
+
+    The CSRF token is looked for in the ``X-CSRF-Token`` header, then in the
+    query string, and then in urlencoded and multipart form bodies.  Clients
+    that send the header, like :class:`fedora.client.ProxyClient`, spare
+    the server from parsing their request bodies.  Set ``max_form_size`` to
+    also skip parsing large bodies, such as file uploads, that come without
+    the header.
     '''
     implements(IMetadataProvider)
 
@@ -199,7 +224,8 @@ class CSRFMetadataProvider(object):
                  clear_env='repoze.who.identity repoze.what.credentials',
                  login_handler='/post_login', token_env='CSRF_TOKEN',
                  auth_session_id='CSRF_AUTH_SESSION_ID',
-                 auth_state='CSRF_AUTH_STATE'):
+                 auth_state='CSRF_AUTH_STATE', token_header='X-CSRF-Token',
+                 max_form_size=None):
         '''
         Create the CSRF Metadata Provider Plugin.
 
@@ -215,6 +241,14 @@ class CSRFMetadataProvider(object):
             session id
         :kwarg auth_state: The environ key that indicates when we are
             logging in
+        :kwarg token_header: Request header that may contain the CSRF token.
+            Defaults to ``X-CSRF-Token``.
+        :kwarg max_form_size: Largest form request body, in bytes, to look
+            for the CSRF token in.  Defaults to None, which parses form bodies
+            of any size.
+
+        .. versionchanged:: 1.2.0
+            Added the token_header and max_form_size kwargs
         '''
         self.csrf_token_id = csrf_token_id
         self.session_cookie = session_cookie
@@ -223,6 +257,8 @@ class CSRFMetadataProvider(object):
         self.token_env = token_env
         self.auth_session_id = auth_session_id
         self.auth_state = auth_state
+        self.token_header = token_header
+        self.max_form_size = max_form_size
 
     def strip_script(self, environ, path):
         # Strips the script portion of a url path so the middleware works even
@@ -287,21 +323,55 @@ class CSRFMetadataProvider(object):
     def extract_csrf_token(self, request):
         '''Extract and remove the CSRF token from a given
         :class:`webob.Request`
+
+        .. versionchanged:: 1.2.0
+            Look in the ``token_header`` first and only parse the request
+            body if the token is not there.
         '''
-        csrf_token = None
+        csrf_token = self._strip_query_token(request)
 
-        if self.csrf_token_id in request.GET:
-            log.debug("%(token)s in GET" % {'token':
-                                            to_bytes(self.csrf_token_id)})
-            csrf_token = request.GET[self.csrf_token_id]
-            del(request.GET[self.csrf_token_id])
-            request.query_string = '&'.join(['%s=%s' % (k, v) for k, v in
-                                             request.GET.items()])
+        header_token = request.headers.get(self.token_header)
+        if header_token:
+            log.debug("%(token)s in headers" % {'token':
+                                                to_bytes(self.token_header)})
+            return header_token
 
-        if self.csrf_token_id in request.POST:
+        if self._may_parse_body(request) and \
+                self.csrf_token_id in request.POST:
             log.debug("%(token)s in POST" % {'token':
                                              to_bytes(self.csrf_token_id)})
             csrf_token = request.POST[self.csrf_token_id]
             del(request.POST[self.csrf_token_id])
 
         return csrf_token
+
+    def _strip_query_token(self, request):
+        '''Remove the CSRF token from the query string and return it.
+
+        The other parameters are left exactly as the client encoded them.
+        '''
+        query_string = request.environ.get('QUERY_STRING', '')
+        if self.csrf_token_id not in unquote_plus(query_string):
+            return None
+        csrf_token = None
+        params = []
+        for param in query_string.split('&'):
+            name, _sep, value = param.partition('=')
+            if unquote_plus(name) == self.csrf_token_id:
+                csrf_token = unquote_plus(value)
+            else:
+                params.append(param)
+        if csrf_token is not None:
+            log.debug("%(token)s in GET" % {'token':
+                                            to_bytes(self.csrf_token_id)})
+            request.query_string = '&'.join(params)
+        return csrf_token
+
+    def _may_parse_body(self, request):
+        '''Return True if the body is a form no larger than max_form_size.'''
+        if request.content_type not in _FORM_CONTENT_TYPES:
+            return False
+        if self.max_form_size is None:
+            return True
+        length = request.content_length
+        return length is not None and length <= self.max_form_size
@@ -28,7 +28,11 @@ repoze.who plugin to authenticate against hte Fedora Account System
     - Added secure and httponly as optional attributes to the session cookie
     - Removed too-aggressive caching (wouldn't detect logout from another app)
     - Added ability to authenticate and request a page in one request
+.. versionchanged:: 1.2.0
+    - Added an optional short-lived cache of the users identified by session
+      cookie
 '''
+import copy
 import os
 import sys
 import logging
@@ -46,9 +50,11 @@ from repoze.who.interfaces import IChallenger, IIdentifier
 from repoze.who.plugins.basicauth import BasicAuthPlugin
 from repoze.who.plugins.friendlyform import FriendlyFormPlugin
 from paste.request import parse_dict_querystring, parse_formvars
-from six.moves.urllib.parse import quote_plus
+import six
+from six.moves.urllib.parse import parse_qs, quote_plus
 import webob
 
+from fedora.cacheutils import CredentialCache, TTLCache, make_cache
 from fedora.client import AuthError
 from fedora.client.fasproxy import FasProxyClient
 from fedora.wsgi.csrf import CSRFMetadataProvider, CSRFProtectionMiddleware
@@ -60,6 +66,31 @@ FAS_CACHE_TIMEOUT = 900  # 15 minutes (FAS visits timeout after 20)
 
 fas_cache = Cache('fas_repozewho_cache', type='memory')
 
+# Marks a session id that FAS told us is invalid in the identity cache
+_INVALID_SESSION = 'invalid'
+
+# Content types of request bodies that a TG1 style login may be sent in on
+# any page.  Elsewhere only the query string is checked.
+_LOGIN_FORM_TYPES = ('application/x-www-form-urlencoded',)
+
+
+class _BeakerCache(object):
+    '''Give a beaker :class:`~beaker.cache.Cache` the fedora.cacheutils API'''
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self, key, default=None):
+        try:
+            return self.cache.get_value(key)
+        except KeyError:
+            return default
+
+    def set(self, key, value, ttl=None):
+        self.cache.set_value(key, value, expiretime=ttl)
+
+    def delete(self, key):
+        self.cache.remove_value(key=key)
+
 
 def fas_request_classifier(environ):
     classifier = default_request_classifier(environ)
@@ -77,7 +108,11 @@ def make_faswho_middleware(
         login_form_url='/login',
         logout_handler='/logout_handler',
         post_login_url='/post_login', post_logout_url=None, fas_url=FAS_URL,
-        insecure=False, ssl_cookie=True, httponly=True):
+        insecure=False, ssl_cookie=True, httponly=True,
+        identity_cache_ttl=None, identity_cache_size=1024,
+        identity_cache_negative_ttl=None, cache=None,
+        credential_cache_ttl=None, credential_cache_size=1024,
+        user_cache=None):
     '''
     :arg app: WSGI app that is being wrapped
     :kwarg log_stream: :class:`logging.Logger` to log auth messages
@@ -98,6 +133,31 @@ def make_faswho_middleware(
         using the session cookie to pass information to JavaScript clients but
         also prevents XSS attacks from stealing the session cookie
         information.
+    :kwarg identity_cache_ttl: Number of seconds to cache the user
+        information retrieved for a session cookie.  See
+        :class:`FASWhoPlugin`.  Defaults to None, no caching.
+    :kwarg identity_cache_size: Maximum number of sessions to cache.
+        Defaults to 1024.
+    :kwarg identity_cache_negative_ttl: Number of seconds to remember that a
+        session cookie is invalid.  Defaults to ``identity_cache_ttl``.
+    :kwarg cache: Cache shared by the worker processes.  Either a cache
+        object from :mod:`fedora.cacheutils` or a string for
+        :func:`fedora.cacheutils.make_cache` such as
+        ``memcached://127.0.0.1:11211``.  See :class:`FASWhoPlugin`.
+        Defaults to None, a cache private to each process.
+    :kwarg user_cache: Cache or string for the information of the users
+        that logged in, if it should not be kept with the sessions in
+        ``cache``.  See :class:`FASWhoPlugin`.
+    :kwarg credential_cache_ttl: Number of seconds to trust a username and
+        password that FAS accepted, for instance from HTTP Basic auth.  See
+        :class:`FASWhoPlugin`.  Defaults to None, no caching.
+    :kwarg credential_cache_size: Maximum number of users to cache
+        passwords for.  Defaults to 1024.
+
+    .. versionchanged:: 1.2.0
+        Added the identity_cache_ttl, identity_cache_size,
+        identity_cache_negative_ttl, cache, credential_cache_ttl,
+        credential_cache_size, and user_cache kwargs
     '''
 
     # Because of the way we override values (via a dict in AppConfig), we
@@ -107,8 +167,14 @@ def make_faswho_middleware(
         raise TypeError(
             'log_stream must be set when calling make_fasauth_middleware()')
 
-    faswho = FASWhoPlugin(fas_url, insecure=insecure, ssl_cookie=ssl_cookie,
-                          httponly=httponly)
+    faswho = FASWhoPlugin(
+        fas_url, insecure=insecure, ssl_cookie=ssl_cookie, httponly=httponly,
+        identity_cache_ttl=identity_cache_ttl,
+        identity_cache_size=identity_cache_size,
+        identity_cache_negative_ttl=identity_cache_negative_ttl, cache=cache,
+        login_handler=login_handler,
+        credential_cache_ttl=credential_cache_ttl,
+        credential_cache_size=credential_cache_size, user_cache=user_cache)
     csrf_mdprovider = CSRFMetadataProvider()
 
     form = FriendlyFormPlugin(login_form_url,
@@ -152,35 +218,166 @@ def make_faswho_middleware(
 
 
 class FASWhoPlugin(object):
+    '''repoze.who plugin that identifies and authenticates users with FAS
+
+    .. attribute:: identity_cache
+
+        :data:`None` or a cache from :mod:`fedora.cacheutils` holding the
+        user information that FAS returned for each session cookie.  Requests
+        with a cached session cookie are identified without contacting FAS.
+        This means that logging out from a different application is only
+        noticed once the entry expires.  Logging out through this plugin
+        removes the entry right away.  The cache's
+        :attr:`~fedora.cacheutils.TTLCache.stats` can be used for
+        monitoring.
+
+    .. attribute:: user_cache
+
+        Cache holding the user information of the users that logged in, used
+        by :meth:`remember`, :meth:`forget`, and :meth:`add_metadata`.
+
+    .. attribute:: credential_cache
+
+        :data:`None` or a :class:`fedora.cacheutils.CredentialCache` of the
+        usernames and passwords that FAS accepted and the user information
+        it returned.  Clients that send their password with every request
+        through HTTP Basic auth are then only verified with FAS once every
+        ``credential_cache_ttl`` seconds.  Logins through the login form
+        always start a new FAS session and do not use this cache.  A user's
+        entry is removed when FAS rejects their password or when they log
+        out through this plugin.
+
+    By default both caches are private to the process.  Pass a cache that is
+    shared between processes, like a :class:`fedora.cacheutils.FileCache` or
+    :class:`fedora.cacheutils.MemcachedCache`, as ``cache`` to use it for
+    both.  Then every worker process sees the logins and logouts handled by
+    the others.  When ``cache`` is a string for
+    :func:`~fedora.cacheutils.make_cache`, the sessions and the users are
+    kept in separate caches made from it, so that many sessions cannot push
+    the users out.  A cache object is used for both unless another one is
+    passed as ``user_cache``.  Users that are missing from
+    :attr:`user_cache` are looked up in FAS again.
+
+    Login forms are only parsed from requests to ``login_handler``, from
+    urlencoded request bodies, and from query strings with a ``login``
+    parameter.  Other requests, such as API calls and file uploads, are
+    identified from their session cookie without reading the body.
+
+    .. versionchanged:: 1.2.0
+        Added the identity_cache, credential_cache, and user_cache
+        attributes and the login_handler kwarg.  Request bodies are only
+        parsed when they may hold a login form.
+    '''
 
     def __init__(self, url, insecure=False, session_cookie='tg-visit',
-                 ssl_cookie=True, httponly=True):
+                 ssl_cookie=True, httponly=True, identity_cache_ttl=None,
+                 identity_cache_size=1024, identity_cache_negative_ttl=None,
+                 cache=None, login_handler='/login_handler',
+                 credential_cache_ttl=None, credential_cache_size=1024,
+                 user_cache=None):
         self.url = url
         self.insecure = insecure
         self.fas = FasProxyClient(url, insecure=insecure)
         self.session_cookie = session_cookie
         self.ssl_cookie = ssl_cookie
         self.httponly = httponly
-        self._session_cache = {}
+        self.login_handler = login_handler
+        if isinstance(user_cache, six.string_types):
+            user_cache = make_cache(user_cache, ttl=FAS_CACHE_TIMEOUT)
+        if isinstance(cache, six.string_types):
+            if user_cache is None:
+                user_cache = make_cache(cache, ttl=FAS_CACHE_TIMEOUT,
+                                        namespace='users')
+            cache = make_cache(cache, ttl=FAS_CACHE_TIMEOUT,
+                               namespace='sessions')
+        if user_cache is None:
+            user_cache = cache if cache is not None else \
+                _BeakerCache(fas_cache)
+        self.user_cache = user_cache
+        if cache is None and identity_cache_ttl:
+            cache = TTLCache(maxsize=identity_cache_size,
+                             ttl=identity_cache_ttl)
+        if identity_cache_ttl:
+            self.identity_cache = cache
+        else:
+            self.identity_cache = None
+        self.identity_cache_ttl = identity_cache_ttl
+        if identity_cache_negative_ttl is None:
+            identity_cache_negative_ttl = identity_cache_ttl
+        self.identity_cache_negative_ttl = identity_cache_negative_ttl
+        if credential_cache_ttl:
+            self.credential_cache = CredentialCache(
+                maxsize=credential_cache_size, ttl=credential_cache_ttl)
+        else:
+            self.credential_cache = None
         self._metadata_plugins = []
 
         for entry in pkg_resources.iter_entry_points(
                 'fas.repoze.who.metadata_plugins'):
             self._metadata_plugins.append(entry.load())
 
-    def _retrieve_user_info(self, environ, auth_params=None):
+    def _retrieve_user_info(self, environ, auth_params=None,
+                            basic_auth=False):
         ''' Retrieve information from fas and cache the results.
 
-            We need to retrieve the user fresh every time because we need to
-            know that the password hasn't changed or the session_id hasn't
-            been invalidated by the user logging out.
+            Unless :attr:`identity_cache` is set, we need to retrieve the user
+            fresh every time because we need to know that the password hasn't
+            changed or the session_id hasn't been invalidated by the user
+            logging out.  Lookups by session_id are cached in
+            :attr:`identity_cache`.  Lookups by username and password are
+            cached in :attr:`credential_cache` if ``basic_auth`` is True.
+            Other logins need a FAS session of their own so they are always
+            sent to FAS.
         '''
         if not auth_params:
             return None
 
-        user_data = self.fas.get_user_info(auth_params)
+        session_id = None
+        if self.identity_cache is not None and list(auth_params) == [
+                'session_id']:
+            session_id = auth_params['session_id']
+            user_data = self.identity_cache.get(
+                self._session_key(session_id))
+            if user_data == _INVALID_SESSION:
+                return None
+            if user_data is not None:
+                # The user entry may have expired, been evicted, or been
+                # removed by a logout from another session of the user.
+                # add_metadata() and remember() need it.
+                username = user_data[1]['username']
+                if self.user_cache.get(username) is None:
+                    self.user_cache.set(username, user_data,
+                                        ttl=FAS_CACHE_TIMEOUT)
+                # Callers modify the user data so hand out a copy
+                return copy.deepcopy(user_data)
+
+        username = None
+        if self.credential_cache is not None and sorted(auth_params) == [
+                'password', 'username']:
+            username = auth_params['username']
+        if username and basic_auth:
+            user_data = self.credential_cache.get(username,
+                                                  auth_params['password'])
+            if user_data is not None:
+                if self.user_cache.get(username) is None:
+                    self.user_cache.set(username, user_data,
+                                        ttl=FAS_CACHE_TIMEOUT)
+                return copy.deepcopy(user_data)
+
+        try:
+            user_data = self.fas.get_user_info(auth_params)
+        except AuthError:
+            if username:
+                self.credential_cache.delete(username)
+            raise
 
         if not user_data:
+            if session_id:
+                self.identity_cache.set(
+                    self._session_key(session_id), _INVALID_SESSION,
+                    ttl=self.identity_cache_negative_ttl)
+            if username:
+                self.credential_cache.delete(username)
             self.forget(environ, None)
             return None
         if isinstance(user_data, tuple):
@@ -206,10 +403,48 @@ class FASWhoPlugin(object):
 
         user_data[1]['groups'] = groups
         # If we have information on the user, cache it for later
-        fas_cache.set_value(user_data[1]['username'], user_data,
-                            expiretime=FAS_CACHE_TIMEOUT)
+        self.user_cache.set(user_data[1]['username'], user_data,
+                            ttl=FAS_CACHE_TIMEOUT)
+        if session_id:
+            self.identity_cache.set(self._session_key(session_id),
+                                    copy.deepcopy(user_data),
+                                    ttl=self.identity_cache_ttl)
+        if username and basic_auth:
+            self.credential_cache.set(username, auth_params['password'],
+                                      copy.deepcopy(user_data))
         return user_data
 
+    def _cached_user_data(self, environ, username):
+        '''Return the user data of ``username`` from :attr:`user_cache`.
+
+        If it is not cached, it is retrieved from FAS again with the session
+        of the request.
+
+        :returns: list of the session id and the user information or None if
+            there is no valid session for ``username``
+        '''
+        user_data = self.user_cache.get(username)
+        if user_data is not None:
+            return user_data
+        session_id = environ.get('CSRF_AUTH_SESSION_ID') or \
+            webob.Request(environ).cookies.get(self.session_cookie)
+        if not session_id:
+            return None
+        try:
+            user_data = self._retrieve_user_info(
+                environ, auth_params={'session_id': session_id})
+        except Exception as e:  # pylint:disable-msg=W0703
+            log.warning(e)
+            return None
+        if not user_data or user_data[1]['username'] != username:
+            return None
+        return user_data
+
+    def _session_key(self, session_id):
+        # Usernames never contain a colon so these can share a cache with
+        # the user data which is keyed by username
+        return 'session:%s' % session_id
+
     def identify(self, environ):
         '''Extract information to identify a user
 
@@ -223,28 +458,13 @@ class FASWhoPlugin(object):
             environ['repoze.who.logins'] = 0
 
         req = webob.Request(environ, charset='utf-8')
-        cookie = req.cookies.get(self.session_cookie)
 
-        # This is compatible with TG1 and it gives us a way to authenticate
-        # a user without making two requests
-        query = req.GET
-        form = Munch(req.POST)
-        form.update(query)
-        if form.get('login', None) == 'Login' and \
-                'user_name' in form and \
-                'password' in form:
-            identity = {
-                'login': form['user_name'],
-                'password': form['password']
-            }
-            keys = ('login', 'password', 'user_name')
-            for k in keys:
-                if k in req.GET:
-                    del(req.GET[k])
-                if k in req.POST:
-                    del(req.POST[k])
-            return identity
+        if self._may_have_login_form(environ):
+            identity = self._identify_login_form(req)
+            if identity:
+                return identity
 
+        cookie = req.cookies.get(self.session_cookie)
         if cookie is None:
             return None
 
@@ -268,11 +488,50 @@ class FASWhoPlugin(object):
                     'password': user_data[1]['password']}
         return identity
 
+    def _may_have_login_form(self, environ):
+        '''Return True if the request may contain a login form.
+
+        Decided from the path, content type and query string so that the
+        request body is not read.
+        '''
+        if 'login' in parse_qs(environ.get('QUERY_STRING', ''),
+                               keep_blank_values=True):
+            return True
+        if self.login_handler and \
+                environ.get('PATH_INFO') == self.login_handler:
+            return True
+        content_type = environ.get('CONTENT_TYPE', '')
+        return content_type.split(';', 1)[0].strip().lower() in \
+            _LOGIN_FORM_TYPES
+
+    def _identify_login_form(self, req):
+        '''Return the username and password of a login form or None.'''
+        # This is compatible with TG1 and it gives us a way to authenticate
+        # a user without making two requests
+        query = req.GET
+        form = Munch(req.POST)
+        form.update(query)
+        if form.get('login', None) == 'Login' and \
+                'user_name' in form and \
+                'password' in form:
+            identity = {
+                'login': form['user_name'],
+                'password': form['password']
+            }
+            keys = ('login', 'password', 'user_name')
+            for k in keys:
+                if k in req.GET:
+                    del(req.GET[k])
+                if k in req.POST:
+                    del(req.POST[k])
+            return identity
+        return None
+
     def remember(self, environ, identity):
         log.info('In remember()')
         result = []
 
-        user_data = fas_cache.get_value(identity['login'])
+        user_data = self._cached_user_data(environ, identity['login'])
         try:
             session_id = user_data[0]
         except Exception:
@@ -291,10 +550,28 @@ class FASWhoPlugin(object):
         log.info('In forget()')
         # return a expires Set-Cookie header
 
-        user_data = fas_cache.get_value(identity['login'])
+        login = identity.get('login') if identity else None
+        if not login:
+            return None
+        if self.credential_cache is not None:
+            self.credential_cache.delete(login)
+
+        user_data = self.user_cache.get(login)
         try:
             session_id = user_data[0]
         except Exception:
+            session_id = None
+        # The browser may have sent a different cookie than the one cached
+        # for this user, or the user entry may be gone
+        cookie = webob.Request(environ).cookies.get(self.session_cookie)
+
+        if self.identity_cache is not None:
+            for s_id in set((session_id, cookie)):
+                if s_id:
+                    self.identity_cache.delete(self._session_key(s_id))
+
+        session_id = session_id or cookie
+        if not session_id:
             return None
 
         log.info('Forgetting login data for cookie %(s_id)s' %
@@ -303,7 +580,7 @@ class FASWhoPlugin(object):
         self.fas.logout(session_id)
 
         result = []
-        fas_cache.remove_value(key=identity['login'])
+        self.user_cache.delete(login)
         expired = '%s=\'\'; Path=/; Expires=Sun, 10-May-1971 11:59:00 GMT'\
                   % self.session_cookie
         result.append(('Set-Cookie', expired))
@@ -317,6 +594,7 @@ class FASWhoPlugin(object):
             log.info(msg)
             err = 1
             environ['FAS_AUTH_ERROR'] = err
+            came_from = self._came_from(environ, default_came_from)
             # HTTPForbidden ?
             err_app = HTTPFound(err_goto + '?' +
                                 'came_from=' + quote_plus(came_from))
@@ -329,11 +607,6 @@ class FASWhoPlugin(object):
             err_goto = sn + err_goto
             default_came_from = sn + default_came_from
 
-        query = parse_dict_querystring(environ)
-        form = parse_formvars(environ)
-        form.update(query)
-        came_from = form.get('came_from', default_came_from)
-
         try:
             auth_params = {'username': identity['login'],
                            'password': identity['password']}
@@ -346,7 +619,9 @@ class FASWhoPlugin(object):
                 return None
 
         try:
-            user_data = self._retrieve_user_info(environ, auth_params)
+            user_data = self._retrieve_user_info(
+                environ, auth_params, basic_auth=isinstance(
+                    identity.get('identifier'), BasicAuthPlugin))
         except AuthError as e:
             set_error('Authentication failed: %s' % exception_to_bytes(e))
             log.warning(e)
@@ -369,6 +644,18 @@ class FASWhoPlugin(object):
                   ' Please try again.')
         return None
 
+    def _came_from(self, environ, default):
+        '''Return the page to send the user back to after a failed login.
+
+        The request body is only parsed if it may hold a login form.
+        '''
+        query = parse_dict_querystring(environ)
+        if 'came_from' in query:
+            return query['came_from']
+        if self._may_have_login_form(environ):
+            return parse_formvars(environ).get('came_from', default)
+        return default
+
     def add_metadata(self, environ, identity):
         log.info('In add_metadata')
 
@@ -383,9 +670,12 @@ class FASWhoPlugin(object):
         del plugin_user_info
 
         user = identity.get('repoze.who.userid')
-        (session_id, user_info) = fas_cache.get_value(
-            key=user,
-            expiretime=FAS_CACHE_TIMEOUT)
+        user_data = self._cached_user_data(environ, user)
+        if user_data is None:
+            log.warning('No information about %(user)s, not setting metadata'
+                        % {'user': to_bytes(user)})
+            return None
+        (session_id, user_info) = user_data
 
         #### FIXME: Deprecate this line!!!
         # If we make a new version of fas.who middleware, get rid of saving
@@ -36,6 +36,7 @@ try:
     from flask import _app_ctx_stack as stack
 except ImportError:
     from flask import _request_ctx_stack as stack
+from werkzeug.local import LocalProxy
 
 from openid.consumer import consumer
 from openid.fetchers import setDefaultFetcher, Urllib2Fetcher
@@ -79,9 +80,41 @@ class FASJSONEncoder(flask.json.JSONEncoder):
         """
         if isinstance(o, (set, frozenset)):
             return list(o)
+        if isinstance(o, LocalProxy):
+            # flask.g.fas_user
+            return o._get_current_object()
         return flask.json.JSONEncoder.default(self, o)
 
 
+def _build_fas_user(user):
+    ''' Return the Munch for flask.g.fas_user from the session data. '''
+    user = dict(user)
+    # Add approved_memberships to provide backwards compatibility
+    # New applications should only use g.fas_user.groups
+    user['approved_memberships'] = [Munch(name=group)
+                                    for group in user['groups']]
+    fas_user = Munch.fromDict(user)
+    fas_user.groups = frozenset(fas_user.groups)
+    return fas_user
+
+
+def _current_fas_user():
+    ''' Build flask.g.fas_user the first time it is used.
+
+    The result is reused until the user data in the session is replaced.
+    None is returned once the view has logged the user out or cleared the
+    session.
+    '''
+    user = flask.session.get('FLASK_FAS_OPENID_USER')
+    if user is None:
+        return None
+    cached = getattr(flask.g, '_fas_user_cache', None)
+    if cached is None or cached[0] is not user:
+        cached = (user, _build_fas_user(user))
+        flask.g._fas_user_cache = cached
+    return cached[1]
+
+
 class FAS(object):
     """ The Flask plugin. """
 
@@ -97,6 +130,7 @@ class FAS(object):
         app.config.setdefault('FAS_OPENID_ENDPOINT',
                               'https://id.fedoraproject.org/openid/')
         app.config.setdefault('FAS_OPENID_CHECK_CERT', True)
+        app.config.setdefault('FAS_OPENID_EXCLUDE_ENDPOINTS', ())
 
         if not self.app.config['FAS_OPENID_CHECK_CERT']:
             setDefaultFetcher(Urllib2Fetcher())
@@ -197,20 +231,16 @@ class FAS(object):
             return 'Strange state: %s' % info.status
 
     def _check_session(self):
-        if 'FLASK_FAS_OPENID_USER' not in flask.session \
-                or flask.session['FLASK_FAS_OPENID_USER'] is None:
+        if flask.request.endpoint in \
+                self.app.config['FAS_OPENID_EXCLUDE_ENDPOINTS']:
+            # Treated as anonymous without touching the session
+            flask.g.fas_user = None
+        elif flask.session.get('FLASK_FAS_OPENID_USER') is None:
             flask.g.fas_user = None
         else:
-            user = flask.session['FLASK_FAS_OPENID_USER']
-            # Add approved_memberships to provide backwards compatibility
-            # New applications should only use g.fas_user.groups
-            user['approved_memberships'] = []
-            for group in user['groups']:
-                membership = dict()
-                membership['name'] = group
-                user['approved_memberships'].append(Munch.fromDict(membership))
-            flask.g.fas_user = Munch.fromDict(user)
-            flask.g.fas_user.groups = frozenset(flask.g.fas_user.groups)
+            # Most requests never look at the user so only build it when it
+            # is used
+            flask.g.fas_user = LocalProxy(_current_fas_user)
         flask.g.fas_session_id = 0
 
     def _check_safe_root(self, url):
@@ -337,7 +367,7 @@ def fas_login_required(function):
     """
     @wraps(function)
     def decorated_function(*args, **kwargs):
-        if flask.g.fas_user is None:
+        if not flask.g.fas_user:
             return flask.redirect(flask.url_for('auth_login',
                                                 next=flask.request.url))
         return function(*args, **kwargs)
@@ -352,7 +382,7 @@ def cla_plus_one_required(function):
     """
     @wraps(function)
     def decorated_function(*args, **kwargs):
-        if flask.g.fas_user is None or not flask.g.fas_user.cla_done \
+        if not flask.g.fas_user or not flask.g.fas_user.cla_done \
                 or len(flask.g.fas_user.groups) < 1:
             # FAS-OpenID does not return cla_ groups
             return flask.redirect(flask.url_for('auth_login',
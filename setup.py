@@ -27,11 +27,12 @@ setup(
         'beautifulsoup4',
         'urllib3',
         'six >= 1.4.0',
-        'lockfile',
         'openidc-client',
+        'futures; python_version < "3"',
     ],
     extras_require={
         'wsgi': ['repoze.who', 'Beaker', 'Paste'],
+        'async': ['aiohttp'],
         'flask': [
             'Flask', 'Flask_WTF', 'python-openid', 'python-openid-teams',
             'python-openid-cla',
@@ -0,0 +1,193 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the asyncio client. """
+
+import json
+import threading
+import unittest
+
+from six.moves import BaseHTTPServer
+from six.moves.urllib.parse import parse_qsl
+
+try:
+    import asyncio
+    from fedora.client.asyncfasproxy import AsyncFasProxyClient
+    from fedora.client.asyncproxyclient import (AsyncProxyClient,
+                                                AsyncTransport)
+except (ImportError, SyntaxError):
+    # Needs python 3.5+ and aiohttp
+    AsyncProxyClient = None
+
+from fedora.client import AppError, AuthError, ServerError
+from fedora.client.circuitbreaker import CircuitBreakerRegistry, HALF_OPEN
+
+
+def done(loop, result):
+    future = loop.create_future()
+    future.set_result(result)
+    return future
+
+
+class FakeTransport(object):
+    """ Transport that answers from a dict of method to (status, data). """
+    def __init__(self, loop, responses):
+        self.loop = loop
+        self.responses = responses
+        self.calls = []
+
+    def post(self, url, data=None, cookies=None, **kwargs):
+        self.calls.append((url, data, cookies))
+        status, data = self.responses[url.rsplit('/', 1)[-1]]
+        return done(self.loop, (status, {'tg-visit': 'new'},
+                                json.dumps(data).encode('utf-8')))
+
+    def close(self):
+        return done(self.loop, None)
+
+
+class EchoHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Sends back the form fields and cookies it was posted. """
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        body = self.rfile.read(length).decode('utf-8')
+        data = json.dumps({'fields': parse_qsl(body),
+                           'cookie': self.headers.get('Cookie')})
+        self.send_response(200)
+        self.send_header('Set-Cookie', 'tg-visit=abc; Path=/')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+class HangingTransport(object):
+    """ Transport whose requests never finish. """
+    def __init__(self, loop):
+        self.loop = loop
+        self.calls = 0
+
+    def post(self, *args, **kwargs):
+        self.calls += 1
+        return self.loop.create_future()
+
+    def close(self):
+        future = self.loop.create_future()
+        future.set_result(None)
+        return future
+
+
+@unittest.skipIf(AsyncProxyClient is None, 'needs python 3.5+ and aiohttp')
+class TestAsyncProxyClient(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.transport = HangingTransport(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def make_client(self, **kwargs):
+        return AsyncProxyClient('http://localhost/',
+                                transport=self.transport, **kwargs)
+
+    def test_send_request(self):
+        self.transport = FakeTransport(self.loop, {'me': (200, {'a': 1})})
+        client = self.make_client()
+        session_id, data = self.loop.run_until_complete(client.send_request(
+            'me', auth_params={'session_id': 'old'}))
+        self.assertEqual((session_id, data.a), ('new', 1))
+        self.assertEqual(self.transport.calls[0][2], {'tg-visit': 'old'})
+
+    def test_send_many_returns_errors_in_place(self):
+        self.transport = FakeTransport(self.loop, {
+            'a': (200, {'name': 'a'}), 'broken': (500, {}),
+            'failed': (200, {'exc': 'Oops', 'tg_flash': 'failed'})})
+        client = self.make_client()
+        results = self.loop.run_until_complete(client.send_many(
+            ['a', 'broken', 'failed', 'a']))
+        self.assertEqual(results[0][1].name, 'a')
+        self.assertTrue(isinstance(results[1], ServerError))
+        self.assertTrue(isinstance(results[2], AppError))
+        self.assertEqual(results[3][1].name, 'a')
+
+    def test_iter_request_is_unsupported(self):
+        self.assertRaises(TypeError, self.make_client().iter_request,
+                          'people', ['people'])
+
+    def test_cancelled_probe_is_released(self):
+        client = self.make_client(circuit_breaker=CircuitBreakerRegistry(
+            failure_threshold=1, recovery_timeout=0))
+        breaker = client.circuit_breaker.get('user/view')
+        breaker.record_failure()
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+        task = self.loop.create_task(client.send_request('user/view'))
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(self.transport.calls, 1)
+        task.cancel()
+        self.assertRaises(asyncio.CancelledError,
+                          self.loop.run_until_complete, task)
+        # Another probe may be sent
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+
+
+@unittest.skipIf(AsyncProxyClient is None, 'needs python 3.5+ and aiohttp')
+class TestAsyncFasProxyClient(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_person_by_id(self):
+        fas = AsyncFasProxyClient(transport=FakeTransport(self.loop, {
+            'person_by_id': (200, {'success': True,
+                                   'person': {'username': 'toshio'},
+                                   'approved': [{'name': 'packager'}]})}))
+        session_id, person = self.loop.run_until_complete(
+            fas.person_by_id(100, {'session_id': 'sess1'}))
+        self.assertEqual(person['username'], 'toshio')
+        self.assertEqual(person['approved_memberships'],
+                         [{'name': 'packager'}])
+
+    def test_verify_password(self):
+        fas = AsyncFasProxyClient(transport=FakeTransport(self.loop, {
+            'home': (401, {})}))
+        self.assertFalse(self.loop.run_until_complete(
+            fas.verify_password('toshio', 'wrong')))
+        self.assertRaises(AuthError, self.loop.run_until_complete,
+                          fas.send_request('home'))
+
+
+@unittest.skipIf(AsyncProxyClient is None, 'needs python 3.5+ and aiohttp')
+class TestAsyncTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                                EchoHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:%s/' % self.server.server_address[1]
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.loop.close()
+
+    def test_post(self):
+        transport = AsyncTransport()
+        status, cookies, body = self.loop.run_until_complete(transport.post(
+            self.url, data={'a': [b'1', 2], 'b': 'x'},
+            cookies={'tg-visit': 'sess1'}, timeout=5))
+        self.loop.run_until_complete(transport.close())
+        self.assertEqual(status, 200)
+        self.assertEqual(cookies, {'tg-visit': 'abc'})
+        data = json.loads(body.decode('utf-8'))
+        self.assertEqual(sorted(map(tuple, data['fields'])),
+                         [('a', '1'), ('a', '2'), ('b', 'x')])
+        self.assertEqual(data['cookie'], 'tg-visit=sess1')
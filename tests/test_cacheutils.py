@@ -0,0 +1,214 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the caches in fedora.cacheutils. """
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from six.moves import socketserver
+
+from fedora.cacheutils import (CredentialCache, FileCache, MemcachedCache,
+                               TTLCache, make_cache)
+from fedora.client import UnsafeFileError
+
+
+class FakeMemcachedHandler(socketserver.StreamRequestHandler):
+    """ Speak just enough of the memcached text protocol. """
+    def handle(self):
+        store = self.server.store
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            words = line.split()
+            if words[0] == b'get':
+                if words[1] in store:
+                    value = store[words[1]]
+                    self.wfile.write(b'VALUE ' + words[1] + b' 0 ' +
+                                     str(len(value)).encode('ascii') +
+                                     b'\r\n' + value + b'\r\n')
+                self.wfile.write(b'END\r\n')
+            elif words[0] == b'set':
+                self.server.exptimes[words[1]] = int(words[3])
+                store[words[1]] = self.rfile.read(int(words[4]) + 2)[:-2]
+                self.wfile.write(b'STORED\r\n')
+            elif words[0] == b'delete':
+                if store.pop(words[1], None) is None:
+                    self.wfile.write(b'NOT_FOUND\r\n')
+                else:
+                    self.wfile.write(b'DELETED\r\n')
+            elif words[0] == b'flush_all':
+                store.clear()
+                self.wfile.write(b'OK\r\n')
+
+
+class FakeMemcached(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_get_set_delete(self):
+        cache = TTLCache()
+        self.assertEqual(cache.get('a'), None)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        cache.delete('a')
+        self.assertEqual(cache.get('a', 'gone'), 'gone')
+        stats = cache.stats
+        self.assertEqual((stats['hits'], stats['misses'],
+                          stats['invalidations']), (1, 2, 1))
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats['evictions'], 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_expiry(self):
+        cache = TTLCache(ttl=60)
+        cache.set('a', 1, ttl=-1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.stats['expirations'], 1)
+
+
+class TestCredentialCache(unittest.TestCase):
+    def test_only_the_verified_password_matches(self):
+        cache = CredentialCache()
+        cache.set('toshio', 'secret', {'username': 'toshio'})
+        self.assertEqual(cache.get('toshio', 'secret'),
+                         {'username': 'toshio'})
+        self.assertEqual(cache.get('toshio', 'guess'), None)
+        self.assertEqual(cache.get('ralph', 'secret'), None)
+        cache.delete('toshio')
+        self.assertEqual(cache.get('toshio', 'secret'), None)
+
+    def test_passwords_are_not_stored(self):
+        cache = CredentialCache()
+        cache.set('toshio', 'secret')
+        self.assertFalse(b'secret' in repr(cache._cache._data).encode())
+        # Another process would compute different digests
+        self.assertNotEqual(CredentialCache()._digest('toshio', 'secret'),
+                            cache._digest('toshio', 'secret'))
+
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shared_between_instances(self):
+        writer = FileCache(self.directory)
+        reader = FileCache(self.directory)
+        writer.set('toshio', {'groups': set(['packager'])})
+        self.assertEqual(reader.get('toshio'),
+                         {'groups': set(['packager'])})
+        reader.delete('toshio')
+        self.assertEqual(writer.get('toshio'), None)
+
+    def test_unsafe_directories_are_refused(self):
+        os.chmod(self.directory, 0o755)
+        self.assertRaises(UnsafeFileError, FileCache, self.directory)
+        os.chmod(self.directory, 0o700)
+        link = os.path.join(self.directory, 'link')
+        os.symlink(self.directory, link)
+        self.assertRaises(UnsafeFileError, FileCache, link)
+        other = os.path.join(self.directory, 'file')
+        open(other, 'w').close()
+        self.assertRaises(UnsafeFileError, FileCache, other)
+        FileCache(os.path.join(self.directory, 'new'))
+
+    def test_expiry_and_prune(self):
+        cache = FileCache(self.directory, prune_interval=0)
+        cache.set('a', 1, ttl=-1)
+        cache.set('b', 2, ttl=-1)
+        self.assertEqual(cache.get('a'), None)
+        cache.prune()
+        self.assertEqual(cache.stats['expirations'], 2)
+
+    def test_maxsize_prunes_least_recently_used(self):
+        cache = FileCache(self.directory, prune_interval=3, maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # Make 'a' the most recently used entry
+        os.utime(cache._path('b'), (0, 0))
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(cache.stats['evictions'], 1)
+
+
+class TestMemcachedCache(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeMemcached(('127.0.0.1', 0), FakeMemcachedHandler)
+        self.server.store = {}
+        self.server.exptimes = {}
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.address = '127.0.0.1:%s' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_set_delete(self):
+        cache = make_cache('memcached://' + self.address)
+        other = MemcachedCache([self.address])
+        cache.set('toshio', ['session', {'username': 'toshio'}])
+        self.assertEqual(other.get('toshio'),
+                         ['session', {'username': 'toshio'}])
+        other.delete('toshio')
+        self.assertEqual(cache.get('toshio', 'gone'), 'gone')
+        self.assertEqual(cache.stats['hits'], 0)
+        self.assertEqual(other.stats['invalidations'], 1)
+
+    def test_long_ttl_is_sent_as_timestamp(self):
+        cache = MemcachedCache([self.address])
+        cache.set('short', 1, ttl=3600)
+        cache.set('long', 1, ttl=60 * 24 * 60 * 60)
+        exptimes = self.server.exptimes
+        self.assertEqual(exptimes[cache._key('short')], 3600)
+        self.assertTrue(exptimes[cache._key('long')] > time.time())
+        self.assertEqual(cache.get('long'), 1)
+
+    def test_unreachable_server_misses(self):
+        self.tearDown()
+        cache = MemcachedCache([self.address], timeout=0.5)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.stats['errors'], 2)
+        self.setUp()
+
+
+class TestMakeCache(unittest.TestCase):
+    def test_specs(self):
+        self.assertEqual(make_cache('memory://10').maxsize, 10)
+        directory = tempfile.mkdtemp()
+        try:
+            self.assertEqual(make_cache('file://' + directory).directory,
+                             directory)
+            self.assertEqual(
+                make_cache('file://' + directory, namespace='users').directory,
+                os.path.join(directory, 'users'))
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(make_cache('memcached://127.0.0.1:11211',
+                                    namespace='users').prefix,
+                         'python-fedora:users:')
+        self.assertRaises(ValueError, make_cache, 'redis://localhost')
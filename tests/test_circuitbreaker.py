@@ -0,0 +1,85 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the circuit breakers. """
+
+import unittest
+
+import requests
+
+from fedora.client import ProxyClient, ServerError
+from fedora.client.circuitbreaker import (
+    CircuitBreaker, CircuitBreakerRegistry, CLOSED, OPEN, HALF_OPEN)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow_request())
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+        # Only one probe at a time
+        self.assertFalse(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_registry_status(self):
+        registry = CircuitBreakerRegistry(failure_threshold=1)
+        registry.get('user/view').record_failure()
+        registry.get('group/view')
+        self.assertEqual(registry.states(), {'user/view': OPEN,
+                                             'group/view': CLOSED})
+        self.assertEqual(registry.status()['group/view']['retry_in'], None)
+
+
+class DownTransport(object):
+    """ Transport to a server that cannot be reached. """
+    calls = 0
+
+    def post(self, *args, **kwargs):
+        self.calls += 1
+        raise requests.exceptions.ConnectionError('Connection refused')
+
+
+class TestProxyClientCircuitBreaker(unittest.TestCase):
+    def test_fails_fast_when_open(self):
+        transport = DownTransport()
+        client = ProxyClient('http://localhost/', session_as_cookie=False,
+                             transport=transport,
+                             circuit_breaker=CircuitBreakerRegistry(
+                                 failure_threshold=1, recovery_timeout=60))
+        self.assertRaises(requests.exceptions.ConnectionError,
+                          client.send_request, 'user/view')
+        self.assertRaises(ServerError, client.send_request, 'user/view')
+        self.assertEqual(transport.calls, 1)
+        self.assertEqual(client.circuit_breaker.states(), {'user/view': OPEN})
+
+    def test_interrupted_probe_is_released(self):
+        class InterruptedTransport(object):
+            def post(self, *args, **kwargs):
+                raise KeyboardInterrupt()
+        client = ProxyClient('http://localhost/', session_as_cookie=False,
+                             transport=InterruptedTransport(),
+                             circuit_breaker=CircuitBreakerRegistry(
+                                 failure_threshold=1, recovery_timeout=0))
+        breaker = client.circuit_breaker.get('user/view')
+        breaker.record_failure()
+        self.assertRaises(KeyboardInterrupt, client.send_request,
+                          'user/view')
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
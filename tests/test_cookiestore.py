@@ -0,0 +1,73 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the write-behind cookie store of OpenIdBaseClient. """
+
+import gc
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import weakref
+
+from fedora.client import cookiestore
+from fedora.client.cookiestore import CookieStore
+
+
+class TestCookieStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmpdir, 'sessions')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_save_and_load(self):
+        store = CookieStore(self.directory, delay=0)
+        store.save('https://a/:toshio', [('session', 'abc')])
+        store.save('https://a/:ralph', [('session', 'def')])
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        other = CookieStore(self.directory)
+        self.assertEqual(other.load('https://a/:toshio'),
+                         [('session', 'abc')])
+        self.assertEqual(other.load('https://a/:pingou'), [])
+
+    def test_unchanged_save_is_not_written(self):
+        store = CookieStore(self.directory, delay=0)
+        store.save('key', [('session', 'abc')])
+        path = os.path.join(self.directory, os.listdir(self.directory)[0])
+        os.unlink(path)
+        store.save('key', [('session', 'abc')])
+        self.assertFalse(os.path.exists(path))
+
+    def test_write_behind(self):
+        store = CookieStore(self.directory, delay=60)
+        store.save('key', [('session', 'abc')])
+        store.save('key', [('session', 'def')])
+        self.assertFalse(os.path.exists(self.directory))
+        store.flush()
+        self.assertEqual(CookieStore(self.directory).load('key'),
+                         [('session', 'def')])
+
+    def test_flush_at_exit(self):
+        store = CookieStore(self.directory, delay=60)
+        store.save('key', [('session', 'abc')])
+        cookiestore._flush_stores()
+        self.assertEqual(CookieStore(self.directory).load('key'),
+                         [('session', 'abc')])
+
+        # Stores without pending saves are not kept alive
+        ref = weakref.ref(store)
+        del store
+        gc.collect()
+        self.assertEqual(ref(), None)
+
+    def test_legacy_file(self):
+        legacy = os.path.join(self.tmpdir, 'sessions.cache')
+        with open(legacy, 'wb') as legacy_file:
+            legacy_file.write(json.dumps(
+                {'key': [['session', 'abc']]}).encode('utf-8'))
+        os.chmod(legacy, 0o600)
+        store = CookieStore(self.directory, legacy_filename=legacy)
+        self.assertEqual(store.load('key'), [('session', 'abc')])
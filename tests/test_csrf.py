@@ -0,0 +1,147 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test where the CSRF token is looked for and sent. """
+
+from hashlib import sha1
+import unittest
+
+from kitchen.text.converters import to_bytes
+import requests
+
+from fedora.client import ProxyClient
+
+try:
+    from webob import Request
+    from fedora.wsgi.csrf import CSRFMetadataProvider, \
+        CSRFProtectionMiddleware
+except (ImportError, TypeError):
+    # The repoze.who stack only works on python2
+    CSRFMetadataProvider = None
+
+TOKEN = sha1(b'sess1').hexdigest()
+
+
+def make_multipart(fields):
+    boundary = 'xxBOUNDARYxx'
+    body = []
+    for name, value in fields:
+        body.extend(['--' + boundary,
+                     'Content-Disposition: form-data; name="%s"' % name,
+                     '', value])
+    body.extend(['--' + boundary + '--', ''])
+    body = '\r\n'.join(body).encode('utf-8')
+    return body, 'multipart/form-data; boundary=' + boundary
+
+
+@unittest.skipIf(CSRFMetadataProvider is None,
+                 'needs webob, paste and repoze.who')
+class TestExtractCSRFToken(unittest.TestCase):
+    def setUp(self):
+        self.provider = CSRFMetadataProvider()
+
+    def test_multipart_body(self):
+        body, content_type = make_multipart([('_csrf_token', TOKEN),
+                                             ('upload', 'data')])
+        request = Request.blank('/upload', POST=body,
+                                content_type=content_type)
+        request.content_type = content_type
+        self.assertEqual(self.provider.extract_csrf_token(request), TOKEN)
+        self.assertFalse('_csrf_token' in request.POST)
+        self.assertEqual(request.POST['upload'], 'data')
+
+    def test_urlencoded_body(self):
+        request = Request.blank('/save', POST={'_csrf_token': TOKEN,
+                                               'name': 'value'})
+        self.assertEqual(self.provider.extract_csrf_token(request), TOKEN)
+
+    def test_header_skips_body(self):
+        body, content_type = make_multipart([('_csrf_token', 'body')])
+        request = Request.blank('/upload', POST=body,
+                                headers={'X-CSRF-Token': TOKEN})
+        request.content_type = content_type
+        self.assertEqual(self.provider.extract_csrf_token(request), TOKEN)
+        self.assertFalse('webob._parsed_post_vars' in request.environ)
+
+    def test_max_form_size(self):
+        provider = CSRFMetadataProvider(max_form_size=10)
+        request = Request.blank('/save', POST={'_csrf_token': TOKEN})
+        self.assertEqual(provider.extract_csrf_token(request), None)
+
+    def test_query_string(self):
+        request = Request.blank('/page?a=%2F&_csrf_token=' + TOKEN + '&b=1')
+        self.assertEqual(self.provider.extract_csrf_token(request), TOKEN)
+        self.assertEqual(request.query_string, 'a=%2F&b=1')
+
+
+@unittest.skipIf(CSRFMetadataProvider is None,
+                 'needs webob, paste and repoze.who')
+class TestCSRFProtectionMiddleware(unittest.TestCase):
+    def setUp(self):
+        self.produced = []
+
+    def app(self, environ, start_response):
+        start_response('302 Found', [('Location', '/home'),
+                                     ('Set-Cookie', 'tg-visit=sess1')])
+        for chunk in (b'one', b'two'):
+            self.produced.append(chunk)
+            yield chunk
+
+    def call(self, environ):
+        self.started = []
+
+        def start_response(status, headers, exc_info=None):
+            self.started.append((status, headers))
+        middleware = CSRFProtectionMiddleware(self.app)
+        return middleware(environ, start_response)
+
+    def test_login_response_is_streamed(self):
+        environ = Request.blank('/login_handler').environ
+        environ['repoze.who.identity'] = {'_csrf_token': TOKEN}
+        environ['CSRF_AUTH_STATE'] = True
+        body = self.call(environ)
+        self.assertEqual(self.produced, [])
+
+        self.assertEqual(next(body), b'one')
+        self.assertEqual(self.produced, [b'one'])
+        status, headers = self.started[0]
+        self.assertEqual(status, '302 Found')
+        self.assertEqual(headers, [
+            ('Location', 'http://localhost/home?_csrf_token=' + TOKEN),
+            ('Set-Cookie', 'tg-visit=sess1')])
+        self.assertEqual(environ['CSRF_AUTH_STATE'], None)
+        self.assertEqual(list(body), [b'two'])
+
+    def test_other_responses_are_untouched(self):
+        environ = Request.blank('/page').environ
+        environ['repoze.who.identity'] = {'_csrf_token': TOKEN}
+        environ['CSRF_TOKEN'] = TOKEN
+        self.assertEqual(list(self.call(environ)), [b'one', b'two'])
+        self.assertEqual(self.started[0][1], [
+            ('Location', '/home'), ('Set-Cookie', 'tg-visit=sess1')])
+        self.assertEqual(environ['repoze.who.identity'],
+                         {'_csrf_token': TOKEN})
+
+
+class RecordingTransport(object):
+    def __init__(self):
+        self.calls = []
+
+    def post(self, url, data=None, headers=None, **kwargs):
+        self.calls.append((data, headers))
+        response = requests.models.Response()
+        response._content_consumed = True
+        response.status_code = 200
+        response._content = b'{}'
+        return response
+
+
+class TestProxyClientCSRFToken(unittest.TestCase):
+    def test_token_in_header_and_body(self):
+        transport = RecordingTransport()
+        client = ProxyClient('http://localhost/', session_as_cookie=False,
+                             transport=transport)
+        client.send_request('save', auth_params={'session_id': 'sess1'})
+        data, headers = transport.calls[0]
+        self.assertEqual(headers['X-CSRF-Token'], TOKEN)
+        self.assertEqual(to_bytes(data['_csrf_token']), to_bytes(TOKEN))
@@ -0,0 +1,119 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the bulk people lookups of AccountSystem. """
+
+import threading
+import time
+import unittest
+
+import requests
+
+from fedora.client import AccountSystem
+from fedora.client.fas2 import PeopleIndex
+
+PEOPLE = {
+    1: {'id': 1, 'username': 'toshio', 'email': 'toshio@example.org'},
+    2: {'id': 2, 'username': 'ralph', 'email': 'ralph@example.org'},
+    3: {'id': 3, 'username': 'pingou', 'email': 'pingou@example.org'},
+}
+
+
+class StubAccountSystem(AccountSystem):
+    """ AccountSystem answering from PEOPLE instead of a server. """
+    def __init__(self, *args, **kwargs):
+        super(StubAccountSystem, self).__init__(
+            'http://localhost/', cache_session=False, *args, **kwargs)
+        self.lock = threading.Lock()
+        self.requested = []
+        self.broken = set()
+        self.list_error_after = None
+        self.lists = 0
+
+    def send_request(self, method, req_params=None, auth=False, **kwargs):
+        if method == 'json/group_by_name':
+            return {'success': True, 'group': {
+                'approved_roles': [{'person_id': 1}, {'person_id': 42}],
+                'unapproved_roles': [{'person_id': 2}]}}
+        key = req_params.get('person_id', req_params.get('username'))
+        with self.lock:
+            self.requested.append(key)
+        if key in self.broken:
+            raise requests.exceptions.ConnectionError('Connection reset')
+        for person in PEOPLE.values():
+            if key in (person['id'], person['username']):
+                return {'success': True, 'person': dict(person)}
+        return {'success': False}
+
+    def iter_request(self, method, stream_keys, req_params=None, **kwargs):
+        self.lists += 1
+        for count, person_id in enumerate(sorted(PEOPLE)):
+            if count == self.list_error_after:
+                raise requests.exceptions.ConnectionError('Timed out')
+            person = PEOPLE[person_id]
+            yield 'people', None, dict(
+                (field, person.get(field)) for field in req_params['fields'])
+
+
+class TestBulkLookups(unittest.TestCase):
+    def setUp(self):
+        self.fas = StubAccountSystem()
+
+    def test_duplicates_are_looked_up_once_in_order(self):
+        people = self.fas.person_by_ids([3, '1', 3, 1, 2, 99])
+        self.assertEqual(list(people), [3, 1, 2, 99])
+        self.assertEqual(sorted(self.fas.requested), [1, 2, 3, 99])
+        self.assertEqual(people[1]['username'], 'toshio')
+        self.assertEqual(people[99], {})
+
+    def test_fields(self):
+        people = self.fas.person_by_usernames(['ralph', 'toshio'],
+                                              fields=['email'],
+                                              bulk_threshold=1)
+        self.assertEqual(people, {'ralph': {'email': 'ralph@example.org'},
+                                  'toshio': {'email': 'toshio@example.org'}})
+        self.assertEqual(self.fas.requested, [])
+
+    def test_failed_lookup_is_reported_per_person(self):
+        self.fas.broken.add('ralph')
+        people = self.fas.person_by_usernames(['toshio', 'ralph', 'pingou'])
+        self.assertTrue(isinstance(people['ralph'],
+                                   requests.exceptions.ConnectionError))
+        self.assertEqual(people['pingou']['id'], 3)
+
+    def test_failed_list_keeps_the_people_read(self):
+        self.fas.list_error_after = 2
+        people = self.fas.person_by_ids([1, 2, 3], fields=['username'],
+                                        bulk_threshold=1)
+        self.assertEqual(people[1], {'username': 'toshio'})
+        self.assertEqual(people[2], {'username': 'ralph'})
+        self.assertTrue(isinstance(people[3],
+                                   requests.exceptions.ConnectionError))
+
+
+class TestPeopleIndex(unittest.TestCase):
+    def setUp(self):
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        return PEOPLE.values()
+
+    def test_ttl(self):
+        index = PeopleIndex(self.fetch, ttl=60)
+        self.assertEqual(index.by_id[1]['username'], 'toshio')
+        self.assertEqual(index.by_username['ralph']['id'], 2)
+        self.assertEqual(self.fetches, 1)
+        self.assertFalse(index.refresh(max_age=60))
+        index._built = time.time() - 61
+        self.assertEqual(len(index.by_id), 3)
+        self.assertEqual(self.fetches, 2)
+
+    def test_missing_people_are_skipped(self):
+        fas = StubAccountSystem()
+        people = fas.people_by_groupname('packager')
+        self.assertEqual([person['username'] for person in people],
+                         ['toshio', 'ralph'])
+        fas.people_by_groupname('packager')
+        # The index is not downloaded again for the missing person
+        self.assertEqual(fas.lists, 1)
@@ -0,0 +1,89 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the FAS snapshot store. """
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from fedora.client import fassnapshot
+from fedora.client.fassnapshot import SnapshotStore
+
+
+class FakeAccountSystem(object):
+    base_url = 'https://admin.example.org/accounts/'
+
+    def __init__(self):
+        self.downloads = 0
+
+    def iter_user_data(self):
+        self.downloads += 1
+        return iter([
+            ('100', {'username': 'toshio', 'email': 'toshio@example.org',
+                     'ssh_key': 'ssh-rsa AAAA', 'status': 'active'}),
+            ('101', {'username': 'ralph', 'email': 'ralph@example.org',
+                     'ssh_key': '', 'status': 'active'}),
+        ])
+
+    def iter_group_data(self, force_refresh=None):
+        return iter([('packager', {'type': 'tracking', 'users': [100]})])
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'snapshot.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_refresh_and_lookups(self):
+        fas = FakeAccountSystem()
+        store = SnapshotStore(self.path, max_age=60)
+        self.assertTrue(store.is_stale())
+        self.assertEqual(store.user_by_username('toshio'), None)
+
+        self.assertTrue(store.refresh(fas))
+        other = SnapshotStore(self.path, max_age=60)
+        self.assertFalse(other.refresh(fas))
+        self.assertEqual(fas.downloads, 1)
+
+        self.assertEqual(other.user_by_id(100)['username'], 'toshio')
+        self.assertEqual(other.user_by_username('ralph')['email'],
+                         'ralph@example.org')
+        self.assertEqual(other.user_by_email('toshio@example.org')['ssh_key'],
+                         'ssh-rsa AAAA')
+        self.assertEqual(other.group('packager')['users'], [100])
+        metadata = other.metadata()
+        self.assertEqual(metadata['users'], 2)
+        self.assertEqual(metadata['base_url'], fas.base_url)
+        self.assertEqual(sorted(other.load()['users']), ['100', '101'])
+
+    def test_replace_is_seen_by_open_readers(self):
+        store = SnapshotStore(self.path)
+        store.write([('1', {'username': 'old', 'email': 'a@example.org'})],
+                    [])
+        self.assertEqual(store.user_by_id(1)['username'], 'old')
+        SnapshotStore(self.path).write(
+            [('1', {'username': 'new', 'email': 'a@example.org'})], [])
+        self.assertEqual(store.user_by_id(1)['username'], 'new')
+        self.assertEqual(os.listdir(self.directory), ['snapshot.sqlite'])
+
+    def test_snapshot_is_private(self):
+        SnapshotStore(self.path).write([], [])
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        SnapshotStore(self.path, mode=0o640).write([], [])
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+
+    def test_refresh_without_fcntl(self):
+        fcntl = fassnapshot.fcntl
+        fassnapshot.fcntl = None
+        try:
+            self.assertTrue(SnapshotStore(self.path).refresh(
+                FakeAccountSystem()))
+        finally:
+            fassnapshot.fcntl = fcntl
+        self.assertEqual(SnapshotStore(self.path).metadata()['users'], 2)
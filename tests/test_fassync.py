@@ -0,0 +1,70 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the FAS sync engine. """
+
+import unittest
+
+from fedora.client.fassync import (
+    AccountSync, Change, ADDED, CHANGED, REMOVED, USER, GROUP, MEMBERSHIP)
+
+
+class FakeAccountSystem(object):
+    def __init__(self, users, groups):
+        self.users = users
+        self.groups = groups
+
+    def iter_user_data(self):
+        return iter(self.users.items())
+
+    def iter_group_data(self, force_refresh=None):
+        return iter(self.groups.items())
+
+
+class TestAccountSync(unittest.TestCase):
+    def test_reports_changes_only(self):
+        fas = FakeAccountSystem(
+            {'1': {'username': 'toshio', 'ssh_key': 'a'},
+             '2': {'username': 'lmacken', 'ssh_key': 'b'}},
+            {'packager': {'type': 'tracking', 'users': ['1'],
+                          'sponsors': ['2']}})
+        sync = AccountSync(fas)
+        seen = []
+        sync.subscribe(seen.append, kinds=(MEMBERSHIP,))
+        self.assertEqual(len(sync.sync()), 5)
+
+        fas.users = {'1': {'username': 'toshio', 'ssh_key': 'c'},
+                     '3': {'username': 'ralph', 'ssh_key': 'd'}}
+        fas.groups = {'packager': {'type': 'tracking', 'users': ['1', '3'],
+                                   'sponsors': []}}
+        del seen[:]
+        changes = sync.sync()
+        self.assertEqual([(c.kind, c.action, c.key) for c in changes], [
+            (USER, CHANGED, '1'),
+            (USER, ADDED, '3'),
+            (GROUP, CHANGED, 'packager'),
+            (MEMBERSHIP, ADDED, ('packager', '3')),
+            (MEMBERSHIP, REMOVED, ('packager', '2')),
+            (USER, REMOVED, '2'),
+        ])
+        self.assertEqual(seen, [
+            Change(MEMBERSHIP, ADDED, ('packager', '3'), None, 'users'),
+            Change(MEMBERSHIP, REMOVED, ('packager', '2'), 'sponsors', None),
+        ])
+        self.assertEqual(sync.sync(), [])
+
+    def test_failed_listener_sees_changes_again(self):
+        fas = FakeAccountSystem({'1': {'username': 'toshio'}}, {})
+        sync = AccountSync(fas)
+        seen = []
+
+        def listener(change):
+            seen.append(change.key)
+            if len(seen) == 1:
+                raise ValueError('listener failed')
+        sync.subscribe(listener)
+        self.assertRaises(ValueError, sync.sync)
+        self.assertEqual(sync.users, {})
+        self.assertEqual(len(sync.sync()), 1)
+        self.assertEqual(seen, ['1', '1'])
+        self.assertEqual(sync.sync(), [])
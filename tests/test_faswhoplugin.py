@@ -0,0 +1,204 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the caching in FASWhoPlugin. """
+
+import copy
+import unittest
+
+try:
+    import webob
+    from repoze.who.plugins.basicauth import BasicAuthPlugin
+    from fedora.wsgi.faswho.faswhoplugin import FASWhoPlugin
+except (ImportError, TypeError):
+    # The repoze.who stack only works on python2
+    FASWhoPlugin = None
+
+PERSON = {'id': 100, 'username': 'toshio', 'password': 'hash',
+          'human_name': 'Toshio', 'email': 'toshio@example.org',
+          'creation': '2008-01-01', 'approved_memberships': [
+              {'name': 'packager'}]}
+
+
+class FakeFas(object):
+    def __init__(self):
+        self.sessions = set(['sess1', 'sess2'])
+        self.requests = 0
+        self.logged_out = []
+
+    def get_user_info(self, auth_params):
+        self.requests += 1
+        if auth_params.get('password') == 'secret':
+            # Every login with a password starts a new session
+            session_id = 'sess%s' % (len(self.sessions) + 1)
+            self.sessions.add(session_id)
+            return (session_id, copy.deepcopy(PERSON))
+        if auth_params.get('session_id') in self.sessions:
+            return (auth_params['session_id'], copy.deepcopy(PERSON))
+        return None
+
+    def logout(self, session_id):
+        self.logged_out.append(session_id)
+        self.sessions.discard(session_id)
+
+
+def make_environ(session_id):
+    return webob.Request.blank(
+        '/', headers={'Cookie': 'tg-visit=%s' % session_id}).environ
+
+
+@unittest.skipIf(FASWhoPlugin is None,
+                 'needs webob, paste, beaker and repoze.who')
+class TestFASWhoPluginCaches(unittest.TestCase):
+    def setUp(self):
+        self.plugin = FASWhoPlugin('https://fas.example.org/accounts/',
+                                   identity_cache_ttl=60, cache='memory')
+        self.fas = self.plugin.fas = FakeFas()
+
+    def identify_and_add_metadata(self, session_id):
+        environ = make_environ(session_id)
+        identity = self.plugin.identify(environ)
+        self.plugin.add_metadata(environ, identity)
+        return identity
+
+    def test_cache_hit_after_logout_of_other_session(self):
+        self.identify_and_add_metadata('sess1')
+        self.identify_and_add_metadata('sess2')
+        self.plugin.forget(make_environ('sess2'), {'login': 'toshio'})
+        self.assertEqual(self.fas.logged_out, ['sess2'])
+
+        requests = self.fas.requests
+        identity = self.identify_and_add_metadata('sess1')
+        # Served from the identity cache and the metadata is still there
+        self.assertEqual(self.fas.requests, requests)
+        self.assertEqual(identity['user'].user_name, 'toshio')
+        self.assertEqual(identity['groups'], set(['packager']))
+
+    def test_user_cache_miss_asks_fas(self):
+        environ = make_environ('sess1')
+        identity = self.plugin.identify(environ)
+        self.plugin.user_cache.delete('toshio')
+        self.plugin.add_metadata(environ, identity)
+        self.assertEqual(identity['user'].user_name, 'toshio')
+        self.assertEqual(self.plugin.remember(environ, identity)[0][0],
+                         'Set-Cookie')
+
+    def test_logout_without_user_entry(self):
+        self.identify_and_add_metadata('sess1')
+        self.plugin.user_cache.delete('toshio')
+        environ = make_environ('sess1')
+        headers = self.plugin.forget(environ, {'login': 'toshio'})
+        self.assertEqual(headers[0][0], 'Set-Cookie')
+        self.assertEqual(self.fas.logged_out, ['sess1'])
+        self.assertEqual(self.plugin.identify(environ), None)
+        self.assertEqual(self.plugin.forget(environ, None), None)
+
+    def test_cache_hit_does_not_rewrite_user(self):
+        self.identify_and_add_metadata('sess1')
+        writes = []
+        user_cache_set = self.plugin.user_cache.set
+
+        def set(key, value, ttl=None):
+            writes.append(key)
+            user_cache_set(key, value, ttl=ttl)
+        self.plugin.user_cache.set = set
+        self.identify_and_add_metadata('sess1')
+        self.assertEqual(writes, [])
+
+    def test_sessions_cannot_evict_users(self):
+        self.assertFalse(self.plugin.user_cache is
+                         self.plugin.identity_cache)
+
+
+@unittest.skipIf(FASWhoPlugin is None,
+                 'needs webob, paste, beaker and repoze.who')
+class TestFASWhoPluginCredentialCache(unittest.TestCase):
+    def setUp(self):
+        self.plugin = FASWhoPlugin('https://fas.example.org/accounts/',
+                                   credential_cache_ttl=60)
+        self.fas = self.plugin.fas = FakeFas()
+
+    def login(self, identifier=None):
+        environ = webob.Request.blank('/').environ
+        identity = {'login': 'toshio', 'password': 'secret',
+                    'identifier': identifier}
+        self.assertEqual(self.plugin.authenticate(environ, identity),
+                         'toshio')
+        return environ
+
+    def test_basic_auth_is_cached(self):
+        basicauth = BasicAuthPlugin('repoze.who')
+        self.login(basicauth)
+        self.plugin.user_cache.delete('toshio')
+        environ = self.login(basicauth)
+        self.assertEqual(self.fas.requests, 1)
+        # The hit puts the user back for remember() and add_metadata()
+        self.assertEqual(self.plugin.user_cache.get('toshio')[0],
+                         environ['CSRF_AUTH_SESSION_ID'])
+
+    def test_cache_hit_does_not_rewrite_user(self):
+        basicauth = BasicAuthPlugin('repoze.who')
+        self.login(basicauth)
+        writes = []
+        user_cache_set = self.plugin.user_cache.set
+
+        def set(key, value, ttl=None):
+            writes.append(key)
+            user_cache_set(key, value, ttl=ttl)
+        self.plugin.user_cache.set = set
+        self.login(basicauth)
+        self.assertEqual(self.fas.requests, 1)
+        self.assertEqual(writes, [])
+
+    def test_form_logins_get_their_own_session(self):
+        first = self.login()
+        second = self.login()
+        self.assertEqual(self.fas.requests, 2)
+        self.assertNotEqual(first['CSRF_AUTH_SESSION_ID'],
+                            second['CSRF_AUTH_SESSION_ID'])
+
+
+class UnreadableInput(object):
+    def read(self, *args):
+        raise AssertionError('the request body was read')
+
+    readline = read
+
+
+@unittest.skipIf(FASWhoPlugin is None,
+                 'needs webob, paste, beaker and repoze.who')
+class TestFASWhoPluginLoginForms(unittest.TestCase):
+    def setUp(self):
+        self.plugin = FASWhoPlugin('https://fas.example.org/accounts/')
+        self.fas = self.plugin.fas = FakeFas()
+
+    def make_environ(self, path, content_type='application/json'):
+        environ = webob.Request.blank(path).environ
+        environ.update({'REQUEST_METHOD': 'POST',
+                        'CONTENT_TYPE': content_type,
+                        'CONTENT_LENGTH': '100',
+                        'wsgi.input': UnreadableInput()})
+        return environ
+
+    def test_may_have_login_form(self):
+        may_have = self.plugin._may_have_login_form
+        self.assertTrue(may_have(self.make_environ('/?login=Login')))
+        self.assertTrue(may_have(self.make_environ('/?a=1&login=')))
+        self.assertTrue(may_have(self.make_environ('/login_handler')))
+        self.assertTrue(may_have(self.make_environ(
+            '/', 'application/x-www-form-urlencoded; charset=utf-8')))
+        self.assertFalse(may_have(self.make_environ('/?nologin=1')))
+        self.assertFalse(may_have(self.make_environ('/api')))
+
+    def test_basic_auth_does_not_read_the_body(self):
+        identity = {'login': 'toshio', 'password': 'secret'}
+        environ = self.make_environ('/api/upload', 'multipart/form-data')
+        self.assertEqual(self.plugin.authenticate(environ, identity),
+                         'toshio')
+
+        identity = {'login': 'toshio', 'password': 'wrong'}
+        environ = self.make_environ('/api/upload?came_from=/pkgs',
+                                    'multipart/form-data')
+        self.assertEqual(self.plugin.authenticate(environ, identity), None)
+        self.assertEqual(environ['repoze.who.application'].location(),
+                         '/login?came_from=%2Fpkgs')
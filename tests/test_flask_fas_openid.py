@@ -0,0 +1,94 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test how flask_fas_openid sets flask.g.fas_user. """
+
+import unittest
+
+try:
+    import flask
+    import flask_fas_openid
+except ImportError:
+    # Needs flask and python-openid
+    flask_fas_openid = None
+
+USER = {'username': 'toshio', 'cla_done': True,
+        'groups': ['packager', 'sysadmin']}
+
+
+@unittest.skipIf(flask_fas_openid is None, 'needs flask and python-openid')
+class TestFasUser(unittest.TestCase):
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.secret_key = 'secret'
+        self.app.config['FAS_OPENID_EXCLUDE_ENDPOINTS'] = ('static',)
+        self.fas = flask_fas_openid.FAS(self.app)
+        self.builds = []
+        self.orig_build = flask_fas_openid._build_fas_user
+
+        def build(user):
+            self.builds.append(user)
+            return self.orig_build(user)
+        flask_fas_openid._build_fas_user = build
+
+    def tearDown(self):
+        flask_fas_openid._build_fas_user = self.orig_build
+
+    def check_session(self, user=USER):
+        flask.session['FLASK_FAS_OPENID_USER'] = user
+        self.fas._check_session()
+
+    def test_user_is_built_lazily_once(self):
+        with self.app.test_request_context('/'):
+            self.check_session()
+            self.assertEqual(self.builds, [])
+            self.assertEqual(flask.g.fas_user.username, 'toshio')
+            self.assertEqual(flask.g.fas_user.groups,
+                             frozenset(['packager', 'sysadmin']))
+            self.assertEqual(flask.g.fas_user.approved_memberships[0].name,
+                             'packager')
+            self.assertEqual(len(self.builds), 1)
+            self.assertEqual(flask.g.fas_session_id, 0)
+
+    def test_replaced_user_is_rebuilt(self):
+        with self.app.test_request_context('/'):
+            self.check_session()
+            self.assertEqual(flask.g.fas_user.username, 'toshio')
+            user = dict(USER, username='ralph')
+            flask.session['FLASK_FAS_OPENID_USER'] = user
+            self.assertEqual(flask.g.fas_user.username, 'ralph')
+            self.assertEqual(flask.g.fas_user.username, 'ralph')
+            self.assertEqual(len(self.builds), 2)
+
+    def test_cleared_session(self):
+        with self.app.test_request_context('/'):
+            self.check_session()
+            self.assertTrue(flask.g.fas_user)
+            flask.session.clear()
+            self.assertFalse(flask.g.fas_user)
+            self.assertEqual(len(self.builds), 1)
+
+    def test_anonymous(self):
+        with self.app.test_request_context('/'):
+            self.check_session(user=None)
+            self.assertTrue(flask.g.fas_user is None)
+
+    def test_excluded_endpoint(self):
+        with self.app.test_request_context('/static/style.css'):
+            self.check_session()
+            self.assertEqual(flask.request.endpoint, 'static')
+            self.assertTrue(flask.g.fas_user is None)
+            self.assertEqual(flask.g.fas_session_id, 0)
+            self.assertEqual(self.builds, [])
+
+    def test_login_required_after_logout(self):
+        @flask_fas_openid.fas_login_required
+        def view():
+            return 'ok'
+
+        self.app.add_url_rule('/login', 'auth_login', view)
+        with self.app.test_request_context('/'):
+            self.check_session()
+            self.assertEqual(view(), 'ok')
+            flask.session.pop('FLASK_FAS_OPENID_USER')
+            self.assertEqual(view().status_code, 302)
@@ -0,0 +1,95 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test caching and revalidating responses. """
+
+import json
+import unittest
+
+from kitchen.text.converters import to_unicode
+import requests
+
+from fedora.client import AppError, ProxyClient
+
+
+class ETagTransport(object):
+    """ Transport to a server that sends an ETag for each user's data. """
+    def __init__(self, cache_control=None):
+        self.cache_control = cache_control
+        self.statuses = []
+        self.errors = 0
+
+    def post(self, url, data=None, headers=None, auth=None, **kwargs):
+        response = requests.models.Response()
+        response._content_consumed = True
+        user = to_unicode(data.get('user_name', 'anonymous'))
+        etag = '"%s"' % user
+        if self.cache_control:
+            response.headers['Cache-Control'] = self.cache_control
+        response.headers['ETag'] = etag
+        if headers.get('If-None-Match') == etag:
+            response.status_code = 304
+            response._content = b''
+        elif self.errors:
+            self.errors -= 1
+            response.status_code = 200
+            response._content = json.dumps(
+                {'exc': 'DBError', 'tg_flash': 'Try again'}).encode('utf-8')
+        else:
+            response.status_code = 200
+            response._content = json.dumps(
+                {'user': user}).encode('utf-8')
+        self.statuses.append(response.status_code)
+        return response
+
+
+class TestHTTPCache(unittest.TestCase):
+    def make_client(self, transport):
+        return ProxyClient('http://localhost/', session_as_cookie=False,
+                           transport=transport, http_cache=True)
+
+    def test_revalidates_per_identity(self):
+        transport = ETagTransport()
+        client = self.make_client(transport)
+        toshio = {'username': 'toshio', 'password': 'a'}
+        ralph = {'username': 'ralph', 'password': 'b'}
+        self.assertEqual(client.send_request('me', auth_params=toshio)[1],
+                         {'user': 'toshio'})
+        self.assertEqual(client.send_request('me', auth_params=toshio)[1],
+                         {'user': 'toshio'})
+        self.assertEqual(client.send_request('me', auth_params=ralph)[1],
+                         {'user': 'ralph'})
+        self.assertEqual(transport.statuses, [200, 304, 200])
+        self.assertEqual(client.http_cache.stats,
+                         {'fresh': 0, 'revalidated': 1, 'fetched': 2})
+
+    def test_fresh_responses_are_not_requested(self):
+        transport = ETagTransport(cache_control='private, max-age=60')
+        client = self.make_client(transport)
+        client.send_request('me')
+        client.send_request('me')
+        self.assertEqual(transport.statuses, [200])
+
+    def test_no_store(self):
+        transport = ETagTransport(cache_control='no-store')
+        client = self.make_client(transport)
+        client.send_request('me')
+        client.send_request('me')
+        self.assertEqual(transport.statuses, [200, 200])
+
+    def test_cached_responses_set_no_session(self):
+        transport = ETagTransport(cache_control='private, max-age=60')
+        client = self.make_client(transport)
+        auth_params = {'session_id': 'sess1'}
+        for i in range(2):
+            session_id = client.send_request('me', auth_params=auth_params)[0]
+            self.assertEqual(session_id, '')
+        self.assertEqual(transport.statuses, [200])
+
+    def test_app_errors_are_not_stored(self):
+        transport = ETagTransport(cache_control='private, max-age=60')
+        transport.errors = 1
+        client = self.make_client(transport)
+        self.assertRaises(AppError, client.send_request, 'me')
+        self.assertEqual(client.send_request('me')[1], {'user': 'anonymous'})
+        self.assertEqual(transport.statuses, [200, 200])
@@ -0,0 +1,69 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the incremental JSON decoder. """
+
+import json
+import unittest
+
+from fedora.client.jsonstream import _Reader, iter_members
+
+
+def byte_chunks(data, size):
+    data = json.dumps(data).encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class CountingDecoder(json.JSONDecoder):
+    def __init__(self):
+        json.JSONDecoder.__init__(self)
+        self.calls = 0
+
+    def raw_decode(self, s, idx=0):
+        self.calls += 1
+        return json.JSONDecoder.raw_decode(self, s, idx)
+
+
+class TestIterMembers(unittest.TestCase):
+    data = {
+        'people': [{'username': u'toshio', 'id': 100068},
+                   {'username': u'ménage', 'id': 12345678901234567890}],
+        'data': {'1': [u'a', None, True], '2': 1.5e10},
+        'success': True,
+    }
+
+    def test_streams_arrays_and_objects(self):
+        for size in (1, 3, 1000):
+            members = list(iter_members(byte_chunks(self.data, size),
+                                        ('people', 'data')))
+            self.assertEqual(sorted(members, key=repr), sorted([
+                ('people', 0, {'username': u'toshio', 'id': 100068}),
+                ('people', 1, {'username': u'ménage',
+                               'id': 12345678901234567890}),
+                ('data', u'1', [u'a', None, True]),
+                ('data', u'2', 1.5e10),
+                ('success', None, True),
+            ], key=repr))
+
+    def test_unstreamed_values_are_whole(self):
+        members = list(iter_members(byte_chunks(self.data, 2)))
+        self.assertEqual(dict((key, value) for key, dummy, value in members),
+                         self.data)
+
+    def test_empty(self):
+        self.assertEqual(list(iter_members([b'{', b' }'])), [])
+        self.assertEqual(list(iter_members([b'{"people": []}'],
+                                           ('people',))), [])
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, list, iter_members([b'[1, 2]']))
+        self.assertRaises(ValueError, list,
+                          iter_members([b'{"people": [1, 2'], ('people',)))
+        self.assertRaises(ValueError, list, iter_members([b'{} {}']))
+
+    def test_large_value_is_not_reparsed_per_chunk(self):
+        value = [u'x' * 10] * 1000
+        reader = _Reader(byte_chunks(value, 10))
+        reader._json = CountingDecoder()
+        self.assertEqual(reader.value(), value)
+        self.assertTrue(reader._json.calls < 20)
@@ -0,0 +1,98 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the token handling of OpenIDCBaseClient. """
+
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from fedora.client import openidcclient
+from fedora.client.openidcclient import OpenIDCBaseClient
+
+IDP = 'https://id.example.org/openidc/'
+
+
+class FakeResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeClient(OpenIDCBaseClient):
+    def __init__(self, *args, **kwargs):
+        super(FakeClient, self).__init__(*args, **kwargs)
+        self.refreshes = 0
+        self.sent = []
+        self.accepted = None
+
+    def _refresh_token(self, uuid):
+        self.refreshes += 1
+        # Give the other threads time to pile up
+        time.sleep(0.05)
+        self._update_token(uuid, {
+            'access_token': 'token%d' % self.refreshes,
+            'expires_at': time.time() + 3600})
+        return True
+
+    def _send(self, method, token, args, kwargs):
+        self.sent.append(token)
+        if self.accepted is None or token == self.accepted:
+            return FakeResponse(200)
+        return FakeResponse(401)
+
+
+class TestOpenIDCBaseClient(unittest.TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+        self.client = self.make_client()
+        self.client._add_token({
+            'access_token': 'token0', 'refresh_token': 'refresh',
+            'expires_at': time.time() + 10, 'idp': IDP,
+            'token_type': 'Bearer', 'scopes': ['openid']})
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir)
+
+    def make_client(self):
+        return FakeClient('test', IDP, 'client', cachedir=self.cachedir)
+
+    def test_refreshes_once_for_many_threads(self):
+        tokens = []
+
+        def get_token():
+            tokens.append(self.client.get_token(['openid']))
+        threads = [threading.Thread(target=get_token) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.client.refreshes, 1)
+        self.assertEqual(set(tokens), set(['token1']))
+
+    def test_without_fcntl(self):
+        fcntl = openidcclient.fcntl
+        openidcclient.fcntl = None
+        try:
+            self.test_refreshes_once_for_many_threads()
+        finally:
+            openidcclient.fcntl = fcntl
+
+    def test_other_process_refresh_is_used(self):
+        self.client.get_token(['openid'])
+        other = self.make_client()
+        self.assertEqual(other.get_token(['openid']), 'token1')
+        self.assertEqual(other.refreshes, 0)
+
+    def test_401_is_retried_with_a_new_token(self):
+        self.client.get_token(['openid'])
+        self.client.accepted = 'token2'
+        response = self.client.send_request('https://app.example.org/',
+                                            scopes=['openid'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.sent, ['token1', 'token2'])
+
+    def test_no_token(self):
+        self.assertEqual(self.client.get_token(['admin'], new_token=False),
+                         None)
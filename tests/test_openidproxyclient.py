@@ -0,0 +1,80 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test reusing OpenID sessions in OpenIdProxyClient. """
+
+import unittest
+
+import requests
+
+from fedora.client import AuthError
+from fedora.client.openidproxyclient import OpenIdProxyClient
+
+
+class FakeSession(object):
+    """ requests.Session stand in for a server that expires sessions. """
+    def __init__(self, server):
+        self.server = server
+        self.cookies = requests.cookies.RequestsCookieJar()
+
+    def request(self, method, url, **kwargs):
+        self.server.requests += 1
+        response = requests.models.Response()
+        response._content = b'{}'
+        response._content_consumed = True
+        response.url = url
+        if self not in self.server.valid:
+            response.status_code = 401
+        elif url.endswith('/admin'):
+            response.status_code = 403
+        else:
+            response.status_code = 200
+        return response
+
+
+class FakeClient(OpenIdProxyClient):
+    def __init__(self):
+        super(FakeClient, self).__init__('https://app.example.org/')
+        self.valid = []
+        self.logins = 0
+        self.requests = 0
+
+    def login(self, username, password, otp=None):
+        if password != 'secret':
+            raise AuthError('Bad password')
+        self.logins += 1
+        session = FakeSession(self)
+        self.valid.append(session)
+        return None, session
+
+
+class TestSessionReuse(unittest.TestCase):
+    auth = {'username': 'toshio', 'password': 'secret'}
+
+    def test_logs_in_once(self):
+        client = FakeClient()
+        for _ in range(3):
+            client.send_request('user', auth_params=self.auth)
+        self.assertEqual(client.logins, 1)
+
+    def test_logs_in_again_when_expired(self):
+        client = FakeClient()
+        client.send_request('user', auth_params=self.auth)
+        del client.valid[:]
+        client.send_request('user', auth_params=self.auth)
+        self.assertEqual(client.logins, 2)
+
+    def test_other_password_is_not_reused(self):
+        client = FakeClient()
+        client.send_request('user', auth_params=self.auth)
+        self.assertRaises(AuthError, client.send_request, 'user',
+                          auth_params={'username': 'toshio',
+                                       'password': 'wrong'})
+
+    def test_forbidden_is_not_retried(self):
+        client = FakeClient()
+        client.send_request('user', auth_params=self.auth)
+        self.assertRaises(AuthError, client.send_request, 'admin',
+                          auth_params=self.auth)
+        self.assertEqual(client.logins, 1)
+        self.assertEqual(client.requests, 2)
@@ -0,0 +1,41 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the response types returned by the clients. """
+
+import json
+import unittest
+
+from munch import Munch
+
+from fedora.client.responses import LazyMunch, unlazify, wrap_response
+
+DATA = {'people': [{'username': 'toshio', 'group_roles': [{'id': 1}]}],
+        'success': True}
+
+
+class TestWrapResponse(unittest.TestCase):
+    def test_dict(self):
+        data = json.loads(json.dumps(DATA))
+        self.assertTrue(wrap_response(data, 'dict') is data)
+
+    def test_munch(self):
+        data = wrap_response(json.loads(json.dumps(DATA)))
+        self.assertEqual(data.people[0].group_roles[0].id, 1)
+
+    def test_lazy(self):
+        data = wrap_response(json.loads(json.dumps(DATA)), 'lazy')
+        self.assertTrue(isinstance(data, Munch))
+        # Nothing below the top level is converted until it is used
+        self.assertEqual(type(dict.__getitem__(data, 'people')), list)
+        person = data.people[0]
+        self.assertTrue(isinstance(person, LazyMunch))
+        self.assertTrue(data.people[0] is person)
+        self.assertEqual(person.group_roles[0].id, 1)
+        self.assertEqual([p.username for p in data.people], ['toshio'])
+        person.username = 'abadger'
+        self.assertEqual(unlazify(data)['people'][0]['username'], 'abadger')
+        self.assertEqual(json.loads(json.dumps(data))['success'], True)
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, wrap_response, {}, 'xml')
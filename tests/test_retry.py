@@ -0,0 +1,52 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the retry policies. """
+
+import unittest
+
+from fedora.client.retry import RetryBudget, RetryPolicy
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_backoff_is_bounded(self):
+        policy = RetryPolicy(backoff_base=0.5, backoff_max=4, budget=False)
+        for attempt in range(10):
+            delay = policy.backoff(attempt)
+            self.assertTrue(0 <= delay <= min(4, 0.5 * 2 ** attempt))
+
+    def test_retries_are_limited(self):
+        policy = RetryPolicy(backoff_base=0, budget=False)
+        state = policy.begin(2)
+        self.assertEqual(state.next_delay(500), 0)
+        self.assertEqual(state.next_delay(500), 0)
+        self.assertEqual(state.next_delay(500), None)
+        self.assertEqual(policy.counters, {'requests': 1, 'retries': 2,
+                                           'giveups': 1,
+                                           'budget_exhausted': 0})
+
+    def test_retry_on(self):
+        policy = RetryPolicy(backoff_base=0, retry_on=(503,),
+                             retry_on_timeout=False, budget=False)
+        state = policy.begin(-1)
+        self.assertEqual(state.next_delay(500), None)
+        self.assertEqual(state.next_delay(-1), None)
+        self.assertEqual(state.next_delay(503), 0)
+
+    def test_max_elapsed(self):
+        policy = RetryPolicy(backoff_base=0, max_elapsed=10, budget=False)
+        state = policy.begin(-1)
+        self.assertEqual(state.next_delay(500), 0)
+        state.started -= 11
+        self.assertEqual(state.next_delay(500), None)
+
+    def test_budget_stops_retries(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=1)
+        policy = RetryPolicy(backoff_base=0, budget=budget)
+        self.assertEqual(policy.begin(-1).next_delay(500), 0)
+        # The bucket is empty: one more request only deposits half a token
+        state = policy.begin(-1)
+        self.assertEqual(state.next_delay(500), None)
+        self.assertEqual(policy.counters['budget_exhausted'], 1)
+        # A second request tops it back up to one retry
+        self.assertEqual(policy.begin(-1).next_delay(500), 0)
@@ -0,0 +1,77 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test sending many requests concurrently. """
+
+import json
+import threading
+import time
+import unittest
+
+import requests
+
+from fedora.client import ProxyClient, ServerError
+from fedora.client.transport import PooledTransport
+
+
+def make_response(status, data):
+    response = requests.models.Response()
+    response.status_code = status
+    response._content = json.dumps(data).encode('utf-8')
+    response._content_consumed = True
+    return response
+
+
+class EchoTransport(object):
+    """ Transport that echoes back the method and parameters it is sent. """
+    def post(self, url, data=None, **kwargs):
+        if url.endswith('/broken'):
+            return make_response(500, {})
+        # Finish out of order
+        time.sleep(0.01 * (int(data.get('delay', 0))))
+        return make_response(200, {'url': url, 'delay': data.get('delay')})
+
+
+class CountingSession(object):
+    """ requests.Session stand in that records the concurrency it sees. """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def request(self, method, url, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+
+
+class TestSendMany(unittest.TestCase):
+    def test_results_in_order(self):
+        client = ProxyClient('http://localhost/', session_as_cookie=False,
+                             transport=EchoTransport())
+        results = client.send_many(
+            [('user/view', {'delay': 3}), 'broken',
+             ('group/view', {'delay': 1})], max_workers=3)
+        self.assertEqual(results[0][1].url, 'http://localhost/user/view')
+        self.assertTrue(isinstance(results[1], ServerError))
+        self.assertEqual(results[2][1].delay, 1)
+
+    def test_bad_request_spec(self):
+        client = ProxyClient('http://localhost/', session_as_cookie=False,
+                             transport=EchoTransport())
+        self.assertRaises(TypeError, client.send_many, [()])
+
+    def test_max_per_host(self):
+        transport = PooledTransport(max_per_host=2)
+        transport._session = session = CountingSession()
+        threads = [threading.Thread(target=transport.post,
+                                    args=('http://localhost/',))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(session.peak, 2)
@@ -0,0 +1,35 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the pool of per-user sessions. """
+
+import unittest
+
+from fedora.client.sessionpool import SessionPool
+
+
+class TestSessionPool(unittest.TestCase):
+    def test_lru_eviction(self):
+        pool = SessionPool(maxsize=2)
+        toshio = pool.get('toshio')
+        pool.get('ralph')
+        self.assertTrue(pool.get('toshio') is toshio)
+        pool.get('pingou')
+        self.assertEqual(len(pool), 2)
+        # ralph was the least recently used
+        self.assertTrue(pool.get('toshio') is toshio)
+        self.assertEqual(pool.get('ralph').session, None)
+
+    def test_idle_timeout(self):
+        pool = SessionPool(idle_timeout=60)
+        entry = pool.get('toshio')
+        entry.last_used -= 120
+        self.assertFalse(pool.get('toshio') is entry)
+
+    def test_sessions_share_connections(self):
+        pool = SessionPool()
+        first = pool.new_session()
+        second = pool.new_session()
+        self.assertTrue(first.get_adapter('https://example.org/') is
+                        second.get_adapter('https://example.org/'))
+        self.assertFalse(first.cookies is second.cookies)
@@ -0,0 +1,58 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the BaseClient session store. """
+
+import os
+import pickle
+import shutil
+import stat
+import tempfile
+import unittest
+
+from fedora.client import BaseClient
+from fedora.client.sessionstore import SessionStore
+
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'sessions.sqlite')
+        self.legacy = os.path.join(self.directory, 'fedora_session')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_keyed_by_server_and_user(self):
+        store = SessionStore(self.filename)
+        store.set('https://a/', 'toshio', 'abc')
+        store.set('https://b/', 'toshio', 'def')
+        other_process = SessionStore(self.filename)
+        self.assertEqual(other_process.get('https://a/', 'toshio'), 'abc')
+        self.assertEqual(other_process.get('https://b/', 'toshio'), 'def')
+        self.assertEqual(other_process.get('https://a/', 'ralph'), '')
+        other_process.delete('https://a/', 'toshio')
+        self.assertEqual(store.get('https://a/', 'toshio'), '')
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0o600)
+
+    def test_migrates_pickle_file(self):
+        with open(self.legacy, 'wb') as session_file:
+            pickle.dump({'toshio': 'abc', 'ralph': ''}, session_file)
+        store = SessionStore(self.filename, legacy_filename=self.legacy)
+        self.assertEqual(store.get('https://a/', 'toshio'), 'abc')
+        self.assertEqual(store.get('https://a/', 'ralph'), '')
+        # A session saved for a server replaces the imported one there only
+        store.set('https://a/', 'toshio', 'new')
+        self.assertEqual(store.get('https://a/', 'toshio'), 'new')
+        self.assertEqual(store.get('https://b/', 'toshio'), 'abc')
+
+    def test_baseclient(self):
+        store = SessionStore(self.filename)
+        client = BaseClient('https://a/', username='toshio',
+                            session_store=store)
+        client.session_id = 'abc'
+        client = BaseClient('https://a/', username='toshio',
+                            session_store=store)
+        self.assertEqual(client.session_id, 'abc')
+        del client.session_id
+        self.assertEqual(store.get('https://a/', 'toshio'), '')
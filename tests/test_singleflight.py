@@ -0,0 +1,61 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test coalescing concurrent identical calls. """
+
+import threading
+import time
+import unittest
+
+from fedora.client.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.release = threading.Event()
+
+    def run_concurrently(self, func, count=5):
+        results = [None] * count
+
+        def call(num):
+            try:
+                results[num] = self.flight.do('key', func)
+            except Exception as e:
+                results[num] = e
+
+        threads = [threading.Thread(target=call, args=(num,))
+                   for num in range(count)]
+        for thread in threads:
+            thread.start()
+        # Let the waiters pile up behind the first call
+        while self.flight.stats['coalesced'] < count - 1:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_coalesces_concurrent_calls(self):
+        def fetch():
+            self.release.wait()
+            return {'username': 'toshio'}
+
+        results = self.run_concurrently(fetch)
+        self.assertEqual(self.flight.stats, {'calls': 1, 'coalesced': 4})
+        self.assertEqual(results, [{'username': 'toshio'}] * 5)
+        # Every caller gets its own copy
+        self.assertEqual(len(set(id(result) for result in results)), 5)
+
+        # Once the call is finished the next one is made again
+        self.flight.do('key', fetch)
+        self.assertEqual(self.flight.stats['calls'], 2)
+
+    def test_errors_are_shared(self):
+        def fetch():
+            self.release.wait()
+            raise ValueError('down')
+
+        results = self.run_concurrently(fetch)
+        self.assertTrue(all(isinstance(result, ValueError)
+                            for result in results))
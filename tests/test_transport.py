@@ -0,0 +1,147 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+
+""" Test the pooled keep-alive transport. """
+
+import threading
+import time
+import unittest
+
+import requests
+from six.moves import BaseHTTPServer, socketserver
+
+from fedora.client.transport import PooledTransport
+
+
+class CookieHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Sets a cookie and sends back the cookies it was sent. """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        data = (self.headers.get('Cookie') or '').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Set-Cookie', 'tg-visit=abc; Path=/')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """ Serves each kept alive connection in its own thread. """
+    daemon_threads = True
+
+
+class BlockingSession(object):
+    """ requests.Session stand in that waits until it is told to answer. """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.answer = threading.Event()
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    def request(self, method, url, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            self.answer.wait(5)
+            if url.endswith('/broken'):
+                raise requests.exceptions.ConnectionError('Connection reset')
+            return url
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestPooledTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), CookieHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:%s/' % self.server.server_address[1]
+        self.transport = PooledTransport()
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_server_cookies_are_not_kept(self):
+        response = self.transport.get(self.url)
+        self.assertEqual(response.cookies.get('tg-visit'), 'abc')
+        self.assertEqual(len(self.transport._session.cookies), 0)
+        response = self.transport.get(self.url)
+        self.assertEqual(response.content, b'')
+        response = self.transport.get(self.url,
+                                      cookies={'tg-visit': 'mine'})
+        self.assertEqual(response.content, b'tg-visit=mine')
+
+    def test_reap_idle(self):
+        self.transport.get(self.url)
+        pools = self.transport._adapter.poolmanager.pools
+        self.assertEqual(len(pools), 1)
+
+        # Not idle for long enough yet
+        self.transport._last_reap -= self.transport.idle_timeout
+        self.transport.reap_idle()
+        self.assertEqual(len(pools), 1)
+
+        host = ('http', '127.0.0.1', self.server.server_address[1])
+        self.transport._last_used[host] -= self.transport.idle_timeout + 1
+        self.transport._last_reap -= self.transport.idle_timeout
+        self.transport.reap_idle()
+        self.assertEqual(len(pools), 0)
+        self.assertEqual(self.transport._last_used, {})
+
+        # The next request opens a new pool
+        self.transport.get(self.url)
+        self.assertEqual(len(pools), 1)
+
+
+class TestMaxPerHost(unittest.TestCase):
+    def setUp(self):
+        self.transport = PooledTransport(max_per_host=2)
+        self.session = BlockingSession()
+        self.transport._session = self.session
+        self.results = []
+
+    def send(self, url):
+        try:
+            self.results.append(self.transport.get(url))
+        except requests.exceptions.ConnectionError as err:
+            self.results.append(err)
+
+    def run_threads(self, urls):
+        threads = [threading.Thread(target=self.send, args=(url,))
+                   for url in urls]
+        for thread in threads:
+            thread.start()
+        # Give every thread the chance to start its request
+        time.sleep(0.2)
+        in_flight = self.session.in_flight
+        self.session.answer.set()
+        for thread in threads:
+            thread.join()
+        return in_flight
+
+    def test_limit(self):
+        urls = ['http://a.example.org/%s' % num for num in range(4)]
+        urls.append('http://b.example.org/')
+        # Two requests to a.example.org and the one to b.example.org
+        self.assertEqual(self.run_threads(urls), 3)
+        self.assertEqual(self.session.most_in_flight, 3)
+        self.assertEqual(len(self.results), 5)
+
+    def test_slot_is_released_on_error(self):
+        urls = ['http://a.example.org/broken'] * 3
+        self.run_threads(urls)
+        self.assertTrue(all(isinstance(result,
+                                       requests.exceptions.ConnectionError)
+                            for result in self.results))
+        slots = self.transport._slots(('http', 'a.example.org', 80))
+        for _ in range(2):
+            self.assertTrue(slots.acquire(False))